@@ -0,0 +1,210 @@
+"""
+coletor.py
+----------
+Ponto de entrada único dos coletores.
+
+⚡ Funcionamento:
+- Aqui em cima só stdlib leve: cada subcomando importa o que precisa
+  (Playwright, requests, dotenv) dentro de si. `status`, `export` e `bench`
+  sobem sem navegador nem cliente HTTP.
+- `--import-time` mostra, no stderr, quanto custou cada import tardio e se
+  algum módulo pesado entrou sem precisar — para pegar regressão de partida.
+
+Uso:
+    python coletor.py collect [--modo async|turbo|http] [--contas VIBRA_AP,VIBRA_BB] [--sem-envio]
+    python coletor.py collect --workers 3   # fila SQLite com 3 processos/navegadores
+    python coletor.py collect --har gravar  # depois: --har reproduzir roda offline (har.py)
+    python coletor.py upload-pending        # reenvia o outbox ao Supabase
+    python coletor.py export [--dist X] [--produto Y] [--de AAAA-MM-DD] [--ate AAAA-MM-DD] [--formato csv|jsonl] [-o arquivo]
+    python coletor.py bench [-- args do bench_parsers.py]
+    python coletor.py status
+    python coletor.py --import-time status
+"""
+
+import time
+
+_INICIO = time.perf_counter()
+
+import argparse
+import importlib
+import json
+import logging
+import os
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+
+PASTA_COLETORES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "vibra_marques")
+# Módulos que um comando sem navegador/rede não deveria carregar
+PESADOS = ("playwright", "requests", "dotenv", "selenium", "supabase", "urllib3")
+
+_IMPORTS: List[Tuple[str, float, int]] = []
+
+
+def importar(nome: str):
+    """import tardio, cronometrado para o --import-time."""
+    if PASTA_COLETORES not in sys.path:
+        sys.path.insert(0, PASTA_COLETORES)
+    antes = len(sys.modules)
+    t0 = time.perf_counter()
+    mod = importlib.import_module(nome)
+    _IMPORTS.append((nome, time.perf_counter() - t0, len(sys.modules) - antes))
+    return mod
+
+
+def relatorio_imports(t_comando: float) -> str:
+    linhas = [f"⏱️ partida até o comando: {(t_comando - _INICIO) * 1000:.1f}ms"]
+    for nome, dur, novos in _IMPORTS:
+        linhas.append(f"   import {nome:<20} {dur * 1000:8.1f}ms  (+{novos} módulos)")
+    carregados = sorted({m.split(".")[0] for m in sys.modules} & set(PESADOS))
+    linhas.append(f"   pesados carregados: {', '.join(carregados) or 'nenhum'}")
+    linhas.append(f"   total: {(time.perf_counter() - _INICIO) * 1000:.1f}ms")
+    return "\n".join(linhas)
+
+
+# ------------ Subcomandos ------------
+def cmd_collect(args) -> int:
+    if args.modo != "async" and (args.contas or args.workers):
+        # turbo e http coletam só a conta do .env (EMPRESA); fila.py usa o coletor_async
+        args.parser.error(f"--contas/--workers só valem com --modo async (não com --modo {args.modo})")
+    if args.har and args.modo == "http":
+        # sem navegador não há HAR: a reprodução iria à rede e ao Supabase
+        args.parser.error("--har não vale com --modo http (use --modo async ou turbo)")
+    if args.har:
+        os.environ["HAR_MODO"] = args.har
+    if args.sem_envio or args.har == "reproduzir":
+        os.environ["COLETA_ENVIAR"] = "false"
+    contas = [c.strip().upper() for c in args.contas.split(",") if c.strip()] if args.contas else None
+    if args.workers:
+        # fila.py: um job por conta, N processos cada um com seu navegador
+        return importar("fila").main(["rodar", "--workers", str(args.workers)]
+                                     + (["--contas", ",".join(contas)] if contas else []))
+    if args.modo == "turbo":
+        return importar("coletor_turbo").main() or 0
+    if args.modo == "http":
+        return importar("coletor_http").main()
+    import asyncio
+    coletor_async = importar("coletor_async")
+    resultados = asyncio.run(coletor_async.varrer(coletor_async.contas_selecionadas(contas)))
+    return 0 if resultados and all(r["sucesso"] for r in resultados) else 1
+
+
+def cmd_upload_pending(args) -> int:
+    return importar("outbox").main(["replay"])
+
+
+def cmd_export(args) -> int:
+    historico = importar("historico")
+    linhas = historico.HISTORICO.consultar(args.dist, args.produto, args.de, args.ate)
+    saida = open(args.output, "w", encoding="utf-8", newline="") if args.output else sys.stdout
+    n = 0
+    try:
+        if args.formato == "jsonl":
+            for quando, dist, prod, preco in linhas:
+                saida.write(json.dumps({"quando": quando.isoformat(timespec="seconds"), "distribuidora": dist,
+                                        "produto": prod, "preco": preco}, ensure_ascii=False) + "\n")
+                n += 1
+        else:
+            import csv
+            w = csv.writer(saida)
+            w.writerow(["quando", "distribuidora", "produto", "preco"])
+            for quando, dist, prod, preco in linhas:
+                w.writerow([quando.isoformat(timespec="seconds"), dist, prod, f"{preco:.4f}"])
+                n += 1
+    finally:
+        if saida is not sys.stdout:
+            saida.close()
+    if args.output:
+        print(f"📁 {n} linha(s) em {args.output}")
+    return 0
+
+
+def cmd_bench(args) -> int:
+    resto = args.resto[1:] if args.resto[:1] == ["--"] else args.resto
+    return importar("bench_parsers").main(resto)
+
+
+def _sessoes() -> Dict[str, Optional[float]]:
+    sessoes = importar("sessoes")
+    if not sessoes.SESSOES_DIR.is_dir():
+        return {}
+    idades = {}
+    for p in sorted(sessoes.SESSOES_DIR.glob("*.json")):
+        if not p.stem.endswith("_api"):
+            idade = sessoes.idade_sessao(p.stem)
+            idades[p.stem] = round(idade / 3600, 1) if idade is not None else None
+    return idades
+
+
+def _ultima_execucao() -> Optional[Dict[str, Any]]:
+    metricas = importar("metricas")
+    runs = metricas.execucoes(janela=1)
+    return next((l for l in runs[-1] if l.get("tipo") == "execucao"), None) if runs else None
+
+
+def cmd_status(args) -> int:
+    daemon = importar("daemon")
+    try:
+        with open(daemon.STATUS_PATH, encoding="utf-8") as f:
+            status_daemon = json.load(f)
+    except (OSError, ValueError):
+        status_daemon = None
+    outbox = importar("outbox").OUTBOX
+    fila = importar("fila").FILA
+    arquivo = importar("snapshots").ARQUIVO
+    status = {
+        "outbox": outbox.contagem() if outbox.path.exists() else {},
+        "fila": fila.contagem() if fila.path.exists() else {},
+        "historico_meses": importar("historico").HISTORICO.meses(),
+        "snapshots": {k: v for k, v in arquivo.resumo().items() if k != "por_passo"} if arquivo.path.exists() else {},
+        "sessoes_idade_h": _sessoes(),
+        "ultima_execucao": _ultima_execucao(),
+        "daemon": status_daemon,
+    }
+    print(json.dumps(status, ensure_ascii=False, indent=2))
+    return 0
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Coletor de preços das distribuidoras.")
+    ap.add_argument("--import-time", action="store_true", help="relatório de tempo de import no stderr")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    cp = sub.add_parser("collect", help="roda uma coleta")
+    cp.add_argument("--modo", choices=["async", "turbo", "http"], default="async")
+    cp.add_argument("--contas", help="contas separadas por vírgula (padrão: COLETA_CONTAS ou todas)")
+    cp.add_argument("--sem-envio", action="store_true", help="não envia ao Supabase")
+    cp.add_argument("--workers", type=int, help="divide as contas entre N processos pela fila (fila.py)")
+    cp.add_argument("--har", choices=["gravar", "reproduzir"], help="grava a sessão em HAR ou roda offline a partir dele (har.py)")
+    cp.set_defaults(fn=cmd_collect, parser=cp)
+
+    up = sub.add_parser("upload-pending", help="envia as linhas pendentes do outbox")
+    up.set_defaults(fn=cmd_upload_pending)
+
+    ep = sub.add_parser("export", help="exporta o histórico local")
+    ep.add_argument("--dist")
+    ep.add_argument("--produto")
+    ep.add_argument("--de")
+    ep.add_argument("--ate")
+    ep.add_argument("--formato", choices=["csv", "jsonl"], default="csv")
+    ep.add_argument("-o", "--output")
+    ep.set_defaults(fn=cmd_export)
+
+    bp = sub.add_parser("bench", help="bench/regressão dos parsers (bench_parsers.py)")
+    bp.add_argument("resto", nargs=argparse.REMAINDER)
+    bp.set_defaults(fn=cmd_bench)
+
+    sp = sub.add_parser("status", help="outbox, fila, histórico, snapshots, sessões, última execução e daemon")
+    sp.set_defaults(fn=cmd_status)
+
+    args = ap.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(message)s")
+    t_comando = time.perf_counter()
+    try:
+        return args.fn(args)
+    finally:
+        if args.import_time:
+            print(relatorio_imports(t_comando), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
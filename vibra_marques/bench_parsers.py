@@ -0,0 +1,331 @@
+"""
+bench_parsers.py
+----------------
+Benchmark + regressão dos parsers de preço sobre as páginas salvas da vitrine.
+
+Estratégias (o mesmo código que os coletores usam, via extracao.py):
+- turbo_texto:    motor de regex sobre o texto da página (coletor_turbo / coletor_async)
+- registros_de_cards: campos por seletor de cada card, layout "vibra"
+                  (JS_CAMPOS_CARDS; vibra_marques.py, reserva.py, testegui.py)
+- span_strong:    pareamento span.item-descricao -> strong (estratégia antiga
+                  desses três scripts, mantida como referência)
+- conteudo_regex: regex "NOME - R$ 0,00" sobre page.content() (coletor_automatizado_completo.py)
+- cards:          quebra do inner_text de cada card (coleta_playwright.py)
+
+O que o navegador entregaria (inner_text, lista de spans/strongs, texto dos
+cards, linhas do JS_CAMPOS_CARDS) é montado uma vez por fixture, fora da
+medição: o tempo reportado é só o do parser Python.
+
+Os resultados são conferidos contra bench_golden.json; qualquer diferença
+faz o script sair com código 1. As fixtures `sintetico:<nome>` (SINTETICAS)
+são geradas na hora — casos patológicos do motor de regex — e, além do
+golden, têm teto de tempo (LIMITE_SINTETICA_S). Use --atualizar para regravar o golden
+depois de uma mudança intencional.
+
+Uso:
+    python bench_parsers.py
+    python bench_parsers.py --repeticoes 500
+    python bench_parsers.py --atualizar
+    python bench_parsers.py caminho/outra_vitrine.html
+    python bench_parsers.py snap:cn.vibraenergia.com.br/vitrine   # páginas do snapshots.py
+
+Fixtures `snap:<portal>/<passo>` ou `snap:<prefixo do hash>` vêm do arquivo
+de snapshots (só os blobs pedidos são descomprimidos); no golden a chave é
+`snap:<12 primeiros dígitos do hash>`, estável entre execuções.
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from html.parser import HTMLParser
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from extracao import (CAMPOS_CARD, estruturar_card, extrair_precos_texto, pares_descricao_preco, precos_do_conteudo,
+                      registros_de_cards, texto_de_html)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+GOLDEN_PATH = os.path.join(BASE_DIR, "bench_golden.json")
+FIXTURES_PADRAO = ["vitrine_vibra.html", "html_vitrine_teste.html", "evidencias/*_03_vitrine.html",
+                   "sintetico:palavra_sem_preco"]
+
+# Entradas geradas: casos patológicos que já custaram caro ao motor de regex
+SINTETICAS: Dict[str, Callable[[], str]] = {
+    # palavra-chave sem preço na janela, repetida: cada uma deve custar O(1)
+    "palavra_sem_preco": lambda: ("gasolina comum " + "y" * 100) * 200,
+}
+# Teto de uma extração turbo_texto em cada sintética (o motor quadrático levava ~0,4s)
+LIMITE_SINTETICA_S = 0.1
+
+# ------------ "Navegador" mínimo sobre o HTML salvo ------------
+_VAZIAS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+_BLOCOS = {"div", "li", "ul", "ol", "p", "span", "form", "label", "button", "section", "tr", "br"}
+
+class _Dom(HTMLParser):
+    """
+    Extrai do HTML, em ordem de documento:
+    - `elementos`: [{"tag": "SPAN"|"STRONG", "text"}] de `span.item-descricao, strong`;
+    - `cards`: texto aproximado do inner_text de cada `div.corpo-item[id^="item-"]`
+      (quebra de linha em elementos de bloco; subárvores .corpo-hidden,
+      visibility:hidden e display:none ignoradas);
+    - `campos_cards`: o que JS_CAMPOS_CARDS devolve com o layout "vibra" —
+      [nome, codigo, base, preco, validade, texto|None] por card, sem repetição.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.elementos: List[Dict[str, str]] = []
+        self.cards: List[str] = []
+        self.campos_cards: List[List[Optional[str]]] = []
+        self._pilha: List[Tuple[str, bool]] = []  # (tag, oculto)
+        self._classes: List[List[str]] = []  # classes de cada elemento da pilha
+        self._filhos: List[int] = [0]  # elementos-filho já vistos em cada nível (nth-child)
+        self._campos: Dict[str, Dict[str, str]] = {}  # campos do card aberto
+        self._abertos: List[Tuple[int, Dict[str, str]]] = []  # (profundidade, elemento)
+        self._card = None  # (profundidade, partes)
+        self._ignorar = 0
+
+    def handle_starttag(self, tag, attrs):
+        a = dict(attrs)
+        classes = (a.get("class") or "").split()
+        if tag in ("script", "style"):
+            self._ignorar += 1
+        estilo = (a.get("style") or "").replace(" ", "")
+        oculto = (bool(self._pilha and self._pilha[-1][1]) or "corpo-hidden" in classes
+                  or "visibility:hidden" in estilo or "display:none" in estilo)
+        self._filhos[-1] += 1
+        if tag in _VAZIAS:
+            if tag == "br" and self._card is not None:
+                self._card[1].append("\n")
+            return
+        n_filho = self._filhos[-1]
+        self._pilha.append((tag, oculto))
+        self._classes.append(classes)
+        self._filhos.append(0)
+        prof = len(self._pilha)
+        if self._card is not None:
+            campo = self._campo_vibra(tag, classes, n_filho)
+            if campo and campo not in self._campos:
+                self._campos[campo] = {"text": ""}
+                self._abertos.append((prof, self._campos[campo]))
+        if tag == "strong" or (tag == "span" and "item-descricao" in classes):
+            el = {"tag": tag.upper(), "text": ""}
+            self.elementos.append(el)
+            self._abertos.append((prof, el))
+        if (self._card is None and tag == "div" and "corpo-item" in classes
+                and (a.get("id") or "").startswith("item-")):
+            self._card = (prof, [])
+            self._campos = {}
+        elif self._card is not None and tag in _BLOCOS:
+            self._card[1].append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in ("script", "style") and self._ignorar:
+            self._ignorar -= 1
+        if tag in _VAZIAS or not any(t == tag for t, _ in self._pilha):
+            return
+        while self._pilha:
+            prof = len(self._pilha)
+            t, _ = self._pilha.pop()
+            self._classes.pop()
+            self._filhos.pop()
+            while self._abertos and self._abertos[-1][0] == prof:
+                el = self._abertos.pop()[1]
+                el["text"] = el["text"].strip()
+            if self._card is not None:
+                if self._card[0] == prof:
+                    texto = "".join(self._card[1])
+                    self.cards.append(texto)
+                    self._fechar_campos(texto)
+                    self._card = None
+                elif t in _BLOCOS:
+                    self._card[1].append("\n")
+            if t == tag:
+                break
+
+    def _dentro(self, classe: str, ate: int) -> bool:
+        """Algum ancestral do card (até a profundidade `ate`, exclusive) tem a classe?"""
+        return any(classe in cls for cls in self._classes[self._card[0] - 1:ate])
+
+    def _campo_vibra(self, tag: str, classes: List[str], n_filho: int) -> Optional[str]:
+        """Campo do layout "vibra" (extracao.LAYOUTS) que este elemento satisfaz."""
+        topo = len(self._pilha) - 1
+        if "item-descricao" in classes:
+            return "nome"
+        if "item-codigo" in classes:
+            return "codigo"
+        if tag == "strong" and self._dentro("info-base", topo):
+            return "base"
+        if tag == "strong" and any(t == "li" for t, _ in self._pilha[self._card[0]:topo]) \
+                and self._dentro("item-footer-infos", topo):
+            return "preco"
+        if tag == "li" and n_filho == 2 and self._dentro("item-footer-infos", topo):
+            return "validade"
+        return None
+
+    def _fechar_campos(self, texto: str) -> None:
+        linha = [" ".join(self._campos[c]["text"].split()) or None if c in self._campos else None
+                 for c in CAMPOS_CARD]
+        linha.append(None if all(linha) else texto)
+        if linha not in self.campos_cards:
+            self.campos_cards.append(linha)
+
+    def handle_data(self, data):
+        if self._ignorar:
+            return
+        for _, el in self._abertos:
+            el["text"] += data
+        if self._card is not None and not (self._pilha and self._pilha[-1][1]):
+            self._card[1].append(" ".join(data.split()) if data.strip() else "")
+
+
+def preparar(html: str) -> Dict[str, Any]:
+    """Entradas de cada estratégia, como o navegador as entregaria."""
+    dom = _Dom()
+    dom.feed(html)
+    dom.close()
+    return {
+        "texto": texto_de_html(html),
+        "html": html,
+        "elementos": dom.elementos,
+        "cards": dom.cards,
+        "campos_cards": dom.campos_cards,
+    }
+
+
+# ------------ Estratégias ------------
+ESTRATEGIAS: Dict[str, Tuple[str, Callable[[Any], Any]]] = {
+    "turbo_texto":    ("texto",     extrair_precos_texto),
+    "registros_de_cards": ("campos_cards", registros_de_cards),
+    "span_strong":    ("elementos", pares_descricao_preco),
+    "conteudo_regex": ("html",      precos_do_conteudo),
+    "cards":          ("cards",     lambda cards: [p for p in map(estruturar_card, cards) if p]),
+}
+
+
+def fixtures(caminhos: List[str]) -> List[str]:
+    achados: List[str] = []
+    for c in caminhos:
+        if c.startswith(("snap:", "sintetico:")):
+            continue
+        padrao = c if os.path.isabs(c) else os.path.join(BASE_DIR, c)
+        achados.extend(sorted(glob.glob(padrao)))
+    return achados
+
+
+def paginas(caminhos: List[str]) -> Dict[str, str]:
+    """{chave da fixture: HTML} dos arquivos e dos `snap:` pedidos."""
+    saida = {}
+    for path in fixtures(caminhos):
+        with open(path, encoding="utf-8") as f:
+            saida[_chave(path)] = f.read()
+    for c in caminhos:
+        if c.startswith("sintetico:"):
+            saida[c] = SINTETICAS[c[len("sintetico:"):]]()
+    refs = [c[len("snap:"):] for c in caminhos if c.startswith("snap:")]
+    if refs:
+        from snapshots import ARQUIVO
+        for ref in refs:
+            for snap in ARQUIVO.resolver(ref):
+                saida[f"snap:{snap['hash'][:12]}"] = ARQUIVO.ler(snap["hash"])
+    return saida
+
+
+def _chave(path: str) -> str:
+    rel = os.path.relpath(path, BASE_DIR)
+    return path if rel.startswith("..") else rel.replace(os.sep, "/")
+
+
+def medir(entradas: Dict[str, Dict[str, Any]], repeticoes: int) -> Dict[str, Dict[str, Any]]:
+    """{estrategia: {"paginas_s", "us_pagina", "saidas": {fixture: saída}}}."""
+    resultado = {}
+    for nome, (entrada, fn) in ESTRATEGIAS.items():
+        saidas = {fx: json.loads(json.dumps(fn(e[entrada]), ensure_ascii=False)) for fx, e in entradas.items()}
+        t0 = time.perf_counter()
+        for _ in range(repeticoes):
+            for e in entradas.values():
+                fn(e[entrada])
+        dt = time.perf_counter() - t0
+        paginas = repeticoes * len(entradas)
+        resultado[nome] = {
+            "paginas_s": paginas / dt if dt else float("inf"),
+            "us_pagina": dt / paginas * 1e6,
+            "saidas": saidas,
+        }
+    return resultado
+
+
+def checar_sinteticas(htmls: Dict[str, str]) -> List[str]:
+    """Sintéticas acima do LIMITE_SINTETICA_S no turbo_texto (regressão de complexidade)."""
+    lentas = []
+    for chave, html in htmls.items():
+        if chave.startswith("sintetico:"):
+            texto = texto_de_html(html)
+            t0 = time.perf_counter()
+            extrair_precos_texto(texto)
+            dt = time.perf_counter() - t0
+            if dt > LIMITE_SINTETICA_S:
+                lentas.append(f"{chave}/turbo_texto: {dt:.3f}s > {LIMITE_SINTETICA_S}s")
+    return lentas
+
+
+def comparar(resultado: Dict[str, Dict[str, Any]], golden: Dict[str, Dict[str, Any]]) -> List[str]:
+    """Lista de divergências "fixture/estrategia" em relação ao golden."""
+    diffs = []
+    for nome, r in resultado.items():
+        for fx, saida in r["saidas"].items():
+            if fx not in golden or nome not in golden[fx]:
+                diffs.append(f"{fx}/{nome}: sem valor no golden")
+            elif golden[fx][nome] != saida:
+                diffs.append(f"{fx}/{nome}: esperado {golden[fx][nome]!r}, obtido {saida!r}")
+    return diffs
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Benchmark dos parsers de preço sobre as vitrines salvas.")
+    ap.add_argument("fixtures", nargs="*", default=FIXTURES_PADRAO, help="HTMLs (aceita glob)")
+    ap.add_argument("--repeticoes", type=int, default=200)
+    ap.add_argument("--atualizar", action="store_true", help="regrava bench_golden.json com as saídas atuais")
+    args = ap.parse_args(argv)
+
+    htmls = paginas(args.fixtures)
+    if not htmls:
+        print("❌ Nenhuma fixture encontrada.")
+        return 2
+    entradas = {chave: preparar(html) for chave, html in htmls.items()}
+
+    resultado = medir(entradas, args.repeticoes)
+
+    print(f"📄 {len(entradas)} páginas x {args.repeticoes} repetições")
+    print(f"{'estratégia':<16}{'páginas/s':>12}{'µs/página':>12}")
+    for nome, r in resultado.items():
+        print(f"{nome:<16}{r['paginas_s']:>12.0f}{r['us_pagina']:>12.1f}")
+
+    golden = {}
+    if os.path.exists(GOLDEN_PATH):
+        with open(GOLDEN_PATH, encoding="utf-8") as f:
+            golden = json.load(f)
+
+    if args.atualizar:
+        for nome, r in resultado.items():
+            for fx, saida in r["saidas"].items():
+                golden.setdefault(fx, {})[nome] = saida
+        with open(GOLDEN_PATH, "w", encoding="utf-8") as f:
+            json.dump(golden, f, ensure_ascii=False, indent=2, sort_keys=True)
+        print(f"💾 Golden atualizado: {GOLDEN_PATH}")
+        return 0
+
+    diffs = comparar(resultado, golden) + checar_sinteticas(htmls)
+    if diffs:
+        print(f"❌ {len(diffs)} divergência(s) em relação ao golden:")
+        for d in diffs:
+            print("   -", d)
+        return 1
+    print("✅ Saídas idênticas ao golden.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+"""
+bloqueio.py
+-----------
+Bloqueio de recursos pesados/inúteis nos contextos Playwright.
+
+Usa `BrowserContext.route` para abortar imagens, fontes, mídia e scripts de
+analytics antes de baixar. Configuração por ambiente:
+
+- BLOQUEIO=false            desliga tudo
+- BLOQUEIO_TIPOS            tipos de recurso (default: image,font,media)
+- BLOQUEIO_HOSTS            hosts sempre bloqueados (analytics/ads)
+- BLOQUEIO_PERMITIR         hosts nunca bloqueados (têm prioridade)
+
+Requisição abortada não traz tamanho: os bytes bloqueados são estimados
+pelos HARs gravados (har.py, gravados com BLOQUEIO=false), que têm o tamanho
+de cada URL. O que não aparece em nenhum HAR é contado como "sem tamanho".
+As estatísticas mostram quantas foram bloqueadas (por tipo/host), a
+estimativa de bytes bloqueados e os bytes que de fato foram baixados.
+"""
+
+import json
+import logging
+import os
+import zipfile
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+HOSTS_ANALYTICS = (
+    "google-analytics.com", "googletagmanager.com", "doubleclick.net", "googleadservices.com",
+    "facebook.net", "hotjar.com", "clarity.ms", "nr-data.net", "newrelic.com", "dynatrace.com",
+)
+
+log = logging.getLogger("bloqueio")
+
+
+def _lista(nome: str, default: str) -> Tuple[str, ...]:
+    return tuple(x.strip().lower() for x in os.getenv(nome, default).split(",") if x.strip())
+
+
+def _casa_host(host: str, dominios: Tuple[str, ...]) -> bool:
+    return any(host == d or host.endswith("." + d) for d in dominios)
+
+
+_TAMANHOS: Optional[Dict[str, int]] = None
+
+def tamanhos_conhecidos() -> Dict[str, int]:
+    """{url: bytes} das respostas nos HARs gravados; lido uma vez por processo."""
+    global _TAMANHOS
+    if _TAMANHOS is None:
+        from har import HAR_DIR
+        _TAMANHOS = {}
+        for p in sorted(HAR_DIR.glob("*.har.zip")) if HAR_DIR.is_dir() else []:
+            try:
+                with zipfile.ZipFile(p) as z:
+                    nome_har = next(n for n in z.namelist() if n.endswith(".har"))
+                    entradas = json.loads(z.read(nome_har))["log"]["entries"]
+            except (OSError, ValueError, KeyError, StopIteration, zipfile.BadZipFile) as e:
+                log.debug("HAR ignorado para tamanhos (%s): %s", p, e)
+                continue
+            for e in entradas:
+                resp = e.get("response") or {}
+                tam = resp.get("bodySize") or 0
+                if tam <= 0:
+                    tam = (resp.get("content") or {}).get("size") or 0
+                if tam > 0:
+                    _TAMANHOS[e["request"]["url"]] = tam
+    return _TAMANHOS
+
+
+@dataclass
+class RegrasBloqueio:
+    tipos: Tuple[str, ...] = ("image", "font", "media")
+    hosts_bloqueados: Tuple[str, ...] = HOSTS_ANALYTICS
+    hosts_permitidos: Tuple[str, ...] = ()
+
+    @classmethod
+    def do_ambiente(cls) -> "RegrasBloqueio":
+        return cls(
+            tipos=_lista("BLOQUEIO_TIPOS", "image,font,media"),
+            hosts_bloqueados=_lista("BLOQUEIO_HOSTS", ",".join(HOSTS_ANALYTICS)),
+            hosts_permitidos=_lista("BLOQUEIO_PERMITIR", ""),
+        )
+
+    def motivo(self, resource_type: str, url: str) -> Optional[str]:
+        """Motivo do bloqueio ("tipo:image", "host:x.com") ou None se passa."""
+        host = (urlsplit(url).hostname or "").lower()
+        if _casa_host(host, self.hosts_permitidos):
+            return None
+        if _casa_host(host, self.hosts_bloqueados):
+            return f"host:{host}"
+        if resource_type in self.tipos:
+            return f"tipo:{resource_type}"
+        return None
+
+
+@dataclass
+class EstatisticasBloqueio:
+    requisicoes: int = 0
+    bloqueadas: Counter = field(default_factory=Counter)
+    bytes_bloqueados: int = 0  # estimativa: só das URLs com tamanho nos HARs
+    bloqueadas_sem_tamanho: int = 0
+    bytes_baixados: int = 0
+
+    @property
+    def total_bloqueadas(self) -> int:
+        return sum(self.bloqueadas.values())
+
+    def anotar_bloqueio(self, motivo: str, url: str) -> None:
+        self.bloqueadas[motivo] += 1
+        tam = tamanhos_conhecidos().get(url)
+        if tam:
+            self.bytes_bloqueados += tam
+        else:
+            self.bloqueadas_sem_tamanho += 1
+
+    def _on_response(self, resp) -> None:
+        try:
+            self.bytes_baixados += int(resp.headers.get("content-length") or 0)
+        except (TypeError, ValueError):
+            pass
+
+    def resumo(self) -> str:
+        top = ", ".join(f"{k}={v}" for k, v in self.bloqueadas.most_common(5))
+        return (f"{self.total_bloqueadas}/{self.requisicoes} requisições bloqueadas "
+                f"({top or '-'}); ~{self.bytes_bloqueados / 1024:.0f} KB bloqueados "
+                f"({self.bloqueadas_sem_tamanho} sem tamanho conhecido); {self.bytes_baixados / 1024:.0f} KB baixados")
+
+    def como_dict(self) -> dict:
+        return {
+            "requisicoes": self.requisicoes,
+            "bloqueadas": self.total_bloqueadas,
+            "por_motivo": dict(self.bloqueadas),
+            "bytes_bloqueados_estimados": self.bytes_bloqueados,
+            "bloqueadas_sem_tamanho": self.bloqueadas_sem_tamanho,
+            "bytes_baixados": self.bytes_baixados,
+        }
+
+
+def bloqueio_ativo() -> bool:
+    return os.getenv("BLOQUEIO", "true").strip().lower() in ("1", "true", "yes", "y", "on")
+
+
+def aplicar_bloqueio(ctx, regras: Optional[RegrasBloqueio] = None) -> EstatisticasBloqueio:
+    """Instala o bloqueio num BrowserContext da API sync."""
+    regras = regras or RegrasBloqueio.do_ambiente()
+    stats = EstatisticasBloqueio()
+
+    def _rota(route, request):
+        stats.requisicoes += 1
+        motivo = regras.motivo(request.resource_type, request.url)
+        if motivo:
+            stats.anotar_bloqueio(motivo, request.url)
+            route.abort()
+        else:
+            route.fallback()  # próxima rota (ex.: HAR da reprodução) ou a rede
+
+    ctx.route("**/*", _rota)
+    ctx.on("response", stats._on_response)
+    return stats
+
+
+async def aplicar_bloqueio_async(ctx, regras: Optional[RegrasBloqueio] = None) -> EstatisticasBloqueio:
+    """Instala o bloqueio num BrowserContext da API async."""
+    regras = regras or RegrasBloqueio.do_ambiente()
+    stats = EstatisticasBloqueio()
+
+    async def _rota(route, request):
+        stats.requisicoes += 1
+        motivo = regras.motivo(request.resource_type, request.url)
+        if motivo:
+            stats.anotar_bloqueio(motivo, request.url)
+            await route.abort()
+        else:
+            await route.fallback()
+
+    await ctx.route("**/*", _rota)
+    ctx.on("response", stats._on_response)
+    return stats
@@ -0,0 +1,121 @@
+"""
+cache_escritas.py
+-----------------
+Último estado gravado no Supabase, por (data_coleta, empresa).
+
+⚡ Funcionalidades:
+- Guarda um hash (sha256) da linha normalizada que foi aceita pelo UPSERT.
+- `pendentes(linhas)` devolve só as linhas que mudaram: o resto nem vai
+  para a rede (o preço da vitrine muda poucas vezes por dia; o workflow
+  roda a cada 6h).
+- Conta hits (linha igual, UPSERT evitado) e misses.
+- Mantém só os últimos CACHE_ESCRITAS_DIAS de data_coleta.
+
+Arquivo em `cache/escritas.json` (SUPABASE_CACHE_PATH sobrescreve).
+SUPABASE_CACHE=false desliga; SUPABASE_FORCAR=true envia tudo mesmo igual.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import Counter
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, List
+
+CACHE_PATH = Path(os.getenv("SUPABASE_CACHE_PATH") or Path(__file__).with_name("cache") / "escritas.json")
+CACHE_ESCRITAS_DIAS = int(os.getenv("CACHE_ESCRITAS_DIAS", "14"))
+
+log = logging.getLogger("cache_escritas")
+
+
+def _ligado(nome: str, default: str) -> bool:
+    return os.getenv(nome, default).strip().lower() in ("1", "true", "yes", "y", "on")
+
+
+def hash_linha(linha: Dict[str, Any]) -> str:
+    bruto = json.dumps(linha, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.sha256(bruto.encode("utf-8")).hexdigest()
+
+
+def chave_linha(linha: Dict[str, Any], escopo: str = "") -> str:
+    return f"{escopo}|{linha.get('data_coleta')}|{linha.get('empresa')}"
+
+
+class CacheEscritas:
+    def __init__(self, path: Path = CACHE_PATH):
+        self.path = Path(path)
+        self.estatisticas: Counter = Counter()
+        self._hashes: Dict[str, str] = {}
+        self._carregado = False
+        self._lock = threading.Lock()
+
+    def _carregar(self) -> None:
+        if self._carregado:
+            return
+        self._carregado = True
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                self._hashes = json.load(f)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            log.warning("Cache de escritas ilegível (%s); começando vazio", e)
+
+    def pendentes(self, linhas: Iterable[Dict[str, Any]], escopo: str = "") -> List[Dict[str, Any]]:
+        """Linhas (já normalizadas) cujo conteúdo difere do último gravado."""
+        mudaram = []
+        with self._lock:
+            self._carregar()
+            for n in linhas:
+                if self._hashes.get(chave_linha(n, escopo)) == hash_linha(n):
+                    self.estatisticas["hit"] += 1
+                else:
+                    self.estatisticas["miss"] += 1
+                    mudaram.append(n)
+        return mudaram
+
+    def registrar(self, linhas: Iterable[Dict[str, Any]], escopo: str = "") -> None:
+        """Marca as linhas como gravadas (chamar só depois do 2xx)."""
+        with self._lock:
+            self._carregar()
+            for n in linhas:
+                self._hashes[chave_linha(n, escopo)] = hash_linha(n)
+            self._salvar()
+
+    def _salvar(self) -> None:
+        corte = (date.today() - timedelta(days=CACHE_ESCRITAS_DIAS)).isoformat()
+        self._hashes = {k: v for k, v in self._hashes.items() if k.split("|")[1] >= corte}
+        # chamado depois de um POST que deu certo: falhar aqui não pode derrubar o
+        # envio (o outbox ficaria pendente); no pior caso a linha sobe de novo
+        tmp = None
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # nome único: workers da fila.py gravam o mesmo cache ao mesmo tempo
+            with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=self.path.parent,
+                                             prefix=self.path.name + ".", suffix=".tmp", delete=False) as f:
+                tmp = f.name
+                json.dump(self._hashes, f, ensure_ascii=False)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            log.warning("Falha ao gravar o cache de escritas (%s): %s", self.path, e)
+            if tmp is not None:
+                try:
+                    os.unlink(tmp)
+                except OSError:
+                    pass
+
+    def resumo(self) -> str:
+        return f"hits={self.estatisticas['hit']} misses={self.estatisticas['miss']}"
+
+
+CACHE = CacheEscritas()
+
+def cache_ativo() -> bool:
+    return _ligado("SUPABASE_CACHE", "true")
+
+def forcar_padrao() -> bool:
+    return _ligado("SUPABASE_FORCAR", "false")
@@ -0,0 +1,185 @@
+"""
+captura_api.py
+--------------
+Captura das respostas JSON da vitrine (SPA central-de-pedidos).
+
+Em vez de rolar a página e fazer regex no texto renderizado, escuta as
+respostas XHR/fetch do contexto e extrai os preços direto do JSON.
+
+- VITRINE_API_PADRAO: regex da URL das chamadas que interessam.
+- CAPTURA_API=false desliga o modo (volta ao scraping do DOM).
+- CAPTURA_TIMEOUT_MS: quanto esperar pela resposta (contado da navegação à
+  vitrine) antes do fallback para o DOM.
+"""
+
+import logging
+import os
+import re
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from extracao import campo_do_produto, parse_price
+
+VITRINE_API_PADRAO = os.getenv("VITRINE_API_PADRAO", r"vitrine|produto|preco|price")
+CAPTURA_API = os.getenv("CAPTURA_API", "true").strip().lower() in ("1", "true", "yes", "y", "on")
+CAPTURA_TIMEOUT_MS = int(os.getenv("CAPTURA_TIMEOUT_MS", "10000"))
+
+# cabeçalhos que não fazem sentido reenviar fora do navegador
+HEADERS_IGNORADOS = {"cookie", "content-length", "host", "connection", "accept-encoding"}
+
+CHAVES_NOME = ("descricao", "descricaoproduto", "nomeproduto", "nome", "produto", "description", "name")
+CHAVES_PRECO = ("preco", "valor", "price")
+
+log = logging.getLogger("captura_api")
+
+
+# ------------ Parsing do JSON ------------
+def _nome(d: Dict[str, Any]) -> Optional[str]:
+    for k, v in d.items():
+        if isinstance(v, str) and k.lower() in CHAVES_NOME:
+            return v
+    return None
+
+def _preco(d: Dict[str, Any]) -> Optional[float]:
+    for k, v in d.items():
+        kl = k.lower()
+        if not any(c in kl for c in CHAVES_PRECO):
+            continue
+        if isinstance(v, bool):
+            continue
+        if isinstance(v, (int, float)):
+            return round(float(v), 4)
+        if isinstance(v, str):
+            p = parse_price(v)
+            if p is not None:
+                return p
+    return None
+
+def itens_json(obj: Any) -> Iterator[Tuple[str, float]]:
+    """Percorre o JSON e devolve (nome do produto, preço) de cada item achado."""
+    pilha = [obj]
+    while pilha:
+        atual = pilha.pop()
+        if isinstance(atual, dict):
+            nome, preco = _nome(atual), _preco(atual)
+            if nome and preco is not None:
+                yield nome, preco
+            pilha.extend(v for v in atual.values() if isinstance(v, (dict, list)))
+        elif isinstance(atual, list):
+            pilha.extend(reversed(atual))
+
+def precos_de_json(obj: Any) -> Dict[str, float]:
+    """{campo: preço}; o primeiro item de cada campo vence."""
+    precos: Dict[str, float] = {}
+    for nome, preco in itens_json(obj):
+        campo = campo_do_produto(nome)
+        if campo and campo not in precos:
+            precos[campo] = preco
+    return precos
+
+
+# ------------ Listener ------------
+class CapturaVitrine:
+    """
+    Guarda as respostas JSON da vitrine vistas pelo contexto.
+
+    Anexe ANTES de navegar: `captura.anexar(ctx)`. Os corpos só são lidos
+    depois, em `processar`/`aguardar` (e variantes async) — handlers não
+    fazem I/O.
+    """
+
+    def __init__(self, padrao: str = VITRINE_API_PADRAO):
+        self.padrao = re.compile(padrao, re.IGNORECASE)
+        self.respostas: List[Any] = []
+        self.lidas = 0
+        self.precos: Dict[str, float] = {}
+        self.urls: List[str] = []
+        self.chamadas: List[Dict[str, Any]] = []
+
+    def interessa(self, resp) -> bool:
+        try:
+            if resp.request.resource_type not in ("xhr", "fetch"):
+                return False
+            if "json" not in (resp.headers.get("content-type") or ""):
+                return False
+        except Exception:
+            return False
+        return bool(self.padrao.search(resp.url))
+
+    def _on_response(self, resp) -> None:
+        if self.interessa(resp):
+            self.respostas.append(resp)
+
+    def anexar(self, alvo) -> "CapturaVitrine":
+        alvo.on("response", self._on_response)
+        return self
+
+    def _absorver(self, resp, corpo: Any) -> None:
+        achados = precos_de_json(corpo)
+        if achados:
+            self.urls.append(resp.url)
+            req = resp.request
+            self.chamadas.append({
+                "method": req.method,
+                "url": req.url,
+                "headers": {k: v for k, v in req.headers.items() if k.lower() not in HEADERS_IGNORADOS},
+                "post_data": req.post_data,
+            })
+            for k, v in achados.items():
+                self.precos.setdefault(k, v)
+
+    # --- sync API ---
+    def processar(self) -> None:
+        """Lê as respostas que chegaram desde a última chamada; não espera."""
+        while self.lidas < len(self.respostas):
+            resp = self.respostas[self.lidas]
+            self.lidas += 1
+            try:
+                self._absorver(resp, resp.json())
+            except Exception as e:
+                log.debug("Resposta ignorada (%s): %s", resp.url, e)
+
+    def aguardar(self, page, timeout_ms: int = CAPTURA_TIMEOUT_MS) -> Dict[str, float]:
+        """Espera até alguma resposta trazer preços; {} se estourar o tempo."""
+        limite = time.monotonic() + timeout_ms / 1000
+        while True:
+            self.processar()
+            restante = int((limite - time.monotonic()) * 1000)
+            if self.precos or restante <= 0:
+                break
+            try:
+                page.wait_for_event("response", predicate=self.interessa, timeout=restante)
+            except Exception:
+                self.processar()
+                break
+        if self.precos:
+            log.info("Preços capturados via API (%s)", ", ".join(self.urls))
+        return dict(self.precos)
+
+    # --- async API ---
+    async def processar_async(self) -> None:
+        while self.lidas < len(self.respostas):
+            resp = self.respostas[self.lidas]
+            try:
+                self._absorver(resp, await resp.json())
+            except Exception as e:
+                log.debug("Resposta ignorada (%s): %s", resp.url, e)
+            # só depois de absorvida: se a tarefa for cancelada no await
+            # (esperar_vitrine_async), a resposta é lida de novo na próxima vez
+            self.lidas += 1
+
+    async def aguardar_async(self, page, timeout_ms: int = CAPTURA_TIMEOUT_MS) -> Dict[str, float]:
+        limite = time.monotonic() + timeout_ms / 1000
+        while True:
+            await self.processar_async()
+            restante = int((limite - time.monotonic()) * 1000)
+            if self.precos or restante <= 0:
+                break
+            try:
+                await page.wait_for_event("response", predicate=self.interessa, timeout=restante)
+            except Exception:
+                await self.processar_async()
+                break
+        if self.precos:
+            log.info("Preços capturados via API (%s)", ", ".join(self.urls))
+        return dict(self.precos)
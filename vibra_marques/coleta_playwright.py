@@ -1,25 +1,12 @@
 from playwright.sync_api import sync_playwright
-import time
 import json
+from extracao import estruturar_card
+from prontidao import colher_cards
 
 def rolar_container(page, max_tentativas=20, intervalo=1.5):
-    produtos_vistos = set()
-    for tentativa in range(max_tentativas):
-        cards = page.query_selector_all(".card-produto")
-        novos = {card.inner_text() for card in cards}
-        if novos <= produtos_vistos:
-            break
-        produtos_vistos |= novos
-
-        # Rola o container com JavaScript
-        page.evaluate("""
-            const container = document.querySelector('.scrollbar-container');
-            if (container) {
-                container.scrollBy(0, container.scrollHeight);
-            }
-        """)
-        time.sleep(intervalo)
-    return list(produtos_vistos)
+    # Tudo dentro da página: rola o container e colhe os cards num único evaluate
+    return colher_cards(page, ".card-produto", ".scrollbar-container",
+                        max_passos=max_tentativas, silencio_ms=int(intervalo * 1000))
 
 with sync_playwright() as p:
     browser = p.chromium.launch(headless=False)
@@ -47,18 +34,7 @@ with sync_playwright() as p:
 
     print(f"✅ {len(produtos_raw)} produtos extraídos!")
 
-    produtos_estruturados = []
-    for texto in produtos_raw:
-        linhas = [l.strip() for l in texto.split("\n") if l.strip()]
-        if len(linhas) >= 3:
-            produto = {
-                "nome": linhas[0],
-                "codigo": next((l.split(":")[1].strip() for l in linhas if l.startswith("COD:")), None),
-                "base": next((l.split(":")[1].strip() for l in linhas if l.startswith("Base:")), None),
-                "preco": next((l.replace("R$", "").replace(",", ".").strip() for l in linhas if "R$" in l), None),
-                "validade": next((l.strip() for l in linhas if "dia" in l.lower()), None)
-            }
-            produtos_estruturados.append(produto)
+    produtos_estruturados = [p for p in map(estruturar_card, produtos_raw) if p]
 
     with open("produtos_vitrine.json", "w", encoding="utf-8") as f:
         json.dump(produtos_estruturados, f, indent=2, ensure_ascii=False)
@@ -12,18 +12,12 @@ import os
 import json
 import time
 import logging
-import schedule
 from datetime import datetime
 from typing import List, Optional
 from dataclasses import dataclass, asdict
 
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
-
-# SUPABASE
-from supabase import create_client, Client
+# Selenium, webdriver_manager, supabase e schedule são importados só onde são
+# usados: importar este módulo não sobe driver nem abre conexão.
 
 # CONFIGURAÇÃO DE LOG
 logging.basicConfig(
@@ -35,7 +29,15 @@ logging.basicConfig(
 # ========== CONFIGURAÇÕES SUPABASE ==========
 SUPABASE_URL = "https://seu-projeto.supabase.co"
 SUPABASE_KEY = "sua-api-key"
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+_supabase = None
+
+def cliente_supabase():
+    """Cliente criado na primeira escrita, não no import."""
+    global _supabase
+    if _supabase is None:
+        from supabase import create_client
+        _supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+    return _supabase
 
 # ========== MODELO DE DADO ==========
 @dataclass
@@ -53,6 +55,9 @@ class ColetorAutomatizadoCompleto:
 
     def setup_driver(self) -> bool:
         try:
+            from selenium import webdriver
+            from selenium.webdriver.chrome.service import Service
+            from webdriver_manager.chrome import ChromeDriverManager
             service = Service(ChromeDriverManager().install())
             options = webdriver.ChromeOptions()
             options.add_argument("--headless=new")
@@ -72,6 +77,7 @@ class ColetorAutomatizadoCompleto:
 
     def coletar_precos(self, distribuidora: str):
         try:
+            from selenium.webdriver.common.by import By
             # Exemplo: Buscando preços por regex ou XPath
             elementos = self.driver.find_elements(By.XPATH, "//div[contains(text(),'R$')]")
             for el in elementos:
@@ -91,9 +97,11 @@ class ColetorAutomatizadoCompleto:
 
     def salvar_supabase(self):
         try:
-            for item in self.precos:
-                supabase.table("precos_combustiveis").insert(asdict(item)).execute()
-            logging.info("Preços enviados ao Supabase.")
+            if not self.precos:
+                return
+            # uma requisição para a coleta inteira, não uma por preço
+            cliente_supabase().table("precos_combustiveis").insert([asdict(item) for item in self.precos]).execute()
+            logging.info(f"{len(self.precos)} preços enviados ao Supabase.")
         except Exception as e:
             logging.error(f"Erro ao salvar no Supabase: {e}")
 
@@ -136,9 +144,9 @@ def job():
     coletor.executar_coleta_completa()
     logging.info("Coleta finalizada")
 
-schedule.every().day.at("08:00").do(job)
-
 if __name__ == "__main__":
+    import schedule
+    schedule.every().day.at("08:00").do(job)
     logging.info("Script iniciado.")
     job()  # executa na hora
     while True:
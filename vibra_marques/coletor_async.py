@@ -0,0 +1,381 @@
+"""
+coletor_async.py
+----------------
+Coleta concorrente de várias contas num único navegador Playwright.
+
+⚡ Funcionamento:
+- Sobe UM Chromium e abre um `BrowserContext` isolado por conta
+  (cookies/sessão não se misturam).
+- As contas rodam em paralelo, limitadas por COLETA_CONCORRENCIA.
+- Cada conta gera um resultado no mesmo formato de `backup/coleta_*.json`.
+- Cada conta que termina é enfileirada no EscritorSupabase: o UPSERT roda
+  numa thread enquanto as outras contas ainda coletam, e as que terminam
+  durante um envio seguem juntas no próximo lote (COLETA_ENVIAR=false desliga).
+- Conta que falha grava suas evidências (evidencias.py) e a pasta vai em
+  `dados_extras.evidencias`; conta que dá certo não escreve nada.
+- HAR_MODO=gravar|reproduzir grava a sessão ou roda offline a partir dela (har.py).
+
+Credenciais por conta no .env: <CONTA>_USER / <CONTA>_PASS
+(ex.: VIBRA_MARQUES_USER / VIBRA_MARQUES_PASS).
+URLs podem ser sobrescritas com <CONTA>_LOGIN_URL / <CONTA>_VITRINE_URL.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from playwright.async_api import async_playwright
+
+import sessoes
+from bloqueio import aplicar_bloqueio_async, bloqueio_ativo
+from prontidao import Fases, esperar_vitrine_async
+from metricas import METRICAS
+from evidencias import Evidencias
+from snapshots import guardar_pagina_async
+import har
+from seletores import ENTER, SELETORES, id_frame
+from captura_api import CAPTURA_API, CAPTURA_TIMEOUT_MS, CapturaVitrine
+import supabase_rest
+from supabase_async import EscritorSupabase
+from historico import registrar_coleta
+from variacoes import processar_coleta
+from coletor_turbo import (
+    CANDIDATOS_LOGIN, CANDIDATOS_SUBMIT, DOTENV_PATH, PW_TIMEOUT, URL_LOGIN, URL_VITRINE,
+    env, extrair_precos_texto, montar_payload, to_bool,
+)
+
+# ------------ Configs ------------
+BACKUP_DIR = Path(__file__).with_name("backup")
+MAX_CONCORRENCIA = int(os.getenv("COLETA_CONCORRENCIA", "4"))
+
+log = logging.getLogger("coletor_async")
+
+
+@dataclass
+class Conta:
+    nome: str                 # identificador (prefixo das variáveis de ambiente)
+    empresa: str              # valor gravado na coluna `empresa`
+    url_login: str = URL_LOGIN
+    url_vitrine: str = URL_VITRINE
+
+    def configurada(self) -> bool:
+        return bool((os.getenv(f"{self.nome}_LOGIN_URL") or self.url_login)
+                    and (os.getenv(f"{self.nome}_VITRINE_URL") or self.url_vitrine))
+
+    def urls(self) -> tuple:
+        login = os.getenv(f"{self.nome}_LOGIN_URL") or self.url_login
+        vitrine = os.getenv(f"{self.nome}_VITRINE_URL") or self.url_vitrine
+        if not login or not vitrine:
+            raise RuntimeError(f"URLs do portal não configuradas para {self.nome}")
+        return login, vitrine
+
+    def credenciais(self) -> tuple:
+        return env(f"{self.nome}_USER"), env(f"{self.nome}_PASS")
+
+
+# Contas vistas em backup/coleta_*.json. Ipiranga usa outro portal: fica fora
+# da varredura padrão até IPIRANGA_BB_LOGIN_URL / IPIRANGA_BB_VITRINE_URL
+# existirem (pedida pelo nome sem eles, falha com o motivo).
+CONTAS = [
+    Conta("VIBRA_AP", "VIBRA AP"),
+    Conta("VIBRA_BB", "VIBRA BB"),
+    Conta("VIBRA_MARQUES", "VIBRA MARQUES"),
+    Conta("IPIRANGA_BB", "IPIRANGA BB", url_login="", url_vitrine=""),
+]
+
+
+def contas_selecionadas(nomes: Optional[List[str]] = None) -> List[Conta]:
+    """Filtra CONTAS pelos nomes pedidos (ou pela env COLETA_CONTAS); sem nomes, só as com URLs."""
+    if nomes is None:
+        bruto = os.getenv("COLETA_CONTAS", "")
+        nomes = [n.strip().upper() for n in bruto.split(",") if n.strip()]
+    if not nomes:
+        sem_url = [c.nome for c in CONTAS if not c.configurada()]
+        if sem_url:
+            log.info("Fora da varredura (sem URLs do portal): %s", ", ".join(sem_url))
+        return [c for c in CONTAS if c.configurada()]
+    por_nome = {c.nome: c for c in CONTAS}
+    faltando = [n for n in nomes if n not in por_nome]
+    if faltando:
+        raise RuntimeError(f"Conta(s) desconhecida(s): {', '.join(faltando)}")
+    return [por_nome[n] for n in nomes]
+
+
+# ------------ Login / vitrine (async) ------------
+async def _try_fill_credentials(alvo, user: str, pwd: str, url: str) -> Optional[Tuple[str, str]]:
+    for su, sp in SELETORES.ordem_login(url, CANDIDATOS_LOGIN):
+        try:
+            await alvo.locator(su).first.fill(user, timeout=2500)
+            await alvo.locator(sp).first.fill(pwd, timeout=2500)
+            METRICAS.contar("seletor.login", candidato=CANDIDATOS_LOGIN.index((su, sp)))
+            return su, sp
+        except Exception:
+            continue
+    return None
+
+
+async def _login(page, url_login: str, user: str, pwd: str) -> None:
+    await page.goto(url_login, wait_until="domcontentloaded")
+    try:
+        await page.wait_for_selector('input[type="password"]', state="attached", timeout=10000)
+    except Exception:
+        pass  # pode estar num iframe
+    # frame principal e iframes com campo de senha (o do último login primeiro)
+    alvo, par = None, None
+    for fr in SELETORES.ordem_frames(url_login, page.frames, page.main_frame):
+        try:
+            if fr != page.main_frame and await fr.locator('input[type="password"]').first.count() == 0:
+                continue
+            par = await _try_fill_credentials(fr, user, pwd, url_login)
+        except Exception:
+            continue
+        if par:
+            alvo = fr
+            break
+    if par is None:
+        SELETORES.esquecer(url_login)  # nenhum candidato serviu: o vencedor guardado não vale mais
+        raise RuntimeError("Campos de login não encontrados.")
+
+    enviado = None
+    for b in SELETORES.ordem_submit(url_login, CANDIDATOS_SUBMIT + (ENTER,)):
+        try:
+            if b == ENTER:
+                await alvo.locator('input[type="password"]').first.press("Enter")
+            else:
+                await alvo.locator(b).first.click(timeout=2500)
+            enviado = b
+            METRICAS.contar("seletor.submit", candidato="enter" if b == ENTER else CANDIDATOS_SUBMIT.index(b))
+            break
+        except Exception:
+            continue
+    if enviado is None:
+        SELETORES.esquecer(url_login)
+        return
+    try:
+        await page.wait_for_url(lambda u: "/login" not in u, timeout=PW_TIMEOUT)
+        SELETORES.promover(url_login, login=par, frame=id_frame(alvo, page.main_frame), submit=enviado)
+    except Exception:
+        # campos e botão funcionaram: não sair da tela é credencial/portal, não
+        # seletor — o cache é por host e vale para as outras contas
+        log.warning("Login não saiu da tela de login (%s)", url_login)
+
+
+async def _sessao_ativa(page) -> bool:
+    if "/login" in page.url:
+        return False
+    try:
+        return await page.locator('input[type="password"]').count() == 0
+    except Exception:
+        return False
+
+
+async def _abrir_vitrine(page, url_vitrine: str, captura: Optional[CapturaVitrine]) -> Optional[Dict[str, float]]:
+    inicio = time.monotonic()
+    await page.goto(url_vitrine, wait_until="domcontentloaded")
+    sinal = await esperar_vitrine_async(page, captura, PW_TIMEOUT)
+    log.debug("Vitrine: sinal=%s", sinal)
+    if captura is not None:
+        # DOM pronto antes da API: ela ainda tem até CAPTURA_TIMEOUT_MS desde a navegação
+        espera = 0 if sinal == "login" else CAPTURA_TIMEOUT_MS - int((time.monotonic() - inicio) * 1000)
+        precos = await captura.aguardar_async(page, timeout_ms=max(0, espera))
+        if precos:
+            return precos
+        log.info("Nenhuma resposta de preços capturada; usando o DOM.")
+    return None
+
+
+async def coletar_conta(browser, conta: Conta) -> Dict[str, Any]:
+    """Coleta uma conta num contexto próprio. Nunca levanta: erros vão no resultado."""
+    inicio = time.time()
+    resultado: Dict[str, Any] = {
+        "timestamp": datetime.now().isoformat(),
+        "distribuidora": conta.nome,
+        "sucesso": False,
+        "tempo_execucao": 0.0,
+        "erro": None,
+        "dados_extras": None,
+        "precos": [],
+    }
+    extras: Dict[str, Any] = {}
+    fases = Fases(conta.nome)
+    evid = Evidencias(conta.nome)
+    ctx = page = None
+    try:
+        url_login, url_vitrine = conta.urls()
+        user, pwd = har.credenciais_da_reproducao() or conta.credenciais()
+        # com HAR (gravar/reproduzir) o login entra sempre: é ele que está no arquivo
+        estado = None if har.har_modo() else sessoes.estado_salvo(conta.nome)
+        with fases.fase("contexto"):
+            ctx = await browser.new_context(ignore_https_errors=True, viewport={"width": 1280, "height": 800},
+                                            storage_state=estado, **har.opcoes_contexto(conta.nome))
+            ctx.set_default_timeout(PW_TIMEOUT)
+            await har.reproduzir_async(ctx, conta.nome)
+            METRICAS.anexar_rede(ctx, conta.nome)
+            bloqueio = await aplicar_bloqueio_async(ctx) if bloqueio_ativo() else None
+            captura = CapturaVitrine().anexar(ctx) if CAPTURA_API else None
+            await evid.anexar_async(ctx)
+            page = await ctx.new_page()
+
+        # Sessão salva: tenta a vitrine direto, login só se expirou
+        precos = None
+        hit = False
+        if estado:
+            with fases.fase("sessao"):
+                precos = await _abrir_vitrine(page, url_vitrine, captura)
+                hit = precos is not None or await _sessao_ativa(page)
+            await evid.passo_async(page, "sessao")
+        sessoes.registrar(conta.nome, hit)
+        extras["sessao"] = "hit" if hit else "miss"
+
+        if not hit:
+            with fases.fase("login"):
+                await _login(page, url_login, user, pwd)
+            await evid.passo_async(page, "login")
+            with fases.fase("vitrine"):
+                precos = await _abrir_vitrine(page, url_vitrine, captura)
+                if not har.reproduzindo() and (precos is not None or await _sessao_ativa(page)):
+                    await ctx.storage_state(path=str(sessoes.caminho_sessao(conta.nome)))
+            await evid.passo_async(page, "vitrine")
+        if captura is not None and not har.reproduzindo():
+            sessoes.salvar_api(conta.nome, captura.chamadas)
+        extras["fonte"] = "api" if precos is not None else "dom"
+        if bloqueio is not None:
+            extras["bloqueio"] = bloqueio.como_dict()
+            log.info("%s bloqueio: %s", conta.nome, bloqueio.resumo())
+        body_text = None
+        if precos is None:
+            with fases.fase("dom"):
+                body_text = await page.locator("body").inner_text(timeout=15000)
+                precos = extrair_precos_texto(body_text)
+        with fases.fase("snapshot"):
+            await guardar_pagina_async(page, "vitrine", body_text)
+
+        payload = montar_payload(precos, empresa=conta.empresa)
+        payload["data_coleta"] = payload["data_coleta"].isoformat()
+        resultado["precos"] = payload
+        resultado["sucesso"] = True
+        await evid.encerrar_async()
+    except Exception as e:
+        resultado["erro"] = f"Erro na coleta de {conta.nome}: {e}"
+        log.warning(resultado["erro"])
+        pasta = await evid.falhou_async(e, page)
+        if pasta is not None:
+            extras["evidencias"] = str(pasta)
+    finally:
+        if ctx is not None:
+            try:
+                await ctx.close()
+            except Exception:
+                pass
+            if har.gravando():
+                try:
+                    har.redigir(conta.nome, *conta.credenciais())
+                except Exception as e:
+                    log.warning("HAR de %s não redigido: %s", conta.nome, e)
+        resultado["tempo_execucao"] = time.time() - inicio
+        METRICAS.registrar("coleta.conta", resultado["tempo_execucao"], resultado["sucesso"], conta=conta.nome)
+        extras["fases"] = fases.como_dict()
+        resultado["dados_extras"] = extras
+    return resultado
+
+
+async def coletar_todas(contas: Optional[List[Conta]] = None,
+                        concorrencia: int = MAX_CONCORRENCIA,
+                        browser=None,
+                        escritor: Optional[EscritorSupabase] = None) -> List[Dict[str, Any]]:
+    """
+    Coleta todas as contas em paralelo num único navegador.
+    Se `browser` vier de fora ele é reutilizado e não é fechado aqui.
+    Com `escritor`, cada conta bem-sucedida é enfileirada para o Supabase
+    assim que termina (o envio corre junto com a coleta das demais).
+    """
+    load_dotenv(dotenv_path=DOTENV_PATH)
+    contas = contas if contas is not None else contas_selecionadas()
+    sem = asyncio.Semaphore(max(1, concorrencia))
+
+    async def _uma(b, conta: Conta) -> Dict[str, Any]:
+        async with sem:
+            log.info("Coletando %s...", conta.nome)
+            r = await coletar_conta(b, conta)
+        if escritor is not None and r["sucesso"]:
+            escritor.enviar(r["precos"])
+        return r
+
+    if browser is not None:
+        return list(await asyncio.gather(*(_uma(browser, c) for c in contas)))
+
+    headless = to_bool(os.getenv("HEADLESS", "true"))
+    async with async_playwright() as pw:
+        b = await getattr(pw, os.getenv("BROWSER", "chromium")).launch(headless=headless, args=["--disable-gpu"])
+        try:
+            return list(await asyncio.gather(*(_uma(b, c) for c in contas)))
+        finally:
+            await b.close()
+
+
+def salvar_backup(resultado: Dict[str, Any]) -> Path:
+    BACKUP_DIR.mkdir(exist_ok=True)
+    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+    path = BACKUP_DIR / f"coleta_{resultado['distribuidora']}_{ts}.json"
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def escritor_do_ambiente() -> Optional[EscritorSupabase]:
+    """EscritorSupabase do .env, ou None com COLETA_ENVIAR=false (ou reproduzindo um HAR)."""
+    if har.reproduzindo() or not to_bool(os.getenv("COLETA_ENVIAR", "true")):
+        return None
+    load_dotenv(dotenv_path=DOTENV_PATH)
+    return EscritorSupabase(supabase_rest.cliente(env("SUPABASE_URL"), env("SUPABASE_KEY")))
+
+
+def registrar_resultado(r: Dict[str, Any]) -> None:
+    """Backup, variações e histórico de um resultado de coletar_conta."""
+    if not har.reproduzindo():  # preços da gravação não são coleta de hoje
+        salvar_backup(r)
+    if r["sucesso"] and not har.reproduzindo():
+        processar_coleta(r["distribuidora"], r["precos"], r["timestamp"])
+        registrar_coleta(r["distribuidora"], r["precos"], r["timestamp"])
+    status = "✅" if r["sucesso"] else "❌"
+    print(f"{status} {r['distribuidora']}: {r['tempo_execucao']:.1f}s", r["precos"] or r["erro"])
+
+
+# ------------ MAIN ------------
+async def varrer(contas: Optional[List[Conta]] = None, browser=None) -> List[Dict[str, Any]]:
+    """Uma varredura completa: coleta, backup, variações, histórico e envio."""
+    inicio = time.time()
+    METRICAS.iniciar("coletor_async")
+    resultados: List[Dict[str, Any]] = []
+    try:
+        escritor = escritor_do_ambiente()
+        resultados = await coletar_todas(contas, browser=browser, escritor=escritor)
+        for r in resultados:
+            registrar_resultado(r)
+
+        if escritor is not None:
+            with METRICAS.span("supabase.fechar"):
+                enviados = await escritor.fechar()
+            for status, body in enviados:
+                print("📡 UPSERT Status:", status, body or "")
+        print(f"⏱️ Varredura completa em {time.time() - inicio:.1f}s")
+        return resultados
+    finally:
+        METRICAS.finalizar(contas=len(resultados), sucessos=sum(1 for r in resultados if r["sucesso"]),
+                           **({"har": har.har_modo()} if har.har_modo() else {}))
+
+
+async def main_async() -> List[Dict[str, Any]]:
+    return await varrer()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(message)s")
+    asyncio.run(main_async())
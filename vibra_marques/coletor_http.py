@@ -0,0 +1,149 @@
+"""
+coletor_http.py
+---------------
+Coleta sem navegador: reenvia as chamadas da vitrine com `requests.Session`.
+
+⚡ Funcionamento:
+- Usa o storage_state salvo em `sessoes/<CONTA>.json` (cookies + localStorage)
+  e as chamadas gravadas em `sessoes/<CONTA>_api.json` pelo modo de captura.
+- Se a sessão expirou (401/403) ou ainda não há chamadas gravadas, faz UM
+  login com Playwright (`coletor_turbo.coletar`), que renova os dois arquivos.
+- Devolve o mesmo dict de `coletor_turbo.coletar`.
+"""
+
+import json
+import logging
+import os
+import sys
+from typing import Any, Dict, Optional
+
+import requests
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+
+import coletor_turbo
+import sessoes
+from captura_api import precos_de_json
+from historico import registrar_coleta
+from metricas import METRICAS
+from variacoes import processar_coleta
+from coletor_turbo import DOTENV_PATH, EMPRESA, HTTP_TIMEOUT, SB, montar_payload, to_bool
+
+log = logging.getLogger("coletor_http")
+
+# chaves do localStorage que costumam guardar o token do SPA
+CHAVES_TOKEN = ("token", "access_token", "accesstoken", "jwt", "id_token", "auth")
+
+_SESSOES_HTTP: Dict[str, requests.Session] = {}
+
+
+class SessaoExpirada(RuntimeError):
+    pass
+
+
+# ------------ Sessão requests ------------
+def _token_local_storage(estado: Dict[str, Any]) -> Optional[str]:
+    for origem in estado.get("origins", []):
+        for item in origem.get("localStorage", []):
+            nome, valor = item.get("name", "").lower(), item.get("value") or ""
+            if not any(c in nome for c in CHAVES_TOKEN):
+                continue
+            if valor.startswith("{"):
+                try:
+                    dados = json.loads(valor)
+                except ValueError:
+                    continue
+                valor = next((dados[k] for k in ("access_token", "accessToken", "token") if dados.get(k)), "")
+            if valor.count(".") == 2:  # parece um JWT
+                return valor
+    return None
+
+
+def _sessao_http(conta: str) -> Optional[requests.Session]:
+    """Session com pool keep-alive e os cookies/token do storage_state."""
+    caminho = sessoes.estado_salvo(conta)
+    if not caminho:
+        return None
+    with open(caminho, encoding="utf-8") as f:
+        estado = json.load(f)
+
+    s = _SESSOES_HTTP.get(conta)
+    if s is None:
+        s = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=4)
+        s.mount("https://", adapter)
+        s.mount("http://", adapter)
+        _SESSOES_HTTP[conta] = s
+    s.cookies.clear()
+    for c in estado.get("cookies", []):
+        s.cookies.set(c["name"], c["value"], domain=c.get("domain"), path=c.get("path", "/"))
+    token = _token_local_storage(estado)
+    if token:
+        s.headers["Authorization"] = f"Bearer {token}"
+    return s
+
+
+# ------------ Coleta ------------
+def coletar_http(conta: str = "VIBRA_MARQUES", empresa: str = EMPRESA) -> Optional[Dict[str, Any]]:
+    """Coleta só com HTTP. None se não há sessão/chamadas gravadas."""
+    chamadas = sessoes.carregar_api(conta)
+    s = _sessao_http(conta) if chamadas else None
+    if s is None:
+        return None
+
+    precos: Dict[str, float] = {}
+    for ch in chamadas:
+        r = s.request(ch["method"], ch["url"], headers=ch.get("headers") or {},
+                      data=ch.get("post_data"), timeout=HTTP_TIMEOUT)
+        if r.status_code in (401, 403):
+            raise SessaoExpirada(f"{conta}: HTTP {r.status_code} em {ch['url']}")
+        r.raise_for_status()
+        for k, v in precos_de_json(r.json()).items():
+            precos.setdefault(k, v)
+    if not precos:
+        return None
+    return montar_payload(precos, empresa=empresa)
+
+
+def coletar() -> Dict[str, Any]:
+    """Modo HTTP com fallback para um login no navegador."""
+    try:
+        with METRICAS.span("coleta.http", conta="VIBRA_MARQUES"):
+            payload = coletar_http()
+        if payload is not None:
+            sessoes.registrar("VIBRA_MARQUES", True)
+            return payload
+        log.info("Sem sessão/chamadas gravadas; login pelo navegador.")
+    except (SessaoExpirada, requests.RequestException, ValueError) as e:
+        log.info("Modo HTTP falhou (%s); login pelo navegador.", e)
+    METRICAS.contar("coleta.fallback_navegador")
+    return coletor_turbo.coletar()
+
+
+# ------------ MAIN ------------
+def main():
+    load_dotenv(dotenv_path=DOTENV_PATH)
+    METRICAS.iniciar("coletor_http")
+    try:
+        payload = coletar()
+        log.info("Coleta: %s", payload)
+        processar_coleta(EMPRESA, payload)
+        registrar_coleta(EMPRESA, payload)
+        if not to_bool(os.getenv("COLETA_ENVIAR", "true")):
+            print("📴 COLETA_ENVIAR=false: sem envio ao Supabase")
+            return 0
+
+        status, body = SB().upsert(payload, return_representation=False)
+        print("📡 UPSERT Status:", status)
+        print("📄 UPSERT Resposta:", body if body else "(vazio)")
+        return 0
+    except Exception as e:
+        log.exception("Falha no coletor HTTP: %s", e)
+        print("❌ Erro:", e)
+        return 1
+    finally:
+        METRICAS.finalizar()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
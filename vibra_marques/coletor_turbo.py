@@ -2,9 +2,24 @@
 from dotenv import load_dotenv
 from pathlib import Path
 from datetime import date
-from typing import Dict, Any, Optional, Tuple
-from playwright.sync_api import sync_playwright, TimeoutError as PwTimeout
-import os, re, requests, time, logging
+from typing import Dict, Any, List, Optional, Tuple, Union
+from playwright.sync_api import sync_playwright
+import os, sys, time, logging
+import sessoes
+import supabase_rest
+from supabase_rest import normalize_payload
+from outbox import OUTBOX, outbox_ativo
+from historico import registrar_coleta
+from variacoes import processar_coleta
+from extracao import extrair_precos_texto
+from captura_api import CAPTURA_API, CAPTURA_TIMEOUT_MS, CapturaVitrine
+from bloqueio import aplicar_bloqueio, bloqueio_ativo
+from prontidao import Fases, esperar_vitrine
+from metricas import METRICAS
+from evidencias import Evidencias
+from snapshots import guardar_pagina
+import har
+from seletores import ENTER, SELETORES, id_frame
 
 # ------------ Configs rápidas ------------
 DOTENV_PATH = Path(__file__).with_name(".env")
@@ -29,179 +44,238 @@ def env(name: str, default: Optional[str] = None) -> str:
 def to_bool(v: str) -> bool:
     return str(v).strip().lower() in ("1","true","yes","y","on")
 
-NUM_RE = re.compile(r"([-+]?\d{1,3}(?:[.\s]\d{3})*(?:[.,]\d{2,4})|[-+]?\d+[.,]\d{2,4})")
-def parse_price(s: str) -> Optional[float]:
-    m = NUM_RE.search(s)
-    if not m:
-        return None
-    x = m.group(1).replace(" ", "")
-    if "," in x and "." in x:
-        x = x.replace(".", "")
-    x = x.replace(",", ".")
-    try:
-        return round(float(x), 4)
-    except ValueError:
-        return None
-
-def normalize_payload(p: Dict[str, Any]) -> Dict[str, Any]:
-    out = dict(p)
-    if isinstance(out.get("data_coleta"), date):
-        out["data_coleta"] = out["data_coleta"].isoformat()
-    if "gasolina_grid" in out and out["gasolina_grid"] is not None:
-        out["gasolina_aditivada"] = out["gasolina_grid"]
-        out.pop("gasolina_grid", None)
-    for k in ("gasolina_comum","gasolina_aditivada","etanol_hidratado","diesel_s10","diesel_s10_aditivado"):
-        if k in out and out[k] is not None:
-            out[k] = round(float(out[k]), 4)
-    return out
-
 # ------------ Supabase ------------
 class SB:
     def __init__(self):
         load_dotenv(dotenv_path=DOTENV_PATH)
         self.base = env("SUPABASE_URL").rstrip("/")
         self.key = env("SUPABASE_KEY")
+        self.cliente = supabase_rest.cliente(self.base, self.key)  # Session compartilhada (keep-alive)
 
-    def upsert(self, precos: Dict[str, Any], return_representation: bool=False) -> Tuple[int, str]:
-        url = f"{self.base}/rest/v1/{TABLE}?on_conflict=data_coleta,empresa"
-        headers = {
-            "apikey": self.key,
-            "Authorization": f"Bearer {self.key}",
-            "Content-Type": "application/json",
-            "Prefer": "resolution=merge-duplicates," + ("return=representation" if return_representation else "return=minimal"),
-        }
-        body = normalize_payload(precos)
-        for i in range(RETRIES_HTTP):
-            try:
-                r = requests.post(url, headers=headers, json=body, timeout=HTTP_TIMEOUT)
-                if r.status_code >= 500 and i < RETRIES_HTTP-1:
-                    time.sleep(1.2*(i+1))
-                    continue
-                return r.status_code, r.text or ""
-            except requests.RequestException as e:
-                if i == RETRIES_HTTP-1:
-                    return 0, f"Erro de rede: {e}"
-                time.sleep(1.2*(i+1))
-        return 0, "Erro desconhecido"
+    def upsert(self, precos: Union[Dict[str, Any], List[Dict[str, Any]]], return_representation: bool=False,
+               forcar: Optional[bool]=None) -> Tuple[int, str]:
+        """
+        Uma linha ou várias (varredura de contas): sempre em lote, um POST por fatia.
+        Linhas iguais à última gravada não vão para a rede, salvo `forcar=True`.
+        Com o outbox ligado a linha é gravada localmente antes; se o envio
+        falhar ela fica pendente para `python outbox.py replay`.
+        """
+        if not outbox_ativo():
+            return self.cliente.upsert(precos, return_representation=return_representation, table=TABLE,
+                                       timeout=HTTP_TIMEOUT, forcar=forcar)
+        ids = OUTBOX.gravar(precos, TABLE)
+        if ids and OUTBOX.contagem().get("pendente", 0) > len(ids):
+            # atraso antes da coleta nova: o preço mais recente é o último a chegar
+            OUTBOX.enviar(self.cliente, ate_id=min(ids) - 1)
+        return OUTBOX.enviar(self.cliente, ids=ids, return_representation=return_representation, forcar=forcar)
+
+    def ultimos(self, empresa: str = EMPRESA, limit: int = 5) -> Tuple[int, str]:
+        return self.cliente.ultimos(empresa, limit=limit, table=TABLE, timeout=HTTP_TIMEOUT)
 
 # ------------ Coleta Playwright enxuta ------------
-def _try_fill_credentials(page, user: str, pwd: str) -> bool:
-    candidates = [
-        ('input[name="username"]', 'input[name="password"]'),
-        ('input[name="usuario"]',  'input[name="senha"]'),
-        ('input[formcontrolname="username"]','input[formcontrolname="password"]'),
-        ('input[placeholder*="Usu" i]','input[placeholder*="Sen" i]'),
-        ('input[type="text"]','input[type="password"]'),
-        ('#username','#password'),
-    ]
-    for su, sp in candidates:
+CANDIDATOS_LOGIN = [
+    ('input[name="username"]', 'input[name="password"]'),
+    ('input[name="usuario"]',  'input[name="senha"]'),
+    ('input[formcontrolname="username"]','input[formcontrolname="password"]'),
+    ('input[placeholder*="Usu" i]','input[placeholder*="Sen" i]'),
+    ('input[type="text"]','input[type="password"]'),
+    ('#username','#password'),
+]
+CANDIDATOS_SUBMIT = ('button[type="submit"]','button:has-text("Entrar")','button:has-text("Login")','input[type="submit"]','[role="button"]')
+
+def _try_fill_credentials(page, user: str, pwd: str, url: str = URL_LOGIN) -> Optional[Tuple[str, str]]:
+    """Preenche usuário/senha (vencedor do último login primeiro); devolve o par que funcionou."""
+    for su, sp in SELETORES.ordem_login(url, CANDIDATOS_LOGIN):
         try:
             page.locator(su).first.fill(user, timeout=2500)
             page.locator(sp).first.fill(pwd,  timeout=2500)
-            return True
+            METRICAS.contar("seletor.login", candidato=CANDIDATOS_LOGIN.index((su, sp)))
+            return su, sp
+        except Exception:
+            continue
+    return None
+
+def _login(ctx, page, user: str, pwd: str) -> None:
+    page.goto(URL_LOGIN, wait_until="domcontentloaded")
+    try:
+        page.wait_for_selector('input[type="password"]', state="attached", timeout=10000)
+    except Exception:
+        pass  # pode estar num iframe
+    # frame principal e iframes com campo de senha (o do último login primeiro)
+    alvo, par = None, None
+    for fr in SELETORES.ordem_frames(URL_LOGIN, page.frames, page.main_frame):
+        try:
+            if fr != page.main_frame and fr.locator('input[type="password"]').first.count() == 0:
+                continue
+            par = _try_fill_credentials(fr, user, pwd)
+        except Exception:
+            continue
+        if par:
+            alvo = fr
+            break
+    if par is None:
+        SELETORES.esquecer(URL_LOGIN)  # nenhum candidato serviu: o vencedor guardado não vale mais
+        raise RuntimeError("Campos de login não encontrados.")
+
+    # submit (Enter no campo de senha é o último recurso)
+    enviado = None
+    for b in SELETORES.ordem_submit(URL_LOGIN, CANDIDATOS_SUBMIT + (ENTER,)):
+        try:
+            if b == ENTER:
+                alvo.locator('input[type="password"]').first.press("Enter")
+            else:
+                alvo.locator(b).first.click(timeout=2500)
+            enviado = b
+            METRICAS.contar("seletor.submit", candidato="enter" if b == ENTER else CANDIDATOS_SUBMIT.index(b))
+            break
         except Exception:
             continue
-    return False
+    if enviado is None:
+        SELETORES.esquecer(URL_LOGIN)
+        return
+    try:
+        ctx.pages[0].wait_for_url(lambda u: "/login" not in u, timeout=PW_TIMEOUT)
+        SELETORES.promover(URL_LOGIN, login=par, frame=id_frame(alvo, page.main_frame), submit=enviado)
+    except Exception:
+        # campos e botão funcionaram: não sair da tela é credencial/portal, não
+        # seletor — o cache é por host e vale para as outras contas
+        log.warning("Login não saiu da tela de login (%s)", URL_LOGIN)
+
+def _sessao_ativa(page) -> bool:
+    """Vitrine aberta com storage_state: se caiu no login, a sessão expirou."""
+    if "/login" in page.url:
+        return False
+    try:
+        return page.locator('input[type="password"]').count() == 0
+    except Exception:
+        return False
+
+def montar_payload(precos: Dict[str, Optional[float]], empresa: str = EMPRESA) -> Dict[str, Any]:
+    return {
+        "data_coleta": date.today(),
+        "empresa": empresa,
+        "gasolina_comum": precos.get("gasolina_comum"),
+        "gasolina_grid": precos.get("gasolina_grid"),
+        "etanol_hidratado": precos.get("etanol_hidratado"),
+        "diesel_s10": precos.get("diesel_s10"),
+        "diesel_s10_aditivado": precos.get("diesel_s10_aditivado"),  # preencha se o site mostrar
+    }
+
+def _abrir_vitrine(page, captura: Optional[CapturaVitrine]) -> Optional[Dict[str, float]]:
+    """Abre a vitrine; com captura ativa devolve os preços vindos da API (ou None)."""
+    inicio = time.monotonic()
+    page.goto(URL_VITRINE, wait_until="domcontentloaded")
+    sinal = esperar_vitrine(page, captura, PW_TIMEOUT)
+    log.info("Vitrine: sinal=%s", sinal)
+    if captura is not None:
+        # DOM pronto antes da API: ela ainda tem até CAPTURA_TIMEOUT_MS desde a navegação
+        espera = 0 if sinal == "login" else CAPTURA_TIMEOUT_MS - int((time.monotonic() - inicio) * 1000)
+        precos = captura.aguardar(page, timeout_ms=max(0, espera))
+        if precos:
+            return precos
+        log.info("Nenhuma resposta de preços capturada; usando o DOM.")
+    return None
 
 def coletar() -> Dict[str, Any]:
     load_dotenv(dotenv_path=DOTENV_PATH)
-    user = env("VIBRA_MARQUES_USER")
-    pwd  = env("VIBRA_MARQUES_PASS")
+    user, pwd = har.credenciais_da_reproducao() or (env("VIBRA_MARQUES_USER"), env("VIBRA_MARQUES_PASS"))
     headless = to_bool(os.getenv("HEADLESS","true"))
 
+    conta = "VIBRA_MARQUES"
+    # com HAR (gravar/reproduzir) o login entra sempre: é ele que está no arquivo
+    estado = None if har.har_modo() else sessoes.estado_salvo(conta)
+
+    fases = Fases(conta)
+    evid = Evidencias(conta)
     with sync_playwright() as pw:
-        browser = pw.chromium.launch(headless=headless, args=["--disable-gpu"])
-        ctx = browser.new_context(ignore_https_errors=True, viewport={"width": 1280, "height": 800})
-        ctx.set_default_timeout(PW_TIMEOUT)
-        page = ctx.new_page()
+        with fases.fase("navegador"):
+            browser = pw.chromium.launch(headless=headless, args=["--disable-gpu"])
+            ctx = browser.new_context(ignore_https_errors=True, viewport={"width": 1280, "height": 800}, storage_state=estado,
+                                      **har.opcoes_contexto(conta))
+            ctx.set_default_timeout(PW_TIMEOUT)
+            har.reproduzir(ctx, conta)
+            METRICAS.anexar_rede(ctx, conta)
+            bloqueio = aplicar_bloqueio(ctx) if bloqueio_ativo() else None
+            captura = CapturaVitrine().anexar(ctx) if CAPTURA_API else None
+            evid.anexar(ctx)
+            page = ctx.new_page()
         try:
-            # Login rápido
-            page.goto(URL_LOGIN, wait_until="domcontentloaded")
-            page.wait_for_load_state("networkidle")
-            filled = _try_fill_credentials(page, user, pwd)
-            if not filled:
-                # checa iframes
-                for fr in page.frames:
-                    if fr == page.main_frame:
-                        continue
-                    try:
-                        if fr.locator('input[type="password"]').first.count() > 0 and _try_fill_credentials(fr, user, pwd):
-                            page = fr
-                            break
-                    except Exception:
-                        continue
-            if not filled and page == ctx.pages[0]:
-                raise RuntimeError("Campos de login não encontrados.")
-
-            # submit
-            clicked = False
-            for b in ('button[type="submit"]','button:has-text("Entrar")','button:has-text("Login")','input[type="submit"]','[role="button"]'):
-                try:
-                    page.locator(b).first.click(timeout=2500)
-                    clicked = True
-                    break
-                except Exception:
-                    continue
-            if not clicked:
-                try: page.locator('input[type="password"]').first.press("Enter")
-                except Exception: pass
-            try:
-                ctx.pages[0].wait_for_load_state("networkidle", timeout=PW_TIMEOUT)
-            except Exception:
-                pass
-
-            # Vitrine
-            root = ctx.pages[0]
-            root.goto(URL_VITRINE, wait_until="domcontentloaded")
-            root.wait_for_load_state("networkidle")
-            body_text = root.locator("body").inner_text(timeout=15000)
+            # Sessão salva: tenta a vitrine direto
+            precos = None
+            hit = False
+            if estado:
+                with fases.fase("sessao"):
+                    precos = _abrir_vitrine(page, captura)
+                    hit = precos is not None or _sessao_ativa(page)
+                evid.passo(page, "sessao")
+            sessoes.registrar(conta, hit)
+
+            if not hit:
+                # Login rápido
+                with fases.fase("login"):
+                    _login(ctx, page, user, pwd)
+                evid.passo(ctx.pages[0], "login")
+
+                # Vitrine
+                with fases.fase("vitrine"):
+                    precos = _abrir_vitrine(ctx.pages[0], captura)
+                    if not har.reproduzindo() and (precos is not None or _sessao_ativa(ctx.pages[0])):
+                        ctx.storage_state(path=str(sessoes.caminho_sessao(conta)))
+                evid.passo(ctx.pages[0], "vitrine")
+            if captura is not None and not har.reproduzindo():
+                sessoes.salvar_api(conta, captura.chamadas)
+            body_text = None
+            if precos is None:
+                with fases.fase("dom"):
+                    body_text = ctx.pages[0].locator("body").inner_text(timeout=15000)
+                    precos = extrair_precos_texto(body_text)
+            with fases.fase("snapshot"):
+                guardar_pagina(ctx.pages[0], "vitrine", body_text)
+            evid.encerrar()
+        except Exception as e:
+            evid.falhou(e)
+            raise
         finally:
+            if bloqueio is not None:
+                log.info("Bloqueio: %s", bloqueio.resumo())
             ctx.close()
             browser.close()
+            # o HAR é gravado no close mesmo quando a coleta falha: redige sempre
+            try:
+                har.redigir(conta, user, pwd)
+            except Exception as e:
+                log.warning("HAR de %s não redigido: %s", conta, e)
+    log.info("Fases: %s", fases.resumo())
 
-    # Parsing minimal
-    t = body_text.lower()
-    CHAVES = {
-        "gasolina_comum":   [r"gasolina\s*comum", r"\bgc\b", r"gasolina\s*comum\s*claro"],
-        "gasolina_grid":    [r"gasolina\s*(grid|aditivada)", r"\bga\b", r"aditivad"],
-        "etanol_hidratado": [r"etanol\s*hidratado", r"etanol\s*hid", r"\beh\b"],
-        "diesel_s10":       [r"diesel\s*s[-\s]*10", r"\bs[-\s]*10\b"],
-    }
-    precos = {k: None for k in ["gasolina_comum","gasolina_grid","etanol_hidratado","diesel_s10","diesel_s10_aditivado"]}
-    for campo, pads in CHAVES.items():
-        val = None
-        for pat in pads:
-            m = re.search(pat + r".{0,80}?" + NUM_RE.pattern, t, flags=re.IGNORECASE|re.DOTALL)
-            if m:
-                val = parse_price(m.group(0))
-                if val is not None:
-                    break
-        precos[campo] = val
-
-    return {
-        "data_coleta": date.today(),
-        "empresa": EMPRESA,
-        "gasolina_comum": precos["gasolina_comum"],
-        "gasolina_grid": precos["gasolina_grid"],
-        "etanol_hidratado": precos["etanol_hidratado"],
-        "diesel_s10": precos["diesel_s10"],
-        "diesel_s10_aditivado": None,  # preencha se o site mostrar
-    }
+    return montar_payload(precos)
 
 # ------------ MAIN ------------
 def main():
+    METRICAS.iniciar("coletor_turbo")
     try:
         payload = coletar()
         log.info("Coleta: %s", payload)
+        if har.reproduzindo():
+            # preços da gravação: não são de hoje, não vão a histórico nem ao Supabase
+            return 0
+        processar_coleta(EMPRESA, payload)
+        registrar_coleta(EMPRESA, payload)
+        if not to_bool(os.getenv("COLETA_ENVIAR", "true")):
+            print("📴 COLETA_ENVIAR=false: sem envio ao Supabase")
+            return 0
 
         sb = SB()
         # usar retorno minimal (mais rápido)
         status, body = sb.upsert(payload, return_representation=False)
         print("📡 UPSERT Status:", status)
         print("📄 UPSERT Resposta:", body if body else "(vazio)")
+        return 0
     except Exception as e:
         log.exception("Falha no coletor turbo: %s", e)
         print("❌ Erro:", e)
+        return 1
+    finally:
+        METRICAS.finalizar(**({"har": har.har_modo()} if har.har_modo() else {}))
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
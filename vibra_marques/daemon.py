@@ -0,0 +1,331 @@
+"""
+daemon.py
+---------
+Modo daemon: um processo de longa duração que mantém UM navegador Playwright
+quente e roda a varredura do coletor_async num agendamento estilo cron.
+
+⚡ Funcionamento:
+- O Chromium sobe uma vez e é reaproveitado entre as execuções
+  (`coletar_todas(browser=...)`): cada conta continua com seu BrowserContext
+  isolado, mas sem pagar o cold start a cada rodada.
+- Agenda em DAEMON_CRON (5 campos: minuto hora dia mês dia-da-semana, com
+  `*`, `*/n`, `a-b`, `a-b/n` e listas; ou @hourly/@daily). Cada disparo
+  ganha um atraso aleatório de até DAEMON_JITTER segundos.
+- O navegador é reciclado depois de DAEMON_RECICLAR_APOS execuções, quando a
+  memória da árvore de processos passa de DAEMON_MAX_MEM_MB, ou se caiu.
+- Estado e tempos da última execução (por conta e por fase) ficam em
+  `cache/daemon_status.json`.
+
+Uso:
+    python daemon.py             # roda até SIGINT/SIGTERM
+    python daemon.py --agora     # primeira varredura já na subida
+    python daemon.py status      # imprime o último status
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import signal
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+
+# ------------ Configs ------------
+CRON = os.getenv("DAEMON_CRON", "0 * * * *")
+JITTER = float(os.getenv("DAEMON_JITTER", "120"))
+RECICLAR_APOS = int(os.getenv("DAEMON_RECICLAR_APOS", "24"))
+MAX_MEM_MB = float(os.getenv("DAEMON_MAX_MEM_MB", "1024"))
+STATUS_PATH = Path(os.getenv("DAEMON_STATUS") or Path(__file__).with_name("cache") / "daemon_status.json")
+
+log = logging.getLogger("daemon")
+
+
+# ------------ Cron ------------
+APELIDOS = {
+    "@hourly": "0 * * * *",
+    "@daily": "0 0 * * *",
+    "@weekly": "0 0 * * 0",
+    "@monthly": "0 0 1 * *",
+}
+LIMITES = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+
+
+def _campo(texto: str, menor: int, maior: int) -> Set[int]:
+    valores: Set[int] = set()
+    for parte in texto.split(","):
+        faixa, _, passo = parte.partition("/")
+        if faixa == "*":
+            a, b = menor, maior
+        elif "-" in faixa:
+            a, b = (int(x) for x in faixa.split("-", 1))
+        else:
+            a = b = int(faixa)
+            if passo:
+                b = maior
+        if not (menor <= a <= b <= maior):
+            raise ValueError(f"Campo cron fora do intervalo {menor}-{maior}: {parte!r}")
+        valores.update(range(a, b + 1, int(passo) if passo else 1))
+    return valores
+
+
+class Cron:
+    """Expressão cron de 5 campos (domingo = 0 ou 7)."""
+
+    def __init__(self, expr: str):
+        self.expr = APELIDOS.get(expr.strip(), expr.strip())
+        campos = self.expr.split()
+        if len(campos) != 5:
+            raise ValueError(f"Expressão cron precisa de 5 campos: {expr!r}")
+        self.minutos, self.horas, self.dias, self.meses, semana = (
+            _campo(c, a, b) for c, (a, b) in zip(campos, LIMITES)
+        )
+        self.semana = {d % 7 for d in semana}
+        # regra do cron: com dia do mês E dia da semana restritos, basta um bater
+        self._dia_livre = campos[2] == "*"
+        self._semana_livre = campos[4] == "*"
+
+    def _dia_ok(self, t: datetime) -> bool:
+        dia = t.day in self.dias
+        semana = (t.weekday() + 1) % 7 in self.semana
+        if self._dia_livre or self._semana_livre:
+            return dia and semana
+        return dia or semana
+
+    def proxima(self, depois: datetime) -> datetime:
+        """Primeiro horário estritamente depois de `depois`."""
+        t = depois.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limite = t + timedelta(days=366 * 5)
+        while t < limite:
+            if t.month not in self.meses:
+                t = (t.replace(day=1) + timedelta(days=32)).replace(day=1, hour=0, minute=0)
+            elif not self._dia_ok(t):
+                t = (t + timedelta(days=1)).replace(hour=0, minute=0)
+            elif t.hour not in self.horas:
+                t = (t + timedelta(hours=1)).replace(minute=0)
+            elif t.minute not in self.minutos:
+                t += timedelta(minutes=1)
+            else:
+                return t
+        raise ValueError(f"Expressão cron nunca dispara: {self.expr!r}")
+
+
+# ------------ Memória ------------
+def _rss_kb(pid: int) -> int:
+    with open(f"/proc/{pid}/status", encoding="ascii", errors="replace") as f:
+        for linha in f:
+            if linha.startswith("VmRSS:"):
+                return int(linha.split()[1])
+    return 0
+
+
+def memoria_mb() -> Optional[float]:
+    """RSS somado deste processo e de todos os descendentes (driver + Chromium)."""
+    if not os.path.isdir("/proc"):
+        return None
+    filhos: Dict[int, List[int]] = {}
+    for nome in os.listdir("/proc"):
+        if not nome.isdigit():
+            continue
+        try:
+            with open(f"/proc/{nome}/stat", encoding="ascii", errors="replace") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        filhos.setdefault(ppid, []).append(int(nome))
+    total, fila = 0, [os.getpid()]
+    while fila:
+        pid = fila.pop()
+        try:
+            total += _rss_kb(pid)
+        except OSError:
+            pass
+        fila.extend(filhos.get(pid, []))
+    return round(total / 1024, 1)
+
+
+# ------------ Navegador quente ------------
+class NavegadorQuente:
+    def __init__(self, reciclar_apos: int = RECICLAR_APOS, max_mem_mb: float = MAX_MEM_MB):
+        self.reciclar_apos = reciclar_apos
+        self.max_mem_mb = max_mem_mb
+        self._pw = None
+        self.browser = None
+        self.execucoes = 0
+        self.reciclagens = 0
+        self.iniciado_em: Optional[float] = None
+
+    async def obter(self):
+        if self.browser is not None and not self.browser.is_connected():
+            log.warning("Navegador caiu; subindo outro.")
+            await self.fechar()
+        if self.browser is None:
+            inicio = time.time()
+            if self._pw is None:
+                from playwright.async_api import async_playwright
+                self._pw = await async_playwright().start()
+            headless = os.getenv("HEADLESS", "true").strip().lower() in ("1", "true", "yes", "y", "on")
+            self.browser = await getattr(self._pw, os.getenv("BROWSER", "chromium")).launch(
+                headless=headless, args=["--disable-gpu"])
+            self.execucoes = 0
+            self.iniciado_em = time.time()
+            log.info("Navegador pronto em %.1fs", self.iniciado_em - inicio)
+        return self.browser
+
+    async def depois_da_execucao(self, falhou: bool = False) -> Optional[str]:
+        """Recicla se for a hora; devolve o motivo (ou None)."""
+        self.execucoes += 1
+        mem = memoria_mb()
+        motivo = None
+        if falhou:
+            motivo = "falha"
+        elif self.reciclar_apos and self.execucoes >= self.reciclar_apos:
+            motivo = f"{self.execucoes} execuções"
+        elif mem is not None and self.max_mem_mb and mem > self.max_mem_mb:
+            motivo = f"memória {mem:.0f} MB"
+        if motivo:
+            log.info("♻️ Reciclando navegador (%s)", motivo)
+            await self.fechar()
+            self.reciclagens += 1
+        return motivo
+
+    async def fechar(self) -> None:
+        if self.browser is not None:
+            try:
+                await self.browser.close()
+            except Exception:
+                pass
+            self.browser = None
+        if self._pw is not None:
+            try:
+                await self._pw.stop()
+            except Exception:
+                pass
+            self._pw = None
+
+
+# ------------ Status ------------
+def _iso(ts: Optional[float]) -> Optional[str]:
+    return datetime.fromtimestamp(ts).isoformat(timespec="seconds") if ts else None
+
+
+def resumo_execucao(resultados: List[Dict[str, Any]], inicio: float, fim: float) -> Dict[str, Any]:
+    contas = {}
+    for r in resultados:
+        extras = r.get("dados_extras") or {}
+        contas[r["distribuidora"]] = {
+            "sucesso": r["sucesso"],
+            "tempo_execucao": round(r["tempo_execucao"], 3),
+            "fases": extras.get("fases"),
+            "fonte": extras.get("fonte"),
+            "sessao": extras.get("sessao"),
+            "erro": r.get("erro"),
+        }
+    return {
+        "inicio": _iso(inicio),
+        "fim": _iso(fim),
+        "duracao_s": round(fim - inicio, 3),
+        "sucessos": sum(1 for r in resultados if r["sucesso"]),
+        "falhas": sum(1 for r in resultados if not r["sucesso"]),
+        "contas": contas,
+    }
+
+
+def salvar_status(status: Dict[str, Any], path: Path = STATUS_PATH) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(status, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+# ------------ Loop ------------
+async def rodar(cron: Cron, jitter: float = JITTER, agora: bool = False) -> None:
+    import asyncio
+    from coletor_async import varrer  # Playwright e cia. só quando o daemon roda de fato
+
+    parar = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, parar.set)
+        except (NotImplementedError, RuntimeError):
+            pass
+
+    navegador = NavegadorQuente()
+    status: Dict[str, Any] = {
+        "pid": os.getpid(),
+        "iniciado_em": _iso(time.time()),
+        "cron": cron.expr,
+        "jitter_s": jitter,
+        "execucoes": 0,
+        "reciclagens": 0,
+        "ultima_execucao": None,
+    }
+    try:
+        disparo = datetime.now() if agora else cron.proxima(datetime.now())
+        while not parar.is_set():
+            alvo = disparo + timedelta(seconds=random.uniform(0, jitter) if jitter > 0 else 0)
+            status["proxima_execucao"] = alvo.isoformat(timespec="seconds")
+            salvar_status(status)
+            log.info("⏰ Próxima varredura: %s", status["proxima_execucao"])
+            try:
+                await asyncio.wait_for(parar.wait(), timeout=max(0.0, (alvo - datetime.now()).total_seconds()))
+                break
+            except asyncio.TimeoutError:
+                pass
+
+            inicio = time.time()
+            falhou = False
+            try:
+                browser = await navegador.obter()
+                aquecido = navegador.execucoes > 0
+                resultados = await varrer(browser=browser)
+                ultima = resumo_execucao(resultados, inicio, time.time())
+            except Exception as e:
+                log.exception("Varredura falhou")
+                falhou, aquecido = True, False
+                ultima = {"inicio": _iso(inicio), "fim": _iso(time.time()),
+                          "duracao_s": round(time.time() - inicio, 3), "erro": str(e)}
+            ultima["navegador_quente"] = aquecido
+            ultima["reciclado"] = await navegador.depois_da_execucao(falhou)
+            ultima["memoria_mb"] = memoria_mb()
+            status["execucoes"] += 1
+            status["reciclagens"] = navegador.reciclagens
+            status["ultima_execucao"] = ultima
+            disparo = cron.proxima(max(datetime.now(), disparo))
+    finally:
+        await navegador.fechar()
+        status["proxima_execucao"] = None
+        status["encerrado_em"] = _iso(time.time())
+        salvar_status(status)
+        log.info("Daemon encerrado após %d execução(ões).", status["execucoes"])
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Coleta contínua com navegador quente.")
+    ap.add_argument("cmd", nargs="?", choices=["rodar", "status"], default="rodar")
+    ap.add_argument("--cron", default=CRON, help=f"agenda cron (padrão: {CRON!r})")
+    ap.add_argument("--jitter", type=float, default=JITTER, help="atraso aleatório máximo em segundos")
+    ap.add_argument("--agora", action="store_true", help="roda a primeira varredura já na subida")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "status":
+        try:
+            print(STATUS_PATH.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            print("Daemon ainda não rodou.")
+            return 1
+        return 0
+
+    import asyncio
+    asyncio.run(rodar(Cron(args.cron), jitter=args.jitter, agora=args.agora))
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(message)s")
+    sys.exit(main())
@@ -0,0 +1,228 @@
+"""
+evidencias.py
+-------------
+Evidências de falha: o caminho feliz não grava nada em disco.
+
+⚡ Funcionamento:
+- `Evidencias("VIBRA_AP")` guarda, em memória, os últimos EVIDENCIAS_PASSOS
+  passos (`passo(page, "login")`: URL + HTML) num buffer circular, e as
+  últimas mensagens do console/erros de página do contexto.
+- `falhou(erro, page)` despeja tudo em `evidencias/falhas/<AAAAmmdd_HHMMSS>_<nome>/`:
+  os passos do buffer, HTML + screenshot de página inteira do momento da
+  falha, o traceback, o console e — com EVIDENCIAS_TRACE=true — o trace do
+  Playwright (`trace.zip`, abre com `playwright show-trace`).
+- `encerrar()` no sucesso só esvazia o buffer e descarta o trace sem gravar.
+- Mantém as últimas EVIDENCIAS_MAX falhas; as mais antigas são apagadas.
+
+Cada método tem a variante `_async` para a API async do Playwright.
+EVIDENCIAS=false desliga o buffer (a falha ainda grava traceback e tela).
+"""
+
+import json
+import logging
+import os
+import shutil
+import time
+import traceback
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Deque, Dict, Optional
+
+EVIDENCIAS_DIR = Path(os.getenv("EVIDENCIAS_DIR") or Path(__file__).with_name("evidencias") / "falhas")
+EVIDENCIAS_PASSOS = int(os.getenv("EVIDENCIAS_PASSOS", "4"))
+EVIDENCIAS_MAX = int(os.getenv("EVIDENCIAS_MAX", "20"))
+MAX_CONSOLE = 200
+
+log = logging.getLogger("evidencias")
+
+
+def _flag(nome: str, padrao: str) -> bool:
+    return os.getenv(nome, padrao).strip().lower() in ("1", "true", "yes", "y", "on")
+
+
+def evidencias_ativas() -> bool:
+    return _flag("EVIDENCIAS", "true")
+
+
+def trace_ativo() -> bool:
+    return _flag("EVIDENCIAS_TRACE", "false")
+
+
+def _nome_arquivo(rotulo: str) -> str:
+    return "".join(c if c.isalnum() or c in "-_" else "_" for c in rotulo)[:60] or "passo"
+
+
+class Evidencias:
+    def __init__(self, nome: str, passos: int = EVIDENCIAS_PASSOS, diretorio: Path = EVIDENCIAS_DIR):
+        self.nome = nome
+        self.diretorio = Path(diretorio)
+        self.passos: Deque[Dict[str, Any]] = deque(maxlen=max(1, passos))
+        self.console: Deque[str] = deque(maxlen=MAX_CONSOLE)
+        self.ctx = None
+        self._tracing = False
+
+    # ------------ Contexto ------------
+    def _ouvir(self, ctx) -> None:
+        self.ctx = ctx
+        ctx.on("console", lambda msg: self.console.append(f"[{msg.type}] {msg.text}"))
+        ctx.on("weberror", lambda err: self.console.append(f"[pageerror] {err.error}"))
+
+    def anexar(self, ctx) -> "Evidencias":
+        """Escuta o console do BrowserContext e, com EVIDENCIAS_TRACE, liga o tracing."""
+        self._ouvir(ctx)
+        if trace_ativo():
+            ctx.tracing.start(screenshots=True, snapshots=True)
+            self._tracing = True
+        return self
+
+    async def anexar_async(self, ctx) -> "Evidencias":
+        self._ouvir(ctx)
+        if trace_ativo():
+            await ctx.tracing.start(screenshots=True, snapshots=True)
+            self._tracing = True
+        return self
+
+    # ------------ Buffer ------------
+    def _guardar(self, rotulo: str, url: str, html: Optional[str]) -> None:
+        self.passos.append({"rotulo": rotulo, "url": url, "html": html,
+                            "quando": datetime.now().isoformat(timespec="seconds")})
+
+    def passo(self, page, rotulo: str) -> None:
+        """Fotografa a página (URL + HTML) no buffer; nunca levanta."""
+        if not evidencias_ativas():
+            return
+        try:
+            html = page.content()
+        except Exception as e:
+            html = None
+            log.debug("Passo %s sem HTML: %s", rotulo, e)
+        self._guardar(rotulo, page.url, html)
+
+    async def passo_async(self, page, rotulo: str) -> None:
+        if not evidencias_ativas():
+            return
+        try:
+            html = await page.content()
+        except Exception as e:
+            html = None
+            log.debug("Passo %s sem HTML: %s", rotulo, e)
+        self._guardar(rotulo, page.url, html)
+
+    # ------------ Falha ------------
+    def _pasta(self) -> Path:
+        pasta = self.diretorio / f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{_nome_arquivo(self.nome)}"
+        pasta.mkdir(parents=True, exist_ok=True)
+        return pasta
+
+    def _gravar(self, pasta: Path, erro: Optional[BaseException], url: Optional[str],
+                html: Optional[str], tela: Optional[bytes]) -> None:
+        indice = []
+        for i, p in enumerate(self.passos, 1):
+            arquivo = f"{i:02d}_{_nome_arquivo(p['rotulo'])}.html"
+            if p["html"] is not None:
+                (pasta / arquivo).write_text(p["html"], encoding="utf-8")
+            indice.append({**{k: v for k, v in p.items() if k != "html"},
+                           "arquivo": arquivo if p["html"] is not None else None})
+        if html is not None:
+            (pasta / "falha.html").write_text(html, encoding="utf-8")
+        if tela is not None:
+            (pasta / "falha.png").write_bytes(tela)
+        if self.console:
+            (pasta / "console.txt").write_text("\n".join(self.console) + "\n", encoding="utf-8")
+        if erro is not None:
+            texto = "".join(traceback.format_exception(type(erro), erro, erro.__traceback__))
+            (pasta / "erro.txt").write_text(texto, encoding="utf-8")
+        with open(pasta / "passos.json", "w", encoding="utf-8") as f:
+            json.dump({"nome": self.nome, "url_falha": url, "erro": str(erro) if erro else None,
+                       "passos": indice}, f, ensure_ascii=False, indent=2)
+
+    def _podar(self) -> None:
+        pastas = sorted(p for p in self.diretorio.iterdir() if p.is_dir()) if self.diretorio.is_dir() else []
+        for velha in pastas[:-EVIDENCIAS_MAX] if EVIDENCIAS_MAX > 0 else []:
+            shutil.rmtree(velha, ignore_errors=True)
+
+    def _pagina(self, page):
+        if page is not None:
+            return page
+        paginas = self.ctx.pages if self.ctx is not None else []
+        return paginas[-1] if paginas else None
+
+    def falhou(self, erro: Optional[BaseException] = None, page=None) -> Optional[Path]:
+        """Grava as evidências da falha; devolve a pasta (ou None se nem isso deu)."""
+        t0 = time.perf_counter()
+        page = self._pagina(page)
+        url = html = tela = None
+        if page is not None:
+            try:
+                url = page.url
+                html = page.content()
+                tela = page.screenshot(full_page=True)
+            except Exception as e:
+                log.warning("Tela da falha indisponível: %s", e)
+        try:
+            pasta = self._pasta()
+            if self._tracing:
+                self._tracing = False
+                try:
+                    self.ctx.tracing.stop(path=str(pasta / "trace.zip"))
+                except Exception as e:
+                    log.warning("Trace indisponível: %s", e)
+            self._gravar(pasta, erro, url, html, tela)
+            self._podar()
+        except OSError as e:
+            log.warning("Falha ao gravar evidências: %s", e)
+            return None
+        self.passos.clear()
+        log.info("🧾 Evidências em %s (%.1fs)", pasta, time.perf_counter() - t0)
+        return pasta
+
+    async def falhou_async(self, erro: Optional[BaseException] = None, page=None) -> Optional[Path]:
+        t0 = time.perf_counter()
+        page = self._pagina(page)
+        url = html = tela = None
+        if page is not None:
+            try:
+                url = page.url
+                html = await page.content()
+                tela = await page.screenshot(full_page=True)
+            except Exception as e:
+                log.warning("Tela da falha indisponível: %s", e)
+        try:
+            pasta = self._pasta()
+            if self._tracing:
+                self._tracing = False
+                try:
+                    await self.ctx.tracing.stop(path=str(pasta / "trace.zip"))
+                except Exception as e:
+                    log.warning("Trace indisponível: %s", e)
+            self._gravar(pasta, erro, url, html, tela)
+            self._podar()
+        except OSError as e:
+            log.warning("Falha ao gravar evidências: %s", e)
+            return None
+        self.passos.clear()
+        log.info("🧾 Evidências em %s (%.1fs)", pasta, time.perf_counter() - t0)
+        return pasta
+
+    # ------------ Sucesso ------------
+    def encerrar(self) -> None:
+        """Execução ok: descarta o buffer e o trace sem tocar no disco."""
+        self.passos.clear()
+        self.console.clear()
+        if self._tracing:
+            self._tracing = False
+            try:
+                self.ctx.tracing.stop()
+            except Exception:
+                pass
+
+    async def encerrar_async(self) -> None:
+        self.passos.clear()
+        self.console.clear()
+        if self._tracing:
+            self._tracing = False
+            try:
+                await self.ctx.tracing.stop()
+            except Exception:
+                pass
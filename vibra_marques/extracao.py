@@ -0,0 +1,285 @@
+"""
+extracao.py
+-----------
+Parsing de preços compartilhado pelos coletores.
+
+- `parse_price`: números no formato brasileiro ("5,5410", "1.234,56", "5.41").
+- `campo_do_produto`: nome do produto na vitrine -> coluna da tabela.
+- `ExtratorPrecos`: todas as palavras-chave (CHAVES) numa única alternância
+  pré-compilada com grupos nomeados; uma passada linear pelo texto resolve
+  todos os campos, com a mesma prioridade de antes (padrão mais cedo da lista
+  vence, preço até 80 caracteres depois da palavra-chave). Cada acerto custa
+  um `match` da janela por padrão, nunca uma nova busca no resto do texto.
+- `pares_descricao_preco`: pareamento span.item-descricao -> strong dos
+  scripts assíncronos.
+- `precos_do_conteudo` / `estruturar_card`: regex sobre page.content() e
+  quebra do inner_text de cada card (coletor_automatizado_completo.py e
+  coleta_playwright.py).
+- `JS_CAMPOS_CARDS` + `LAYOUTS`: script que lê só os cards de produto dentro
+  da página (um campo por seletor) e `registros_de_cards`, que tipa o que
+  voltou: {nome, codigo, base, preco (float), validade, campo}.
+
+Tudo aqui é puro (sem Playwright) para rodar no bench_parsers.py; quem chama
+o `evaluate` é prontidao.registros_cards.
+"""
+
+import html as _html
+import json
+import os
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+NUM_RE = re.compile(r"([-+]?\d{1,3}(?:[.\s]\d{3})*(?:[.,]\d{2,4})|[-+]?\d+[.,]\d{2,4})")
+def parse_price(s: str) -> Optional[float]:
+    m = NUM_RE.search(s)
+    if not m:
+        return None
+    x = m.group(1).replace(" ", "")
+    if "," in x and "." in x:
+        x = x.replace(".", "")
+    x = x.replace(",", ".")
+    try:
+        return round(float(x), 4)
+    except ValueError:
+        return None
+
+def campo_do_produto(nome: str) -> Optional[str]:
+    """Nome do produto na vitrine -> coluna da tabela (None se não interessa)."""
+    n = nome.upper()
+    if "GASOLINA" in n and ("ADIT" in n or "GRID" in n):
+        return "gasolina_grid"
+    if "GASOLINA COMUM" in n:
+        return "gasolina_comum"
+    if "ETANOL" in n:
+        return "etanol_hidratado"
+    if "S500" in n:
+        return None
+    if "S10" in n:
+        return "diesel_s10_aditivado" if "ADIT" in n else "diesel_s10"
+    return None
+
+
+# ------------ Motor de extração do texto da vitrine ------------
+CHAVES = {
+    "gasolina_comum":   [r"gasolina\s*comum", r"\bgc\b", r"gasolina\s*comum\s*claro"],
+    "gasolina_grid":    [r"gasolina\s*(grid|aditivada)", r"\bga\b", r"aditivad"],
+    "etanol_hidratado": [r"etanol\s*hidratado", r"etanol\s*hid", r"\beh\b"],
+    "diesel_s10":       [r"diesel\s*s[-\s]*10", r"\bs[-\s]*10\b"],
+}
+CAMPOS = ["gasolina_comum","gasolina_grid","etanol_hidratado","diesel_s10","diesel_s10_aditivado"]
+
+_GRUPO_LIVRE = re.compile(r"\((?!\?)")
+_HTML_RUIDO = re.compile(r"<(script|style)\b.*?</\1\s*>|<!--.*?-->|<[^>]+>", re.IGNORECASE | re.DOTALL)
+_ESPACOS = re.compile(r"\s+")
+
+class ExtratorPrecos:
+    def __init__(self, chaves: Dict[str, List[str]] = CHAVES, janela: int = 80, campos: List[str] = CAMPOS):
+        self.campos = campos
+        self.janela = janela
+        self._grupos: Dict[str, Tuple[str, int]] = {}
+        # padrões isolados, na ordem da alternância: ancorados no início de
+        # cada acerto, pegam palavras-chave sobrepostas à que a alternância
+        # escolheu (ex.: "gasolina comum claro" x "gasolina comum", "s10" em "diesel s10")
+        self._isolados: List[Tuple[str, int, Any]] = []
+        partes = []
+        for campo, pads in chaves.items():
+            for prio, pat in enumerate(pads):
+                nome = f"k{len(self._grupos)}"
+                self._grupos[nome] = (campo, prio)
+                self._isolados.append((campo, prio, re.compile(pat, re.IGNORECASE | re.DOTALL)))
+                partes.append(f"(?P<{nome}>{_GRUPO_LIVRE.sub('(?:', pat)})")
+        # lookahead de largura zero: o finditer para em TODA posição onde começa
+        # alguma palavra-chave, inclusive dentro de outra (como o re.search antigo)
+        self.regex = re.compile("(?=" + "|".join(partes) + ")", re.IGNORECASE | re.DOTALL)
+        self._preco_na_janela = re.compile(r".{0,%d}?" % janela + NUM_RE.pattern, re.DOTALL)
+
+    def _anotar(self, achados: Dict[Tuple[str, int], Optional[float]], chave: Tuple[str, int],
+                t: str, ini: int, fim: int) -> None:
+        if chave in achados:
+            return
+        n = self._preco_na_janela.match(t, fim)
+        if n is not None:
+            # None também fecha o padrão (ex.: "5.415.41"), como o re.search antigo
+            achados[chave] = parse_price(t[ini:n.end()])
+
+    def ocorrencias(self, texto: str) -> Dict[Tuple[str, int], Optional[float]]:
+        """{(campo, prioridade): preço} da primeira palavra-chave com preço na janela."""
+        t = texto.lower()
+        achados: Dict[Tuple[str, int], Optional[float]] = {}
+        for m in self.regex.finditer(t):
+            ini = m.start()
+            self._anotar(achados, self._grupos[m.lastgroup], t, ini, m.end(m.lastgroup))
+            # outros padrões que também começam aqui: match ancorado, na ordem
+            # da lista — custo fixo por posição, sem nova busca no resto do texto
+            for campo, prio, rx in self._isolados:
+                if (campo, prio) not in achados:
+                    k = rx.match(t, ini)
+                    if k is not None:
+                        self._anotar(achados, (campo, prio), t, ini, k.end())
+            if len(achados) == len(self._isolados):
+                break
+        return achados
+
+    def extrair(self, texto: str) -> Dict[str, Optional[float]]:
+        """{campo: preço} para todos os CAMPOS (None quando não achou)."""
+        achados = self.ocorrencias(texto)
+        precos: Dict[str, Optional[float]] = {k: None for k in self.campos}
+        for (campo, prio), val in sorted(achados.items(), key=lambda kv: kv[0][1], reverse=True):
+            if val is not None:
+                precos[campo] = val
+        return precos
+
+    def extrair_html(self, html: str) -> Dict[str, Optional[float]]:
+        return self.extrair(texto_de_html(html))
+
+def texto_de_html(html: str) -> str:
+    """Texto aproximado de um HTML salvo (sem script/style, entidades resolvidas)."""
+    return _ESPACOS.sub(" ", _html.unescape(_HTML_RUIDO.sub(" ", html))).strip()
+
+EXTRATOR = ExtratorPrecos()
+
+def extrair_precos_texto(body_text: str) -> Dict[str, Optional[float]]:
+    """Parsing do texto da vitrine -> {campo: preço}."""
+    return EXTRATOR.extrair(body_text)
+
+
+# ------------ Pareamento descrição -> preço (spans/strongs) ------------
+PALAVRAS_CHAVE = ["GASOLINA", "ETANOL", "DIESEL", "ÓLEO", "COMBUSTÍVEL"]
+
+def pares_descricao_preco(elementos: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Recebe [{"tag": "SPAN"|"STRONG", "text": ...}] na ordem do DOM e devolve
+    [{"produto", "valor"}] sem duplicatas: cada strong com número fecha o
+    último span que parecia produto.
+    """
+    pares: List[Dict[str, Any]] = []
+    vistos = set()
+    ultimo_produto = None
+    for el in elementos:
+        txt = (el.get("text") or "").strip()
+        if not txt:
+            continue
+        if el["tag"] == "SPAN":
+            if any(p in txt.upper() for p in PALAVRAS_CHAVE):
+                ultimo_produto = txt
+        elif el["tag"] == "STRONG" and ultimo_produto:
+            valor = parse_price(txt)
+            if valor is not None:
+                if (ultimo_produto, valor) not in vistos:
+                    vistos.add((ultimo_produto, valor))
+                    pares.append({"produto": ultimo_produto, "valor": valor})
+                ultimo_produto = None
+    return pares
+
+
+# ------------ Regex sobre page.content() (coletor_automatizado_completo) ------------
+CONTEUDO_RE = re.compile(r'([A-Z\s\d]+)\s+-\s+R\$\s+(\d+,\d+)')
+
+def precos_do_conteudo(content: str) -> Dict[str, float]:
+    """HTML da página -> {campo: preço} pelos pares "NOME - R$ 0,00"."""
+    precos: Dict[str, float] = {}
+    for nome, valor in CONTEUDO_RE.findall(content):
+        nome = nome.upper().strip()
+        valor_float = float(valor.replace(",", "."))
+        if "GASOLINA COMUM" in nome:
+            precos["gasolina_comum"] = valor_float
+        elif "GASOLINA GRID" in nome or "GASOLINA ADITIVADA" in nome:
+            precos["gasolina_aditivada"] = valor_float
+        elif "ETANOL HIDRATADO" in nome:
+            precos["etanol_hidratado"] = valor_float
+        elif "DIESEL S10" in nome and "ADITIVADO" not in nome:
+            precos["diesel_s10"] = valor_float
+        elif "DIESEL S10 ADITIVADO" in nome:
+            precos["diesel_s10_aditivado"] = valor_float
+    return precos
+
+
+# ------------ Texto de um card (inner_text) -> registro ------------
+def estruturar_card(texto: str) -> Optional[Dict[str, Optional[str]]]:
+    """inner_text de um card da vitrine -> {nome, codigo, base, preco, validade}."""
+    linhas = [l.strip() for l in texto.split("\n") if l.strip()]
+    if len(linhas) < 3:
+        return None
+    return {
+        "nome": linhas[0],
+        "codigo": next((l.split(":")[1].strip() for l in linhas if l.startswith("COD:")), None),
+        "base": next((l.split(":")[1].strip() for l in linhas if l.startswith("Base:")), None),
+        "preco": next((l.replace("R$", "").replace(",", ".").strip() for l in linhas if "R$" in l), None),
+        "validade": next((l.strip() for l in linhas if "dia" in l.lower()), None),
+    }
+
+
+# ------------ Cards dentro da página -> registros tipados ------------
+# Um layout por página de distribuidora: seletor do card e, dentro dele, um
+# seletor por campo. Campo sem seletor (ou que não achou nada) cai no texto do
+# card quebrado por estruturar_card. CARD_LAYOUTS_PATH (JSON) acrescenta ou
+# sobrescreve layouts sem mexer no código.
+LAYOUTS: Dict[str, Dict[str, str]] = {
+    "vibra": {
+        "card": 'div.corpo-item[id^="item-"]',
+        "nome": ".item-descricao",
+        "codigo": ".item-codigo",
+        "base": ".info-base strong",
+        "preco": ".item-footer-infos li strong",
+        "validade": ".item-footer-infos li:nth-child(2)",
+    },
+    "card_produto": {
+        "card": ".card-produto",
+    },
+}
+CAMPOS_CARD = ["nome", "codigo", "base", "preco", "validade"]
+
+def layout(nome: str) -> Dict[str, str]:
+    layouts = dict(LAYOUTS)
+    caminho = os.getenv("CARD_LAYOUTS_PATH")
+    if caminho:
+        with open(caminho, encoding="utf-8") as f:
+            layouts.update(json.load(f))
+    if nome not in layouts:
+        raise KeyError(f"Layout de cards desconhecido: {nome} (conhecidos: {', '.join(sorted(layouts))})")
+    return layouts[nome]
+
+# Recebe o layout; devolve [[nome, codigo, base, preco, validade, texto|null]]
+# (arrays em vez de objetos: menos bytes no CDP). O texto do card só vai
+# quando algum campo ficou vazio.
+JS_CAMPOS_CARDS = """
+(layout) => {
+    const campos = ["nome", "codigo", "base", "preco", "validade"];
+    const vistos = new Set();
+    const saida = [];
+    for (const card of document.querySelectorAll(layout.card)) {
+        const linha = campos.map(c => {
+            const el = layout[c] ? card.querySelector(layout[c]) : null;
+            return el ? el.textContent.replace(/\\s+/g, " ").trim() || null : null;
+        });
+        linha.push(linha.every(v => v) ? null : card.innerText);
+        const chave = linha.join("|");
+        if (vistos.has(chave)) continue;
+        vistos.add(chave);
+        saida.push(linha);
+    }
+    return saida;
+}
+"""
+
+_PREFIXO_CAMPO = re.compile(r"^\s*(?:COD|Base)\s*:\s*", re.IGNORECASE)
+
+def registros_de_cards(brutos: List[List[Optional[str]]]) -> List[Dict[str, Any]]:
+    """Linhas de JS_CAMPOS_CARDS -> registros com preço em float e coluna da tabela."""
+    registros = []
+    for linha in brutos:
+        valores = dict(zip(CAMPOS_CARD, linha))
+        texto = linha[len(CAMPOS_CARD)] if len(linha) > len(CAMPOS_CARD) else None
+        if texto:
+            for k, v in (estruturar_card(texto) or {}).items():
+                valores[k] = valores.get(k) or v
+        if not valores.get("nome"):
+            continue
+        for k in ("codigo", "base"):
+            if valores.get(k):
+                valores[k] = _PREFIXO_CAMPO.sub("", valores[k])
+        preco = valores.get("preco")
+        valores["preco"] = parse_price(preco.replace("\u00a0", " ")) if preco else None
+        valores["campo"] = campo_do_produto(valores["nome"])
+        registros.append(valores)
+    return registros
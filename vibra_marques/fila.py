@@ -0,0 +1,326 @@
+"""
+fila.py
+-------
+Fila de trabalho local (SQLite) para dividir a coleta entre vários processos,
+cada um com o seu navegador.
+
+⚡ Funcionamento:
+- Cada job é um (portal, conta) de uma rodada. `enfileirar` não duplica
+  o que já está pendente ou em execução.
+- `reivindicar` pega o próximo job livre com um lease de FILA_LEASE segundos
+  (BEGIN IMMEDIATE: dois workers nunca levam o mesmo). Enquanto coleta, o
+  worker renova o lease (heartbeat); se o processo morrer, o lease vence e
+  outro worker reassume o job.
+- Falha volta para a fila até FILA_MAX_TENTATIVAS; depois fica "falhou".
+- O worker reusa coletor_async (coletar_conta, backup, variações, histórico e
+  EscritorSupabase): para ganhar vazão basta subir mais workers. Se o lease
+  foi perdido (outro worker reassumiu o job), o resultado é descartado: nada
+  de envio, backup, histórico nem variações em dobro.
+
+Linha de comando:
+    python fila.py enfileirar [--contas VIBRA_AP,VIBRA_BB]
+    python fila.py worker [--ate-esvaziar]      # um processo = um navegador
+    python fila.py rodar --workers 3            # enfileira a rodada e sobe 3 workers
+    python fila.py status
+    python fila.py limpar --dias 7
+
+Várias máquinas podem apontar FILA_PATH para o mesmo arquivo, desde que o
+compartilhamento respeite lock de arquivo (SQLite em NFS sem lock não serve).
+"""
+
+import argparse
+import json
+import logging
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import time
+from contextlib import closing
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse
+
+FILA_PATH = Path(os.getenv("FILA_PATH") or Path(__file__).with_name("fila") / "fila.sqlite3")
+FILA_LEASE = float(os.getenv("FILA_LEASE", "180"))
+FILA_MAX_TENTATIVAS = int(os.getenv("FILA_MAX_TENTATIVAS", "3"))
+FILA_ESPERA = float(os.getenv("FILA_ESPERA", "5"))  # s entre consultas com a fila vazia
+
+log = logging.getLogger("fila")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    rodada      TEXT    NOT NULL,
+    portal      TEXT    NOT NULL,
+    conta       TEXT    NOT NULL,
+    base        TEXT    NOT NULL DEFAULT '',
+    status      TEXT    NOT NULL DEFAULT 'pendente',
+    tentativas  INTEGER NOT NULL DEFAULT 0,
+    worker      TEXT,
+    lease_ate   REAL,
+    heartbeat   REAL,
+    criado_em   REAL    NOT NULL,
+    inicio      REAL,
+    fim         REAL,
+    erro        TEXT,
+    resultado   TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_livres ON jobs (status, lease_ate, id);
+"""
+
+COLUNAS = ("id", "rodada", "portal", "conta", "base", "status", "tentativas", "worker", "lease_ate")
+
+
+def id_worker() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class Fila:
+    def __init__(self, path: Path = FILA_PATH, lease: float = FILA_LEASE,
+                 max_tentativas: int = FILA_MAX_TENTATIVAS):
+        self.path = Path(path)
+        self.lease = lease
+        self.max_tentativas = max_tentativas
+        self._pronto = False
+
+    def _conectar(self) -> sqlite3.Connection:
+        if not self._pronto:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        # isolation_level=None: transações explícitas (BEGIN IMMEDIATE no reivindicar)
+        con = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+        if not self._pronto:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.executescript(SCHEMA)
+            self._pronto = True
+        return con
+
+    # ------------ Coordenação ------------
+    def enfileirar(self, jobs: List[Dict[str, str]], rodada: Optional[str] = None) -> List[int]:
+        """jobs = [{"portal", "conta"}]; pula os que já estão pendentes/em execução."""
+        rodada = rodada or datetime.now().strftime("%Y%m%d_%H%M%S")
+        ids = []
+        with closing(self._conectar()) as con:
+            con.execute("BEGIN IMMEDIATE")
+            try:
+                for j in jobs:
+                    ativo = con.execute(
+                        "SELECT 1 FROM jobs WHERE conta=? AND base=? AND status IN ('pendente','em_execucao')",
+                        (j["conta"], j.get("base", ""))).fetchone()
+                    if ativo:
+                        continue
+                    cur = con.execute("INSERT INTO jobs (rodada, portal, conta, base, criado_em) VALUES (?, ?, ?, ?, ?)",
+                                      (rodada, j["portal"], j["conta"], j.get("base", ""), time.time()))
+                    ids.append(cur.lastrowid)
+                con.execute("COMMIT")
+            except BaseException:
+                con.execute("ROLLBACK")
+                raise
+        return ids
+
+    # ------------ Worker ------------
+    def reivindicar(self, worker: str) -> Optional[Dict[str, Any]]:
+        """Próximo job livre (pendente ou com lease vencido), já com lease deste worker."""
+        agora = time.time()
+        with closing(self._conectar()) as con:
+            con.execute("BEGIN IMMEDIATE")
+            try:
+                linha = con.execute(
+                    f"SELECT {', '.join(COLUNAS)} FROM jobs "
+                    "WHERE status='pendente' OR (status='em_execucao' AND lease_ate < ?) ORDER BY id LIMIT 1",
+                    (agora,)).fetchone()
+                if linha is None:
+                    con.execute("COMMIT")
+                    return None
+                job = dict(zip(COLUNAS, linha))
+                if job["status"] == "em_execucao":
+                    log.warning("Job %s: lease de %s venceu; reassumindo", job["id"], job["worker"])
+                con.execute("UPDATE jobs SET status='em_execucao', worker=?, lease_ate=?, heartbeat=?, inicio=?, "
+                            "tentativas=tentativas+1 WHERE id=?",
+                            (worker, agora + self.lease, agora, agora, job["id"]))
+                con.execute("COMMIT")
+            except BaseException:
+                con.execute("ROLLBACK")
+                raise
+        job.update(status="em_execucao", worker=worker, tentativas=job["tentativas"] + 1)
+        return job
+
+    def renovar(self, job_id: int, worker: str) -> bool:
+        """Heartbeat; False se o lease já passou para outro worker."""
+        agora = time.time()
+        with closing(self._conectar()) as con:
+            cur = con.execute("UPDATE jobs SET lease_ate=?, heartbeat=? WHERE id=? AND worker=? AND status='em_execucao'",
+                              (agora + self.lease, agora, job_id, worker))
+            return cur.rowcount == 1
+
+    def concluir(self, job_id: int, worker: str, resultado: Dict[str, Any]) -> bool:
+        with closing(self._conectar()) as con:
+            cur = con.execute("UPDATE jobs SET status='concluido', fim=?, erro=NULL, resultado=? "
+                              "WHERE id=? AND worker=? AND status='em_execucao'",
+                              (time.time(), json.dumps(resultado, ensure_ascii=False, default=str), job_id, worker))
+            return cur.rowcount == 1
+
+    def falhar(self, job_id: int, worker: str, erro: str, definitivo: bool = False) -> bool:
+        """Devolve à fila (ou marca "falhou" se esgotou as tentativas)."""
+        with closing(self._conectar()) as con:
+            cur = con.execute(
+                "UPDATE jobs SET status=CASE WHEN ? OR tentativas >= ? THEN 'falhou' ELSE 'pendente' END, "
+                "fim=?, erro=?, lease_ate=NULL WHERE id=? AND worker=? AND status='em_execucao'",
+                (int(definitivo), self.max_tentativas, time.time(), (erro or "")[:500], job_id, worker))
+            return cur.rowcount == 1
+
+    # ------------ Leitura ------------
+    def contagem(self) -> Dict[str, int]:
+        with closing(self._conectar()) as con:
+            return dict(con.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+    def ativos(self) -> int:
+        """Jobs que ainda podem rodar (pendentes ou em execução)."""
+        c = self.contagem()
+        return c.get("pendente", 0) + c.get("em_execucao", 0)
+
+    def limpar(self, dias: float) -> int:
+        with closing(self._conectar()) as con:
+            cur = con.execute("DELETE FROM jobs WHERE status IN ('concluido','falhou') AND fim < ?",
+                              (time.time() - dias * 86400,))
+            return cur.rowcount
+
+
+FILA = Fila()
+
+
+# ------------ Jobs a partir das contas ------------
+def jobs_das_contas(nomes: Optional[List[str]] = None) -> List[Dict[str, str]]:
+    from coletor_async import contas_selecionadas
+    jobs = []
+    for conta in contas_selecionadas(nomes):
+        url = os.getenv(f"{conta.nome}_LOGIN_URL") or conta.url_login
+        jobs.append({"portal": urlparse(url).netloc or "-", "conta": conta.nome})
+    return jobs
+
+
+# ------------ Worker ------------
+async def _heartbeat(fila: Fila, job_id: int, worker: str) -> None:
+    import asyncio
+    while True:
+        await asyncio.sleep(fila.lease / 3)
+        if not fila.renovar(job_id, worker):
+            log.warning("Job %s: lease perdido por %s", job_id, worker)
+            return
+
+
+async def trabalhar(fila: Fila = FILA, worker: Optional[str] = None, ate_esvaziar: bool = False,
+                    espera: float = FILA_ESPERA) -> int:
+    """Loop do worker: um navegador, um job por vez. Devolve quantos jobs executou."""
+    import asyncio
+    from playwright.async_api import async_playwright
+    from coletor_async import coletar_conta, contas_selecionadas, escritor_do_ambiente, registrar_resultado
+    from metricas import METRICAS
+
+    worker = worker or id_worker()
+    METRICAS.iniciar("fila_worker")
+    escritor = escritor_do_ambiente()
+    feitos = 0
+    headless = os.getenv("HEADLESS", "true").strip().lower() in ("1", "true", "yes", "y", "on")
+    async with async_playwright() as pw:
+        tipo = getattr(pw, os.getenv("BROWSER", "chromium"))
+        browser = None
+        try:
+            while True:
+                job = fila.reivindicar(worker)
+                if job is None:
+                    if ate_esvaziar and fila.ativos() == 0:
+                        break
+                    await asyncio.sleep(espera)
+                    continue
+                log.info("🔧 %s pegou job %s (%s)", worker, job["id"], job["conta"])
+                try:
+                    conta = contas_selecionadas([job["conta"]])[0]
+                except RuntimeError as e:
+                    fila.falhar(job["id"], worker, str(e), definitivo=True)
+                    continue
+                if browser is None or not browser.is_connected():
+                    browser = await tipo.launch(headless=headless, args=["--disable-gpu"])
+                batimento = asyncio.ensure_future(_heartbeat(fila, job["id"], worker))
+                try:
+                    r = await coletar_conta(browser, conta)
+                finally:
+                    batimento.cancel()
+                r["dados_extras"]["fila"] = {"job": job["id"], "worker": worker, "tentativa": job["tentativas"]}
+                if r["sucesso"]:
+                    ok = fila.concluir(job["id"], worker, r)
+                else:
+                    ok = fila.falhar(job["id"], worker, r["erro"])
+                if not ok:
+                    log.warning("Job %s: lease perdido por %s; resultado descartado", job["id"], worker)
+                    continue
+                if r["sucesso"] and escritor is not None:
+                    escritor.enviar(r["precos"])
+                registrar_resultado(r)
+                feitos += 1
+        finally:
+            if browser is not None:
+                await browser.close()
+    if escritor is not None:
+        for status, body in await escritor.fechar():
+            print("📡 UPSERT Status:", status, body or "")
+    METRICAS.finalizar(jobs=feitos, worker=worker)
+    return feitos
+
+
+def subir_workers(n: int, ate_esvaziar: bool = True) -> int:
+    """Sobe N processos `fila.py worker` e espera todos; devolve o maior código de saída."""
+    cmd = [sys.executable, str(Path(__file__).resolve()), "worker"] + (["--ate-esvaziar"] if ate_esvaziar else [])
+    procs = [subprocess.Popen(cmd + ["--id", f"{socket.gethostname()}:{os.getpid()}:{i}"]) for i in range(n)]
+    try:
+        return max(p.wait() for p in procs)
+    except KeyboardInterrupt:
+        for p in procs:
+            p.terminate()
+        return max(p.wait() for p in procs)
+
+
+# ------------ CLI ------------
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Fila de coleta com vários workers.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    ep = sub.add_parser("enfileirar", help="cria os jobs de uma rodada")
+    rp = sub.add_parser("rodar", help="enfileira a rodada e sobe N workers")
+    for p in (ep, rp):
+        p.add_argument("--contas", help="contas separadas por vírgula (padrão: COLETA_CONTAS ou todas)")
+    rp.add_argument("--workers", type=int, default=int(os.getenv("FILA_WORKERS", "2")))
+    wp = sub.add_parser("worker", help="processa jobs (um navegador por processo)")
+    wp.add_argument("--id", help="identificador do worker (padrão: host:pid)")
+    wp.add_argument("--ate-esvaziar", action="store_true", help="sai quando não houver job pendente")
+    sub.add_parser("status", help="jobs por status")
+    lp = sub.add_parser("limpar", help="apaga jobs terminados")
+    lp.add_argument("--dias", type=float, default=7)
+    args = ap.parse_args(argv)
+
+    if args.cmd == "status":
+        print(json.dumps(FILA.contagem(), ensure_ascii=False))
+        return 0
+    if args.cmd == "limpar":
+        print(f"🧹 {FILA.limpar(args.dias)} job(s) removido(s)")
+        return 0
+    if args.cmd == "worker":
+        import asyncio
+        n = asyncio.run(trabalhar(worker=args.id, ate_esvaziar=args.ate_esvaziar))
+        print(f"✅ {args.id or id_worker()}: {n} job(s)")
+        return 0
+
+    contas = [c.strip().upper() for c in args.contas.split(",") if c.strip()] if args.contas else None
+    ids = FILA.enfileirar(jobs_das_contas(contas))
+    print(f"📥 {len(ids)} job(s) enfileirado(s)")
+    if args.cmd == "enfileirar":
+        return 0
+    codigo = subir_workers(max(1, args.workers))
+    print(json.dumps(FILA.contagem(), ensure_ascii=False))
+    return codigo
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(message)s")
+    sys.exit(main())
@@ -0,0 +1,233 @@
+"""
+har.py
+------
+Gravação e reprodução da sessão login→vitrine em HAR: o coletor roda inteiro
+(navegador, espera, bloqueio, extração) sem rede nem credenciais.
+
+⚡ Funcionamento:
+- HAR_MODO=gravar: o contexto nasce com `record_har_path`
+  (`har/<conta>.har.zip`, conteúdo anexado) e sem sessão salva, para o login
+  de verdade entrar no arquivo. Depois que o contexto fecha, `redigir` troca
+  usuário e senha gravados pelos marcadores HAR_USUARIO / HAR_SENHA — o HAR
+  não guarda a senha.
+- HAR_MODO=reproduzir: `route_from_har` serve tudo do arquivo e aborta o que
+  não foi gravado (nada sai para a rede). O login preenche os marcadores, que
+  batem com o POST gravado. Não há envio ao Supabase, backup, histórico,
+  variações nem sessão salva: os preços são os da gravação.
+- O bloqueio (bloqueio.py) segue valendo na reprodução: a rota dele é
+  instalada depois e cai (`fallback`) na do HAR.
+
+Grave com BLOQUEIO=false para o HAR ter todos os recursos; aí a comparação
+com e sem bloqueio usa exatamente a mesma entrada.
+
+Linha de comando:
+    HAR_MODO=gravar python coletor_turbo.py        # ou: python ../coletor.py collect --har gravar
+    python har.py listar
+    python har.py comparar -n 5 BLOQUEIO=true BLOQUEIO=false CAPTURA_API=false
+    python har.py comparar --modo async -n 3 "SELETOR_CARREGANDO=.nada" ""
+"""
+
+import argparse
+import json
+import logging
+import os
+import shlex
+import subprocess
+import sys
+import time
+import zipfile
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import quote, quote_plus
+
+from metricas import quantil
+
+BASE_DIR = Path(__file__).resolve().parent
+HAR_DIR = Path(os.getenv("HAR_DIR") or BASE_DIR / "har")
+HAR_USUARIO = "har-usuario"
+HAR_SENHA = "har-senha"
+MODOS = ("gravar", "reproduzir")
+
+log = logging.getLogger("har")
+
+
+def har_modo() -> str:
+    """"gravar", "reproduzir" ou "" (desligado)."""
+    modo = os.getenv("HAR_MODO", "").strip().lower()
+    if modo and modo not in MODOS:
+        raise RuntimeError(f"HAR_MODO inválido: {modo!r} (use {' ou '.join(MODOS)})")
+    return modo
+
+
+def gravando() -> bool:
+    return har_modo() == "gravar"
+
+
+def reproduzindo() -> bool:
+    return har_modo() == "reproduzir"
+
+
+def caminho_har(conta: str) -> Path:
+    return HAR_DIR / f"{conta}.har.zip"
+
+
+# ------------ Contexto ------------
+def opcoes_contexto(conta: str) -> Dict[str, Any]:
+    """kwargs extras de `browser.new_context` (só na gravação)."""
+    if not gravando():
+        return {}
+    if os.getenv("BLOQUEIO", "true").strip().lower() in ("1", "true", "yes", "y", "on"):
+        log.warning("Gravando HAR com BLOQUEIO ativo: recursos bloqueados não entram no arquivo")
+    HAR_DIR.mkdir(parents=True, exist_ok=True)
+    return {"record_har_path": str(caminho_har(conta)), "record_har_mode": "full", "record_har_content": "attach"}
+
+
+def _har_existente(conta: str) -> str:
+    path = caminho_har(conta)
+    if not path.exists():
+        raise FileNotFoundError(f"HAR de {conta} não encontrado em {path}; grave antes com HAR_MODO=gravar")
+    return str(path)
+
+
+def reproduzir(ctx, conta: str) -> None:
+    """Serve o contexto (API sync) a partir do HAR gravado; instale antes do bloqueio."""
+    if reproduzindo():
+        ctx.route_from_har(_har_existente(conta), not_found="abort")
+
+
+async def reproduzir_async(ctx, conta: str) -> None:
+    if reproduzindo():
+        await ctx.route_from_har(_har_existente(conta), not_found="abort")
+
+
+def credenciais_da_reproducao() -> Optional[Tuple[str, str]]:
+    """Os marcadores gravados no lugar de usuário/senha, ou None fora da reprodução."""
+    return (HAR_USUARIO, HAR_SENHA) if reproduzindo() else None
+
+
+# ------------ Redação ------------
+def _variantes(segredo: str) -> List[str]:
+    if len(segredo) < 4:  # curto demais: trocaria pedaços de URL que não são a credencial
+        return []
+    return sorted({segredo, quote(segredo, safe=""), quote_plus(segredo), json.dumps(segredo)[1:-1]},
+                  key=len, reverse=True)
+
+
+def _trocar(texto: Optional[str], trocas: List[Tuple[str, str]]) -> Tuple[Optional[str], int]:
+    if not texto:
+        return texto, 0
+    n = 0
+    for velho, novo in trocas:
+        if velho in texto:
+            n += texto.count(velho)
+            texto = texto.replace(velho, novo)
+    return texto, n
+
+
+def redigir(conta: str, usuario: str, senha: str) -> int:
+    """Troca usuário/senha nas requisições do HAR gravado pelos marcadores; devolve quantas trocas."""
+    if not gravando():
+        return 0
+    path = caminho_har(conta)
+    if not path.exists():
+        return 0
+    trocas = [(v, HAR_SENHA) for v in _variantes(senha)] + [(v, HAR_USUARIO) for v in _variantes(usuario)]
+    with zipfile.ZipFile(path) as z:
+        membros = {i.filename: z.read(i.filename) for i in z.infolist()}
+    nome_har = next(n for n in membros if n.endswith(".har"))
+    har = json.loads(membros[nome_har])
+    total = 0
+    for entrada in har["log"]["entries"]:
+        req = entrada["request"]
+        req["url"], n = _trocar(req["url"], trocas)
+        total += n
+        for q in req.get("queryString") or []:
+            q["value"], n = _trocar(q.get("value"), trocas)
+            total += n
+        post = req.get("postData") or {}
+        post["text"], n = _trocar(post.get("text"), trocas)
+        total += n
+        for p in post.get("params") or []:
+            p["value"], n = _trocar(p.get("value"), trocas)
+            total += n
+    membros[nome_har] = json.dumps(har, ensure_ascii=False).encode("utf-8")
+    tmp = path.with_suffix(".tmp")
+    with zipfile.ZipFile(tmp, "w", zipfile.ZIP_DEFLATED) as z:
+        for nome, dados in membros.items():
+            z.writestr(nome, dados)
+    os.replace(tmp, path)
+    if total:
+        log.info("HAR de %s gravado em %s (%d entradas, credenciais redigidas)", conta, path, len(har["log"]["entries"]))
+    else:
+        log.warning("HAR de %s: credenciais não apareceram nas requisições; a reprodução pode não casar o login", conta)
+    return total
+
+
+# ------------ Comparação ------------
+def _comando(modo: str, script: Optional[str]) -> List[str]:
+    if script:
+        return [sys.executable, str(BASE_DIR / script)]
+    return [sys.executable, str(BASE_DIR.parent / "coletor.py"), "collect", "--modo", modo, "--sem-envio"]
+
+
+def _ambiente(variante: str) -> Dict[str, str]:
+    env = dict(os.environ, HAR_MODO="reproduzir", METRICAS=os.getenv("METRICAS", "false"))
+    for par in shlex.split(variante):
+        k, _, v = par.partition("=")
+        env[k] = v
+    return env
+
+
+def comparar(variantes: List[str], repeticoes: int = 3, modo: str = "turbo",
+             script: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    """Roda o coletor em reprodução `repeticoes` vezes por variante de ambiente; tempos de parede."""
+    cmd = _comando(modo, script)
+    resultado: Dict[str, Dict[str, Any]] = {}
+    for variante in variantes or [""]:
+        env = _ambiente(variante)
+        tempos, falhas = [], 0
+        for _ in range(repeticoes):
+            t0 = time.perf_counter()
+            proc = subprocess.run(cmd, env=env, cwd=str(BASE_DIR), stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+            tempos.append(time.perf_counter() - t0)
+            if proc.returncode != 0:
+                falhas += 1
+                log.warning("%s: saída %d\n%s", variante or "(padrão)", proc.returncode,
+                            proc.stderr.decode("utf-8", "replace")[-2000:])
+        tempos.sort()
+        resultado[variante or "(padrão)"] = {"n": len(tempos), "falhas": falhas, "min": tempos[0],
+                                             "p50": quantil(tempos, 0.5), "p95": quantil(tempos, 0.95)}
+    return resultado
+
+
+# ------------ CLI ------------
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Gravação/reprodução HAR dos coletores.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("listar", help="HARs gravados")
+    cp = sub.add_parser("comparar", help="tempo de parede por variante de ambiente, offline")
+    cp.add_argument("variantes", nargs="*", help='ex.: BLOQUEIO=false "CAPTURA_API=false BLOQUEIO=false"')
+    cp.add_argument("-n", "--repeticoes", type=int, default=3)
+    cp.add_argument("--modo", choices=["turbo", "async"], default="turbo")
+    cp.add_argument("--script", help="roda este script (ex.: vibra_marques.py) em vez do coletor.py collect")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "listar":
+        for p in sorted(HAR_DIR.glob("*.har.zip")):
+            with zipfile.ZipFile(p) as z:
+                nome_har = next(n for n in z.namelist() if n.endswith(".har"))
+                entradas = len(json.loads(z.read(nome_har))["log"]["entries"])
+            quando = time.strftime("%Y-%m-%d %H:%M", time.localtime(p.stat().st_mtime))
+            print(f"{p.name:<32} {quando}  {entradas:>5} entradas  {p.stat().st_size / 1024:>8.0f} KB")
+        return 0
+
+    resultado = comparar(args.variantes, args.repeticoes, args.modo, args.script)
+    print(f"{'variante':<40} {'n':>3} {'falhas':>6} {'min':>7} {'p50':>7} {'p95':>7}")
+    for nome, r in resultado.items():
+        print(f"{nome:<40} {r['n']:>3} {r['falhas']:>6} {r['min']:>7.2f} {r['p50']:>7.2f} {r['p95']:>7.2f}")
+    return 0 if all(r["falhas"] == 0 for r in resultado.values()) else 1
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(message)s")
+    sys.exit(main())
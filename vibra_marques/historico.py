@@ -0,0 +1,372 @@
+"""
+historico.py
+------------
+Histórico local de preços em formato colunar, particionado por mês.
+
+⚡ Layout (só stdlib, `array` + arquivos binários append-only):
+    historico/
+      dicionario.json        distribuidoras e produtos -> índice (estável)
+      importados.json        arquivos de backup já importados
+      2025-09/ts.bin         array('d')  epoch (s) da coleta
+      2025-09/dist.bin       array('H')  índice da distribuidora
+      2025-09/prod.bin       array('B')  índice do produto
+      2025-09/preco.bin      array('i')  preço x 10000 (4 casas exatas)
+
+Uma linha por (coleta, distribuidora, produto) com preço; nulos não entram.
+As colunas crescem juntas; se um processo morrer no meio de um append, a
+leitura usa o menor comprimento entre elas e o próximo append (sob o lock)
+corta as sobras antes de escrever.
+
+- `anexar(distribuidora, precos)`: append em streaming, usado pelos coletores.
+- `importar(caminhos)`: lê todos os formatos de backup existentes
+  (backup/coleta_<DIST>_<ts>.json, backups/coleta_<ts>.json,
+  backups/vibra_marques_*.json, backups/precos_*_<data>.json, precos_vibra.json).
+  Linhas com (instante, distribuidora, produto) já gravados são puladas: o
+  backup/ do coletor_async repete o que `registrar_coleta` já anexou.
+- `consultar(distribuidora, produto, inicio, fim)`: lê só os meses do intervalo.
+
+Linha de comando:
+    python historico.py importar                 # backup/, backups/, precos_vibra.json
+    python historico.py consultar --dist VIBRA_BB --produto diesel_s10 --de 2025-08-01 --ate 2025-08-31
+    python historico.py resumo
+
+HISTORICO=false desliga o append nos coletores; HISTORICO_DIR muda a pasta.
+"""
+
+import argparse
+import glob
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from array import array
+from contextlib import contextmanager
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from extracao import campo_do_produto
+
+try:
+    import fcntl
+except ImportError:  # Windows: fica só o lock entre threads
+    fcntl = None
+
+BASE_DIR = Path(__file__).resolve().parent
+HISTORICO_DIR = Path(os.getenv("HISTORICO_DIR") or BASE_DIR / "historico")
+ESCALA = 10000
+PRODUTOS = ("gasolina_comum", "gasolina_aditivada", "etanol_hidratado", "diesel_s10",
+            "diesel_s10_aditivado", "diesel_s500", "diesel_s500_aditivado")
+COLUNAS = (("ts", "d"), ("dist", "H"), ("prod", "B"), ("preco", "i"))
+ORIGENS_PADRAO = ("backup/*.json", "backups/*.json", "precos_vibra.json")
+
+log = logging.getLogger("historico")
+
+
+def historico_ativo() -> bool:
+    return os.getenv("HISTORICO", "true").strip().lower() in ("1", "true", "yes", "y", "on")
+
+
+def nome_distribuidora(nome: str) -> str:
+    """"VIBRA MARQUES" e "VIBRA_MARQUES" são a mesma distribuidora."""
+    return re.sub(r"[\s\-]+", "_", (nome or "").strip().upper())
+
+
+def _epoch(quando: Any) -> float:
+    if isinstance(quando, (int, float)):
+        return float(quando)
+    if isinstance(quando, datetime):
+        return quando.timestamp()
+    if isinstance(quando, date):
+        return datetime(quando.year, quando.month, quando.day).timestamp()
+    texto = str(quando)
+    try:
+        return datetime.fromisoformat(texto).timestamp()
+    except ValueError:
+        return datetime.strptime(texto[:10], "%Y-%m-%d").timestamp()
+
+
+def _mes(ts: float) -> str:
+    return datetime.fromtimestamp(ts).strftime("%Y-%m")
+
+
+@contextmanager
+def trava_entre_processos(path: Path):
+    """flock exclusivo em `path`: os workers da fila.py gravam no mesmo diretório."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class Historico:
+    def __init__(self, pasta: Path = HISTORICO_DIR):
+        self.pasta = Path(pasta)
+        self._lock = threading.Lock()
+        self._dic: Optional[Dict[str, List[str]]] = None
+
+    # ------------ Dicionário ------------
+    def _ler_dicionario(self) -> Dict[str, List[str]]:
+        try:
+            with open(self.pasta / "dicionario.json", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"distribuidoras": [], "produtos": list(PRODUTOS)}
+
+    def _dicionario(self) -> Dict[str, List[str]]:
+        if self._dic is None:
+            self._dic = self._ler_dicionario()
+        return self._dic
+
+    def _indice(self, tipo: str, valor: str) -> int:
+        lista = self._dicionario()[tipo]
+        if valor not in lista:
+            lista.append(valor)
+            self.pasta.mkdir(parents=True, exist_ok=True)
+            tmp = self.pasta / "dicionario.json.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._dic, f, ensure_ascii=False, indent=1)
+            os.replace(tmp, self.pasta / "dicionario.json")
+        return lista.index(valor)
+
+    # ------------ Escrita ------------
+    def anexar_linhas(self, linhas: Iterable[Tuple[float, str, str, float]]) -> int:
+        """Grava [(epoch, distribuidora, produto, preço)] nas partições mensais."""
+        por_mes: Dict[str, Dict[str, array]] = {}
+        n = 0
+        with self._lock, trava_entre_processos(self.pasta / ".lock"):
+            self._dic = self._ler_dicionario()  # outro processo pode ter acrescentado nomes
+            for ts, dist, prod, preco in linhas:
+                if preco is None:
+                    continue
+                cols = por_mes.setdefault(_mes(ts), {c: array(t) for c, t in COLUNAS})
+                cols["ts"].append(ts)
+                cols["dist"].append(self._indice("distribuidoras", nome_distribuidora(dist)))
+                cols["prod"].append(self._indice("produtos", prod))
+                cols["preco"].append(int(round(float(preco) * ESCALA)))
+                n += 1
+            for mes, cols in por_mes.items():
+                d = self.pasta / mes
+                d.mkdir(parents=True, exist_ok=True)
+                self._alinhar(d)
+                for c, _ in COLUNAS:
+                    with open(d / f"{c}.bin", "ab") as f:
+                        cols[c].tofile(f)
+        return n
+
+    @staticmethod
+    def _alinhar(d: Path) -> None:
+        """Corta as colunas da partição no menor comprimento (append interrompido no meio)."""
+        bytes_ = {c: (d / f"{c}.bin").stat().st_size if (d / f"{c}.bin").exists() else 0 for c, _ in COLUNAS}
+        n = min(bytes_[c] // array(t).itemsize for c, t in COLUNAS)
+        for c, t in COLUNAS:
+            if bytes_[c] > n * array(t).itemsize:
+                log.warning("Histórico %s/%s.bin: sobra de %d byte(s) cortada", d.name, c,
+                            bytes_[c] - n * array(t).itemsize)
+                os.truncate(d / f"{c}.bin", n * array(t).itemsize)
+
+    def anexar(self, distribuidora: str, precos: Dict[str, Any], quando: Any = None) -> int:
+        """Uma coleta ({campo: preço}, com ou sem data_coleta/empresa) -> histórico."""
+        ts = _epoch(quando if quando is not None else time.time())
+        return self.anexar_linhas(linhas_de_payload(ts, distribuidora, precos))
+
+    # ------------ Leitura ------------
+    def _particao(self, mes: str) -> Optional[Dict[str, array]]:
+        d = self.pasta / mes
+        if not d.is_dir():
+            return None
+        cols = {}
+        for c, t in COLUNAS:
+            a = array(t)
+            p = d / f"{c}.bin"
+            if p.exists():
+                with open(p, "rb") as f:
+                    dados = f.read()
+                a.frombytes(dados[:len(dados) - len(dados) % a.itemsize])  # item parcial de append interrompido
+            cols[c] = a
+        n = min(len(a) for a in cols.values())
+        return {c: a[:n] if len(a) > n else a for c, a in cols.items()}
+
+    def meses(self) -> List[str]:
+        if not self.pasta.is_dir():
+            return []
+        return sorted(p.name for p in self.pasta.iterdir() if p.is_dir() and re.fullmatch(r"\d{4}-\d{2}", p.name))
+
+    def consultar(self, distribuidora: Optional[str] = None, produto: Optional[str] = None,
+                  inicio: Any = None, fim: Any = None) -> Iterator[Tuple[datetime, str, str, float]]:
+        """(quando, distribuidora, produto, preço) em ordem de gravação; `fim` é inclusivo (dia inteiro)."""
+        dic = self._ler_dicionario()
+        t0 = _epoch(inicio) if inicio is not None else float("-inf")
+        t1 = float("inf")
+        if fim is not None:
+            t1 = _epoch(fim)
+            if not isinstance(fim, datetime) and (isinstance(fim, date) or len(str(fim)) == 10):
+                t1 += 86400  # só a data: inclui o dia inteiro
+        di = dic["distribuidoras"].index(nome_distribuidora(distribuidora)) \
+            if distribuidora and nome_distribuidora(distribuidora) in dic["distribuidoras"] else None
+        pi = dic["produtos"].index(produto) if produto and produto in dic["produtos"] else None
+        if (distribuidora and di is None) or (produto and pi is None):
+            return
+        m0 = _mes(t0) if t0 != float("-inf") else ""
+        m1 = _mes(t1 - 1) if t1 != float("inf") else "9999-99"
+        for mes in self.meses():
+            if not m0 <= mes <= m1:
+                continue
+            cols = self._particao(mes)
+            if cols is None:
+                continue
+            ts, ds, ps, pr = cols["ts"], cols["dist"], cols["prod"], cols["preco"]
+            nd, nprod = len(dic["distribuidoras"]), len(dic["produtos"])
+            for i in range(len(ts)):
+                if ds[i] >= nd or ps[i] >= nprod:
+                    continue  # gravada depois da leitura do dicionário
+                if (di is None or ds[i] == di) and (pi is None or ps[i] == pi) and t0 <= ts[i] < t1:
+                    yield (datetime.fromtimestamp(ts[i]), dic["distribuidoras"][ds[i]],
+                           dic["produtos"][ps[i]], pr[i] / ESCALA)
+
+    # ------------ Importação ------------
+    def importar(self, caminhos: Iterable[str]) -> Dict[str, int]:
+        """Importa arquivos de backup (pula arquivos já importados, por caminho+mtime+tamanho, e linhas já gravadas)."""
+        reg_path = self.pasta / "importados.json"
+        try:
+            with open(reg_path, encoding="utf-8") as f:
+                registro = json.load(f)
+        except FileNotFoundError:
+            registro = {}
+        stats = {"arquivos": 0, "pulados": 0, "linhas": 0, "duplicadas": 0}
+        vistos = None
+        for caminho in caminhos:
+            p = Path(caminho).resolve()
+            st = p.stat()
+            assinatura = f"{st.st_mtime_ns}:{st.st_size}"
+            if registro.get(str(p)) == assinatura:
+                stats["pulados"] += 1
+                continue
+            try:
+                with open(p, encoding="utf-8") as f:
+                    dados = json.load(f)
+            except (OSError, ValueError) as e:
+                log.warning("Ignorando %s: %s", p, e)
+                continue
+            if vistos is None:  # só quando há o que importar
+                vistos = {(round(q.timestamp(), 3), dist, prod) for q, dist, prod, _ in self.consultar()}
+            novas = []
+            for ts, dist, prod, preco in linhas_de_backup(p, dados):
+                chave = (round(ts, 3), nome_distribuidora(dist), prod)
+                if chave in vistos:
+                    stats["duplicadas"] += 1
+                    continue
+                vistos.add(chave)
+                novas.append((ts, dist, prod, preco))
+            stats["linhas"] += self.anexar_linhas(novas)
+            stats["arquivos"] += 1
+            registro[str(p)] = assinatura
+        self.pasta.mkdir(parents=True, exist_ok=True)
+        with open(reg_path, "w", encoding="utf-8") as f:
+            json.dump(registro, f, ensure_ascii=False, indent=1)
+        return stats
+
+
+# ------------ Formatos de backup ------------
+def linhas_de_payload(ts: float, distribuidora: str, p: Dict[str, Any]) -> Iterator[Tuple[float, str, str, float]]:
+    for campo, valor in p.items():
+        if campo == "gasolina_grid":
+            campo = "gasolina_aditivada"
+        if campo in PRODUTOS and valor is not None:
+            yield ts, distribuidora, campo, float(valor)
+
+def linhas_de_backup(path: Path, dados: Any) -> Iterator[Tuple[float, str, str, float]]:
+    """Qualquer JSON de backup conhecido -> (epoch, distribuidora, produto, preço)."""
+    mtime = path.stat().st_mtime
+    if isinstance(dados, list):
+        # precos_vibra.json sem data: registros de card {nome, preco, campo, ...}
+        # (vibra_marques.py / reserva.py) ou, nos arquivos antigos, [{"produto", "valor"}]
+        precos: Dict[str, float] = {}
+        for item in dados:
+            if not isinstance(item, dict):
+                continue
+            if "nome" in item:
+                campo, valor = item.get("campo") or campo_do_produto(item["nome"]), item.get("preco")
+            elif "produto" in item:
+                campo, valor = campo_do_produto(item["produto"]), item.get("valor")
+            else:
+                continue
+            if campo and campo not in precos and valor is not None:
+                precos[campo] = valor
+        yield from linhas_de_payload(mtime, "VIBRA_MARQUES", precos)
+        return
+    if not isinstance(dados, dict):
+        return
+    if "resultados" in dados:
+        # backups/coleta_<ts>.json: várias linhas da tabela
+        ts = _epoch(dados["timestamp"]) if dados.get("timestamp") else mtime
+        for r in dados["resultados"]:
+            yield from linhas_de_payload(ts, r.get("distribuidora") or r.get("empresa") or "", r)
+        return
+    if "precos" in dados and "distribuidora" in dados:
+        # backup/coleta_<DIST>_<ts>.json (coletor_async)
+        if dados.get("sucesso") and isinstance(dados["precos"], dict):
+            ts = _epoch(dados["timestamp"]) if dados.get("timestamp") else mtime
+            yield from linhas_de_payload(ts, dados["distribuidora"], dados["precos"])
+        return
+    if "data_coleta" in dados:
+        # linha única: backups/vibra_marques_*.json, backups/precos_*_<data>.json, precos_vibra.json
+        ts = _epoch(dados["data_coleta"]) if dados.get("data_coleta") else mtime
+        yield from linhas_de_payload(ts, dados.get("distribuidora") or dados.get("empresa") or "", dados)
+
+
+HISTORICO = Historico()
+
+def registrar_coleta(distribuidora: str, precos: Dict[str, Any], quando: Any = None) -> None:
+    """Append usado pelos coletores; nunca derruba a coleta."""
+    if not historico_ativo():
+        return
+    try:
+        HISTORICO.anexar(distribuidora, precos, quando)
+    except Exception as e:
+        log.warning("Falha ao gravar histórico de %s: %s", distribuidora, e)
+
+
+# ------------ CLI ------------
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Histórico colunar de preços.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    ip = sub.add_parser("importar", help="importa backups JSON")
+    ip.add_argument("caminhos", nargs="*", help="arquivos/globs (padrão: backup/, backups/, precos_vibra.json)")
+    cp = sub.add_parser("consultar", help="série de preços")
+    cp.add_argument("--dist")
+    cp.add_argument("--produto")
+    cp.add_argument("--de")
+    cp.add_argument("--ate")
+    sub.add_parser("resumo", help="linhas por mês")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "importar":
+        padroes = args.caminhos or [str(BASE_DIR / g) for g in ORIGENS_PADRAO]
+        arquivos = sorted({f for g in padroes for f in glob.glob(g)})
+        print(json.dumps(HISTORICO.importar(arquivos), ensure_ascii=False))
+    elif args.cmd == "consultar":
+        t = time.perf_counter()
+        n = 0
+        for quando, dist, prod, preco in HISTORICO.consultar(args.dist, args.produto, args.de, args.ate):
+            print(f"{quando:%Y-%m-%d %H:%M}  {dist:<24} {prod:<22} {preco:.4f}")
+            n += 1
+        print(f"⏱️ {n} linha(s) em {(time.perf_counter() - t) * 1000:.1f}ms")
+    else:
+        for mes in HISTORICO.meses():
+            cols = HISTORICO._particao(mes)
+            print(f"{mes}: {len(cols['ts'])} linha(s)")
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(message)s")
+    sys.exit(main())
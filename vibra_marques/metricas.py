@@ -0,0 +1,240 @@
+"""
+metricas.py
+-----------
+Instrumentação leve das execuções: spans por fase e contadores, gravados em
+JSON lines — um arquivo por execução em `metricas/`.
+
+⚡ Funcionamento:
+- `METRICAS.iniciar("coletor_async")` abre a execução; `finalizar()` grava
+  `metricas/<AAAAmmdd_HHMMSS>_<script>_<pid>.jsonl` (o pid separa os workers
+  da fila.py que começam no mesmo segundo).
+- `with METRICAS.span("supabase.upsert"): ...` mede um trecho; `Fases`
+  (prontidao.py) já repassa cada fase como span "fase.<nome>".
+- `METRICAS.contar(nome, n, **rotulos)`: bytes da rede (respostas do
+  navegador e do Supabase), retentativas, seletores de login usados etc.
+- Rótulos são de baixa cardinalidade (conta, método, candidato), para o
+  export Prometheus não explodir.
+
+Linhas do arquivo:
+    {"tipo": "execucao", "id": "...", "script": "coletor_async", "inicio": "...", "duracao_s": 41.2}
+    {"tipo": "span", "nome": "fase.login", "duracao_s": 6.31, "ok": true, "rotulos": {"conta": "VIBRA_AP"}}
+    {"tipo": "contador", "nome": "rede.bytes", "valor": 1834201, "rotulos": {"conta": "VIBRA_AP"}}
+
+METRICAS_PROMETHEUS=<arquivo>.prom exporta p50/p95 das últimas METRICAS_JANELA
+execuções ao final de cada uma (textfile collector do node_exporter).
+METRICAS=false desliga a gravação.
+
+Linha de comando:
+    python metricas.py resumo              # p50/p95 por span
+    python metricas.py prometheus saida.prom
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+METRICAS_DIR = Path(os.getenv("METRICAS_DIR") or Path(__file__).with_name("metricas"))
+METRICAS_JANELA = int(os.getenv("METRICAS_JANELA", "50"))
+
+log = logging.getLogger("metricas")
+
+Rotulos = Tuple[Tuple[str, str], ...]
+
+
+def metricas_ativas() -> bool:
+    return os.getenv("METRICAS", "true").strip().lower() in ("1", "true", "yes", "y", "on")
+
+
+def _rotulos(rotulos: Dict[str, Any]) -> Rotulos:
+    return tuple(sorted((k, str(v)) for k, v in rotulos.items() if v is not None))
+
+
+class Metricas:
+    def __init__(self, diretorio: Path = METRICAS_DIR):
+        self.diretorio = Path(diretorio)
+        self._lock = threading.Lock()  # spans chegam também das threads do EscritorSupabase
+        self.iniciar()
+
+    def iniciar(self, script: str = "") -> None:
+        with self._lock:
+            self.script = script
+            self.inicio = time.time()
+            self.spans: List[Dict[str, Any]] = []
+            self.contadores: Counter = Counter()
+
+    # ------------ Coleta ------------
+    def registrar(self, nome: str, duracao: float, ok: bool = True, **rotulos) -> None:
+        with self._lock:
+            self.spans.append({"nome": nome, "duracao_s": round(duracao, 4), "ok": ok,
+                               "rotulos": dict(_rotulos(rotulos))})
+
+    @contextmanager
+    def span(self, nome: str, **rotulos):
+        t0 = time.perf_counter()
+        ok = True
+        try:
+            yield
+        except BaseException:
+            ok = False
+            raise
+        finally:
+            self.registrar(nome, time.perf_counter() - t0, ok, **rotulos)
+
+    def contar(self, nome: str, n: float = 1, **rotulos) -> None:
+        with self._lock:
+            self.contadores[(nome, _rotulos(rotulos))] += n
+
+    def anexar_rede(self, ctx, conta: str) -> None:
+        """Soma o content-length das respostas do BrowserContext (sync ou async)."""
+        def _resposta(resp):
+            try:
+                tamanho = int(resp.headers.get("content-length") or 0)
+            except (ValueError, TypeError):
+                tamanho = 0
+            self.contar("rede.respostas", 1, conta=conta)
+            if tamanho:
+                self.contar("rede.bytes", tamanho, conta=conta)
+        ctx.on("response", _resposta)
+
+    # ------------ Gravação ------------
+    def finalizar(self, **extras) -> Optional[Path]:
+        """Grava o arquivo da execução (e o .prom, se configurado)."""
+        if not metricas_ativas():
+            return None
+        with self._lock:
+            fim = time.time()
+            ident = (datetime.fromtimestamp(self.inicio).strftime("%Y%m%d_%H%M%S")
+                     + (f"_{self.script}" if self.script else "") + f"_{os.getpid()}")
+            linhas = [{"tipo": "execucao", "id": ident, "script": self.script,
+                       "inicio": datetime.fromtimestamp(self.inicio).isoformat(timespec="seconds"),
+                       "duracao_s": round(fim - self.inicio, 3), **extras}]
+            linhas += [{"tipo": "span", **s} for s in self.spans]
+            linhas += [{"tipo": "contador", "nome": nome, "valor": valor, "rotulos": dict(rot)}
+                       for (nome, rot), valor in sorted(self.contadores.items())]
+        try:
+            self.diretorio.mkdir(parents=True, exist_ok=True)
+            path = self.diretorio / f"{ident}.jsonl"
+            with open(path, "w", encoding="utf-8") as f:
+                f.writelines(json.dumps(l, ensure_ascii=False) + "\n" for l in linhas)
+            prom = os.getenv("METRICAS_PROMETHEUS")
+            if prom:
+                exportar_prometheus(Path(prom), self.diretorio)
+            return path
+        except OSError as e:
+            log.warning("Falha ao gravar métricas: %s", e)
+            return None
+
+
+METRICAS = Metricas()
+
+
+# ------------ Agregação ------------
+def execucoes(diretorio: Path = METRICAS_DIR, janela: int = METRICAS_JANELA) -> List[List[Dict[str, Any]]]:
+    """Linhas das últimas `janela` execuções gravadas (mais antiga primeiro)."""
+    arquivos = sorted(Path(diretorio).glob("*.jsonl"))[-janela:] if janela else []
+    saida = []
+    for arq in arquivos:
+        try:
+            with open(arq, encoding="utf-8") as f:
+                saida.append([json.loads(l) for l in f if l.strip()])
+        except (OSError, ValueError) as e:
+            log.warning("Ignorando %s: %s", arq.name, e)
+    return saida
+
+
+def quantil(valores: List[float], q: float) -> float:
+    """Quantil por interpolação linear (valores já ordenados)."""
+    if not valores:
+        return 0.0
+    pos = (len(valores) - 1) * q
+    i = int(pos)
+    j = min(i + 1, len(valores) - 1)
+    return valores[i] + (valores[j] - valores[i]) * (pos - i)
+
+
+def duracoes(runs: List[List[Dict[str, Any]]]) -> Dict[Tuple[str, Rotulos], List[float]]:
+    """{(span, rótulos): [durações]} — a execução inteira entra como span "execucao"."""
+    por_chave: Dict[Tuple[str, Rotulos], List[float]] = {}
+    for linhas in runs:
+        for l in linhas:
+            if l.get("tipo") == "execucao":
+                chave = ("execucao", _rotulos({"script": l.get("script")}))
+            elif l.get("tipo") == "span":
+                chave = (l["nome"], _rotulos(l.get("rotulos") or {}))
+            else:
+                continue
+            por_chave.setdefault(chave, []).append(l["duracao_s"])
+    for v in por_chave.values():
+        v.sort()
+    return por_chave
+
+
+def _prom_rotulos(rotulos: Rotulos, **extra) -> str:
+    itens = list(rotulos) + sorted(extra.items())
+    if not itens:
+        return ""
+    esc = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in itens) + "}"
+
+
+def exportar_prometheus(destino: Path, diretorio: Path = METRICAS_DIR, janela: int = METRICAS_JANELA) -> None:
+    runs = execucoes(diretorio, janela)
+    out = ["# HELP coletor_span_segundos Duração dos spans nas últimas execuções.",
+           "# TYPE coletor_span_segundos summary"]
+    for (nome, rot), vals in sorted(duracoes(runs).items()):
+        for q in (0.5, 0.95):
+            out.append(f"coletor_span_segundos{_prom_rotulos(rot, span=nome, quantile=q)} {quantil(vals, q):.4f}")
+        out.append(f"coletor_span_segundos_sum{_prom_rotulos(rot, span=nome)} {sum(vals):.4f}")
+        out.append(f"coletor_span_segundos_count{_prom_rotulos(rot, span=nome)} {len(vals)}")
+    if runs:
+        out += ["# HELP coletor_contador Contadores da última execução.",
+                "# TYPE coletor_contador gauge"]
+        for l in runs[-1]:
+            if l.get("tipo") == "contador":
+                out.append(f"coletor_contador{_prom_rotulos(_rotulos(l.get('rotulos') or {}), nome=l['nome'])} {l['valor']}")
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    tmp = destino.with_suffix(destino.suffix + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write("\n".join(out) + "\n")
+    os.replace(tmp, destino)
+
+
+# ------------ CLI ------------
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Métricas das execuções dos coletores.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    rp = sub.add_parser("resumo", help="p50/p95 por span")
+    rp.add_argument("--janela", type=int, default=METRICAS_JANELA)
+    pp = sub.add_parser("prometheus", help="exporta textfile do Prometheus")
+    pp.add_argument("destino")
+    pp.add_argument("--janela", type=int, default=METRICAS_JANELA)
+    args = ap.parse_args(argv)
+
+    if args.cmd == "prometheus":
+        exportar_prometheus(Path(args.destino), janela=args.janela)
+        print(f"📈 Exportado para {args.destino}")
+        return 0
+
+    runs = execucoes(janela=args.janela)
+    if not runs:
+        print("Nenhuma execução registrada.")
+        return 1
+    print(f"{'span':<32} {'rótulos':<28} {'n':>4} {'p50':>8} {'p95':>8}")
+    for (nome, rot), vals in sorted(duracoes(runs).items()):
+        rotulos = ",".join(f"{k}={v}" for k, v in rot)
+        print(f"{nome:<32} {rotulos:<28} {len(vals):>4} {quantil(vals, 0.5):>8.2f} {quantil(vals, 0.95):>8.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(message)s")
+    sys.exit(main())
@@ -0,0 +1,235 @@
+"""
+outbox.py
+---------
+Fila local (SQLite) das linhas coletadas, gravada ANTES do envio ao Supabase.
+
+⚡ Funcionamento:
+- `gravar(linhas)`: cada linha normalizada entra como "pendente" (commit
+  imediato, WAL) — se o banco remoto cair, nada se perde. Uma pendente mais
+  antiga da mesma (data_coleta, empresa) é absorvida pela nova (a nova vence
+  campo a campo) e fica "substituido": preço velho nunca chega depois do novo.
+- `enviar(cliente, ids)`: sobe as linhas em lote (ClienteSupabase.upsert) e
+  marca "enviado" só depois do 2xx; em erro fica pendente com o motivo.
+  Pendente mais antiga que uma já enviada da mesma chave vira "substituido"
+  sem ir à rede.
+- Sem `ids`, drena todo o atraso em lotes de OUTBOX_LOTE linhas; `ate_id`
+  limita o dreno às linhas anteriores (o atraso sobe antes da coleta nova).
+
+Linha de comando:
+    python outbox.py status
+    python outbox.py replay            # envia pendentes
+    python outbox.py limpar --dias 30  # apaga enviados/substituídos antigos
+
+Arquivo em `outbox/outbox.sqlite3` (OUTBOX_PATH sobrescreve); OUTBOX=false desliga.
+"""
+
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import sys
+import time
+from contextlib import closing
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from supabase_rest import LOTE_MAX_LINHAS, TABLE, Linhas, unificar
+
+OUTBOX_PATH = Path(os.getenv("OUTBOX_PATH") or Path(__file__).with_name("outbox") / "outbox.sqlite3")
+DOTENV_PATH = Path(__file__).with_name(".env")
+OUTBOX_LOTE = int(os.getenv("OUTBOX_LOTE", str(LOTE_MAX_LINHAS)))
+
+log = logging.getLogger("outbox")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    tabela      TEXT    NOT NULL,
+    linha       TEXT    NOT NULL,
+    chave       TEXT,
+    status      TEXT    NOT NULL DEFAULT 'pendente',
+    tentativas  INTEGER NOT NULL DEFAULT 0,
+    ultimo_erro TEXT,
+    criado_em   REAL    NOT NULL,
+    enviado_em  REAL
+);
+CREATE INDEX IF NOT EXISTS outbox_pendentes ON outbox (status, id);
+"""
+
+
+def outbox_ativo() -> bool:
+    return os.getenv("OUTBOX", "true").strip().lower() in ("1", "true", "yes", "y", "on")
+
+
+class Outbox:
+    def __init__(self, path: Path = OUTBOX_PATH):
+        self.path = Path(path)
+        self._pronto = False
+
+    def _conectar(self) -> sqlite3.Connection:
+        # uma conexão por operação: o EscritorSupabase chama de outra thread
+        if not self._pronto:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        con = sqlite3.connect(str(self.path), timeout=30)
+        if not self._pronto:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.executescript(SCHEMA)
+            self._migrar(con)
+            self._pronto = True
+        return con
+
+    @staticmethod
+    def _migrar(con: sqlite3.Connection) -> None:
+        """Outbox de antes da coluna `chave`: acrescenta e preenche a partir da linha."""
+        if "chave" not in {c[1] for c in con.execute("PRAGMA table_info(outbox)")}:
+            with con:
+                con.execute("ALTER TABLE outbox ADD COLUMN chave TEXT")
+                con.executemany("UPDATE outbox SET chave=? WHERE id=?",
+                                [(_chave(json.loads(l)), i) for i, l in con.execute("SELECT id, linha FROM outbox")])
+        con.execute("CREATE INDEX IF NOT EXISTS outbox_chave ON outbox (tabela, chave, status)")
+
+    # ------------ Escrita ------------
+    def gravar(self, linhas: Linhas, tabela: str = TABLE) -> List[int]:
+        """Grava as linhas (normalizadas) como pendentes; devolve os ids."""
+        agora = time.time()
+        ids = []
+        with closing(self._conectar()) as con, con:
+            for n in unificar(linhas):
+                chave = _chave(n)
+                antigas = con.execute("SELECT id, linha FROM outbox WHERE tabela=? AND chave=? AND status='pendente' "
+                                      "ORDER BY id", (tabela, chave)).fetchall()
+                for _, l in antigas:
+                    n = {**json.loads(l), **n}
+                con.executemany("UPDATE outbox SET status='substituido' WHERE id=?", [(i,) for i, _ in antigas])
+                cur = con.execute("INSERT INTO outbox (tabela, linha, chave, criado_em) VALUES (?, ?, ?, ?)",
+                                  (tabela, json.dumps(n, ensure_ascii=False), chave, agora))
+                ids.append(cur.lastrowid)
+        return ids
+
+    def concluir(self, ids: Iterable[int]) -> None:
+        with closing(self._conectar()) as con, con:
+            con.executemany("UPDATE outbox SET status='enviado', enviado_em=?, tentativas=tentativas+1 WHERE id=?",
+                            [(time.time(), i) for i in ids])
+
+    def obsoletas(self, ids: List[int]) -> List[int]:
+        """Das `ids`, as que já têm linha mais nova da mesma chave enviada — e as marca "substituido"."""
+        if not ids:
+            return []
+        with closing(self._conectar()) as con, con:
+            velhas = [i for (i,) in con.execute(
+                f"SELECT o.id FROM outbox o WHERE o.id IN ({','.join('?' * len(ids))}) AND EXISTS ("
+                "SELECT 1 FROM outbox e WHERE e.tabela=o.tabela AND e.chave=o.chave "
+                "AND e.status='enviado' AND e.id>o.id)", ids)]
+            con.executemany("UPDATE outbox SET status='substituido' WHERE id=?", [(i,) for i in velhas])
+        return velhas
+
+    def falhou(self, ids: Iterable[int], erro: str) -> None:
+        with closing(self._conectar()) as con, con:
+            con.executemany("UPDATE outbox SET tentativas=tentativas+1, ultimo_erro=? WHERE id=?",
+                            [(erro[:500], i) for i in ids])
+
+    # ------------ Leitura ------------
+    def pendentes(self, ids: Optional[List[int]] = None, limite: Optional[int] = None,
+                  ate_id: Optional[int] = None) -> List[Tuple[int, str, Dict[str, Any]]]:
+        """[(id, tabela, linha)] pendentes em ordem de gravação."""
+        sql = "SELECT id, tabela, linha FROM outbox WHERE status='pendente'"
+        args: List[Any] = []
+        if ate_id is not None:
+            sql += " AND id<=?"
+            args.append(ate_id)
+        if ids is not None:
+            sql += f" AND id IN ({','.join('?' * len(ids))})"
+            args.extend(ids)
+        sql += " ORDER BY id"
+        if limite:
+            sql += " LIMIT ?"
+            args.append(limite)
+        with closing(self._conectar()) as con:
+            return [(i, t, json.loads(l)) for i, t, l in con.execute(sql, args)]
+
+    def contagem(self) -> Dict[str, int]:
+        with closing(self._conectar()) as con:
+            return dict(con.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall())
+
+    def limpar(self, dias: float) -> int:
+        """Apaga linhas já enviadas (ou substituídas) há mais de `dias` dias."""
+        with closing(self._conectar()) as con, con:
+            cur = con.execute("DELETE FROM outbox WHERE status IN ('enviado','substituido') "
+                              "AND COALESCE(enviado_em, criado_em) < ?",
+                              (time.time() - dias * 86400,))
+            return cur.rowcount
+
+    # ------------ Envio ------------
+    def enviar(self, cliente, ids: Optional[List[int]] = None, return_representation: bool = False,
+               forcar: Optional[bool] = None, lote: int = OUTBOX_LOTE, ate_id: Optional[int] = None) -> Tuple[int, str]:
+        """
+        Sobe as pendentes (só `ids`, ou todas) em lotes; para no primeiro erro
+        para não martelar um banco fora do ar. Retorna o (status, corpo) do
+        último lote, como ClienteSupabase.upsert.
+        """
+        if ids is not None and not ids:
+            return 200, "[]" if return_representation else ""
+        status, corpo = 200, "[]" if return_representation else ""
+        ultimo_id = 0
+        while True:
+            linhas = [p for p in self.pendentes(ids=ids, limite=None if ids is not None else lote, ate_id=ate_id)
+                      if p[0] > ultimo_id]
+            if not linhas:
+                break
+            velhas = set(self.obsoletas([i for i, _, _ in linhas[:lote]]))
+            if velhas:
+                log.info("Outbox: %d linha(s) mais velha(s) que uma já enviada; descartada(s)", len(velhas))
+            por_tabela: Dict[str, List[Tuple[int, Dict[str, Any]]]] = {}
+            for i, t, n in linhas[:lote]:
+                if i not in velhas:
+                    por_tabela.setdefault(t, []).append((i, n))
+            for tabela, itens in por_tabela.items():
+                lote_ids = [i for i, _ in itens]
+                status, corpo = cliente.upsert([n for _, n in itens], return_representation=return_representation,
+                                               table=tabela, forcar=forcar)
+                if not 200 <= status < 300:
+                    self.falhou(lote_ids, f"{status} {corpo}")
+                    log.warning("Outbox: %d linha(s) continuam pendentes (%s)", len(lote_ids), status)
+                    return status, corpo
+                self.concluir(lote_ids)
+            ultimo_id = linhas[:lote][-1][0]
+        return status, corpo
+
+
+def _chave(linha: Dict[str, Any]) -> str:
+    """(data_coleta, empresa) — a chave do on_conflict no Supabase."""
+    return json.dumps([linha.get("data_coleta"), linha.get("empresa")], ensure_ascii=False)
+
+
+OUTBOX = Outbox()
+
+
+# ------------ CLI ------------
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Fila local de envios ao Supabase.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("status", help="contagem por status")
+    sub.add_parser("replay", help="envia as linhas pendentes em lote")
+    lp = sub.add_parser("limpar", help="apaga linhas já enviadas")
+    lp.add_argument("--dias", type=float, default=30)
+    args = ap.parse_args(argv)
+
+    if args.cmd == "status":
+        print(json.dumps(OUTBOX.contagem(), ensure_ascii=False))
+        return 0
+    if args.cmd == "limpar":
+        print(f"🧹 {OUTBOX.limpar(args.dias)} linha(s) removida(s)")
+        return 0
+
+    import supabase_rest
+    antes = OUTBOX.contagem().get("pendente", 0)
+    status, corpo = OUTBOX.enviar(supabase_rest.cliente_do_ambiente(str(DOTENV_PATH)))
+    depois = OUTBOX.contagem().get("pendente", 0)
+    print(f"📤 Replay: {antes - depois} enviada(s), {depois} pendente(s) | status {status}")
+    return 0 if depois == 0 else 1
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(message)s")
+    sys.exit(main())
@@ -0,0 +1,212 @@
+"""
+prontidao.py
+------------
+Espera por sinais explícitos de que a vitrine está pronta, no lugar de
+`wait_for_timeout` fixos e `networkidle`.
+
+Sinais (o primeiro que chegar vence):
+- "api":   a resposta JSON de preços foi capturada (captura_api.CapturaVitrine);
+- "cards": cards de produto presentes, sem skeleton de loading e com a
+           contagem estável por QUADROS_ESTAVEIS animation frames;
+- "login": caiu na tela de login (sessão expirada) — não adianta esperar.
+
+`registros_cards` lê só os cards de produto (layout de extracao.LAYOUTS) num
+`evaluate` e devolve registros tipados; `colher_cards` rola um container virtualizado e junta o texto dos cards
+dentro da página (MutationObserver), devolvendo tudo num único `evaluate`.
+
+`Fases` mede o tempo de cada etapa para sabermos onde vai a latência (e
+repassa cada uma como span "fase.<nome>" para metricas.py).
+"""
+
+import asyncio
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+from extracao import JS_CAMPOS_CARDS, layout, registros_de_cards
+from metricas import METRICAS
+
+SELETOR_CARDS = os.getenv("SELETOR_CARDS", 'div.corpo-item[id^="item-"]')
+SELETOR_CARREGANDO = os.getenv("SELETOR_CARREGANDO", ".loading-background, .loading-vibra")
+SELETOR_CARD_PRODUTO = os.getenv("SELETOR_CARD_PRODUTO", ".card-produto")
+SELETOR_CONTAINER = os.getenv("SELETOR_CONTAINER", ".scrollbar-container")
+QUADROS_ESTAVEIS = 2
+FATIA_MS = 250  # granularidade da checagem da API na versão sync
+
+# Avaliada a cada requestAnimationFrame via wait_for_function(polling="raf").
+JS_VITRINE_PRONTA = """
+([seletor, carregando, quadros]) => {
+    if (document.querySelector('input[type="password"]')) return "login";
+    const n = document.querySelectorAll(seletor).length;
+    const st = window.__prontidao || (window.__prontidao = {n: -1, iguais: 0});
+    if (n > 0 && n === st.n && !document.querySelector(carregando)) st.iguais += 1;
+    else { st.n = n; st.iguais = 0; }
+    return st.iguais >= quadros ? "cards" : false;
+}
+"""
+
+# Rola a janela até o fim, esperando 2 frames por passo, até a contagem parar de crescer.
+JS_ROLAR_ATE_O_FIM = """
+async ([seletor, maxPassos]) => {
+    const frame = () => new Promise(r => requestAnimationFrame(() => requestAnimationFrame(r)));
+    let anterior = -1;
+    for (let i = 0; i < maxPassos; i++) {
+        window.scrollBy(0, window.innerHeight);
+        await frame();
+        const n = document.querySelectorAll(seletor).length;
+        const fim = window.innerHeight + window.scrollY >= document.body.scrollHeight - 2;
+        if (fim && n === anterior) return n;
+        anterior = n;
+    }
+    return anterior;
+}
+"""
+
+# Lista virtualizada: rola o container uma altura por passo e, a cada passo,
+# espera as mutações assentarem (ou `silencioMs` sem nenhuma) antes de colher
+# o innerText dos cards renderizados. Para quando não aparece card novo e o
+# container não desce mais. Cards que saem do DOM já ficaram no Map.
+JS_COLHER_CARDS = """
+async ([seletorCard, seletorContainer, maxPassos, silencioMs]) => {
+    const vistos = new Map();
+    const colher = () => {
+        for (const el of document.querySelectorAll(seletorCard)) {
+            const t = el.innerText.trim();
+            if (t && !vistos.has(t)) vistos.set(t, vistos.size);
+        }
+    };
+    const container = document.querySelector(seletorContainer);
+    const alvo = container || document.scrollingElement || document.body;
+    let acordar = null;
+    const obs = new MutationObserver(() => { if (acordar) acordar(); });
+    obs.observe(container || document.body, {childList: true, subtree: true, characterData: true});
+    const assentar = () => new Promise(resolve => {
+        const fim = () => { acordar = null; clearTimeout(teto); resolve(); };
+        let timer = setTimeout(fim, silencioMs);
+        const teto = setTimeout(fim, silencioMs * 4);
+        acordar = () => { clearTimeout(timer); timer = setTimeout(fim, 100); };
+    });
+    try {
+        colher();
+        for (let i = 0; i < maxPassos; i++) {
+            const antes = vistos.size, topo = alvo.scrollTop;
+            alvo.scrollBy(0, Math.max(alvo.clientHeight, 200));
+            await assentar();
+            colher();
+            const parado = alvo.scrollTop === topo
+                || alvo.scrollTop + alvo.clientHeight >= alvo.scrollHeight - 2;
+            if (vistos.size === antes && parado) break;
+        }
+    } finally {
+        obs.disconnect();
+    }
+    return [...vistos.keys()];
+}
+"""
+
+
+class Fases:
+    """Cronômetro por fase: `with fases.fase("login"): ...`; `conta` vira rótulo nas métricas."""
+
+    def __init__(self, conta: Optional[str] = None):
+        self.conta = conta
+        self.duracoes: Dict[str, float] = {}
+
+    @contextmanager
+    def fase(self, nome: str):
+        t0 = time.perf_counter()
+        ok = True
+        try:
+            yield
+        except BaseException:
+            ok = False
+            raise
+        finally:
+            dur = time.perf_counter() - t0
+            self.duracoes[nome] = self.duracoes.get(nome, 0.0) + dur
+            METRICAS.registrar(f"fase.{nome}", dur, ok, conta=self.conta)
+
+    def como_dict(self) -> Dict[str, float]:
+        return {k: round(v, 3) for k, v in self.duracoes.items()}
+
+    def resumo(self) -> str:
+        return " | ".join(f"{k}={v * 1000:.0f}ms" for k, v in self.duracoes.items())
+
+
+# ------------ sync ------------
+def esperar_vitrine(page, captura=None, timeout_ms: int = 45000) -> Optional[str]:
+    """Bloqueia até um sinal ("api", "cards", "login"); None se estourar o tempo."""
+    limite = time.monotonic() + timeout_ms / 1000
+    while True:
+        if captura is not None:
+            captura.processar()
+            if captura.precos:
+                return "api"
+        restante = int((limite - time.monotonic()) * 1000)
+        if restante <= 0:
+            return None
+        # sem captura não há o que intercalar: espera direto pelos cards
+        fatia = min(restante, FATIA_MS) if captura is not None else restante
+        try:
+            h = page.wait_for_function(JS_VITRINE_PRONTA, arg=[SELETOR_CARDS, SELETOR_CARREGANDO, QUADROS_ESTAVEIS],
+                                       polling="raf", timeout=fatia)
+            return h.json_value()
+        except Exception:
+            continue
+
+def rolar_ate_o_fim(page, max_passos: int = 40) -> int:
+    return page.evaluate(JS_ROLAR_ATE_O_FIM, [SELETOR_CARDS, max_passos])
+
+def colher_cards(page, seletor: str = SELETOR_CARD_PRODUTO, container: str = SELETOR_CONTAINER,
+                 max_passos: int = 40, silencio_ms: int = 800) -> List[str]:
+    """Texto de cada card (sem repetição, na ordem em que apareceram)."""
+    return page.evaluate(JS_COLHER_CARDS, [seletor, container, max_passos, silencio_ms])
+
+def registros_cards(page, nome_layout: str = "vibra") -> List[Dict[str, Any]]:
+    """[{nome, codigo, base, preco, validade, campo}] dos cards renderizados."""
+    return registros_de_cards(page.evaluate(JS_CAMPOS_CARDS, layout(nome_layout)))
+
+
+# ------------ async ------------
+async def esperar_vitrine_async(page, captura=None, timeout_ms: int = 45000) -> Optional[str]:
+    async def _cards():
+        h = await page.wait_for_function(JS_VITRINE_PRONTA, arg=[SELETOR_CARDS, SELETOR_CARREGANDO, QUADROS_ESTAVEIS],
+                                         polling="raf", timeout=timeout_ms)
+        return await h.json_value()
+
+    async def _api():
+        return "api" if await captura.aguardar_async(page, timeout_ms) else None
+
+    limite = time.monotonic() + timeout_ms / 1000
+    tarefas = [asyncio.ensure_future(_cards())]
+    if captura is not None:
+        tarefas.append(asyncio.ensure_future(_api()))
+    try:
+        pendentes = set(tarefas)
+        while pendentes:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                return None
+            feitas, pendentes = await asyncio.wait(pendentes, timeout=restante,
+                                                   return_when=asyncio.FIRST_COMPLETED)
+            if not feitas:
+                return None
+            for t in feitas:
+                if not t.exception() and t.result():
+                    return t.result()
+        return None
+    finally:
+        for t in tarefas:
+            t.cancel()
+        await asyncio.gather(*tarefas, return_exceptions=True)
+
+async def rolar_ate_o_fim_async(page, max_passos: int = 40) -> int:
+    return await page.evaluate(JS_ROLAR_ATE_O_FIM, [SELETOR_CARDS, max_passos])
+
+async def colher_cards_async(page, seletor: str = SELETOR_CARD_PRODUTO, container: str = SELETOR_CONTAINER,
+                             max_passos: int = 40, silencio_ms: int = 800) -> List[str]:
+    return await page.evaluate(JS_COLHER_CARDS, [seletor, container, max_passos, silencio_ms])
+
+async def registros_cards_async(page, nome_layout: str = "vibra") -> List[Dict[str, Any]]:
+    return registros_de_cards(await page.evaluate(JS_CAMPOS_CARDS, layout(nome_layout)))
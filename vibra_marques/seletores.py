@@ -0,0 +1,139 @@
+"""
+seletores.py
+------------
+Memória dos seletores de login que funcionaram, por portal (host da URL).
+
+⚡ Funcionamento:
+- Guarda o par (usuário, senha), o frame e o botão de envio do último login
+  que deu certo em `cache/seletores.json`.
+- `ordem_login` / `ordem_submit` / `ordem_frames` devolvem os candidatos com
+  o vencedor na frente: com o portal igual, o login custa um `fill` em vez de
+  uma fila de timeouts de 2,5s.
+- `promover` grava um novo vencedor quando a página muda; `esquecer` descarta
+  o do portal quando os seletores falham (nenhum campo ou botão serviu) e a
+  próxima tentativa percorre a lista completa. Login que não sai da tela com
+  os seletores funcionando (senha errada de uma conta) não mexe no cache, que
+  é por host e compartilhado entre as contas.
+
+SELETORES_CACHE=false desliga (volta à ordem fixa).
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple, TypeVar
+from urllib.parse import urlparse
+
+SELETORES_PATH = Path(os.getenv("SELETORES_PATH") or Path(__file__).with_name("cache") / "seletores.json")
+FRAME_PRINCIPAL = "main"
+ENTER = "enter"  # submit por Enter no campo de senha
+
+log = logging.getLogger("seletores")
+
+T = TypeVar("T")
+
+
+def seletores_ativos() -> bool:
+    return os.getenv("SELETORES_CACHE", "true").strip().lower() in ("1", "true", "yes", "y", "on")
+
+
+def portal(url: str) -> str:
+    return urlparse(url).netloc or url
+
+
+def id_frame(frame, principal) -> str:
+    """Identificador estável do frame: "main", o name, ou a URL sem query."""
+    if frame == principal:
+        return FRAME_PRINCIPAL
+    return frame.name or frame.url.split("?", 1)[0]
+
+
+def _na_frente(candidatos: Sequence[T], vencedor: Optional[T]) -> List[T]:
+    lista = list(candidatos)
+    if vencedor is not None and vencedor in lista:
+        lista.remove(vencedor)
+        lista.insert(0, vencedor)
+    return lista
+
+
+class CacheSeletores:
+    def __init__(self, path: Path = SELETORES_PATH):
+        self.path = Path(path)
+        self._portais: Optional[Dict[str, Dict[str, Any]]] = None
+        self._lock = threading.Lock()
+
+    def _carregar(self) -> Dict[str, Dict[str, Any]]:
+        if self._portais is None:
+            self._portais = {}
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    self._portais = json.load(f)
+            except FileNotFoundError:
+                pass
+            except (OSError, ValueError) as e:
+                log.warning("Cache de seletores ilegível (%s); começando vazio", e)
+        return self._portais
+
+    def vencedor(self, url: str) -> Dict[str, Any]:
+        if not seletores_ativos():
+            return {}
+        with self._lock:
+            return dict(self._carregar().get(portal(url), {}))
+
+    # ------------ Ordem de tentativa ------------
+    def ordem_login(self, url: str, candidatos: Sequence[Tuple[str, str]]) -> List[Tuple[str, str]]:
+        login = self.vencedor(url).get("login")
+        return _na_frente(candidatos, tuple(login) if login else None)
+
+    def ordem_submit(self, url: str, candidatos: Sequence[str]) -> List[str]:
+        return _na_frente(candidatos, self.vencedor(url).get("submit"))
+
+    def ordem_frames(self, url: str, frames: Sequence[Any], principal) -> List[Any]:
+        """Frames com o do último login na frente (o principal vem antes se for ele)."""
+        preferido = self.vencedor(url).get("frame")
+        ids = [id_frame(f, principal) for f in frames]
+        if preferido in ids:
+            i = ids.index(preferido)
+            return [frames[i]] + [f for j, f in enumerate(frames) if j != i]
+        return list(frames)
+
+    # ------------ Atualização ------------
+    def _gravar(self) -> None:
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._portais, f, ensure_ascii=False, indent=2)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            log.warning("Falha ao gravar cache de seletores: %s", e)
+
+    def promover(self, url: str, **vencedores) -> None:
+        """Registra login=(usuário, senha), frame=... e/ou submit=... que funcionaram."""
+        if not seletores_ativos():
+            return
+        with self._lock:
+            portais = self._carregar()
+            atual = portais.setdefault(portal(url), {})
+            novos = {k: list(v) if isinstance(v, tuple) else v for k, v in vencedores.items() if v is not None}
+            if all(atual.get(k) == v for k, v in novos.items()):
+                return
+            log.info("Seletores de %s: novo vencedor %s", portal(url), novos)
+            atual.update(novos)
+            atual["atualizado_em"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+            self._gravar()
+
+    def esquecer(self, url: str) -> None:
+        """Seletores do portal falharam: a próxima tentativa percorre a lista toda."""
+        if not seletores_ativos():
+            return
+        with self._lock:
+            if self._carregar().pop(portal(url), None) is not None:
+                log.info("Seletores de %s falharam; vencedor descartado", portal(url))
+                self._gravar()
+
+
+SELETORES = CacheSeletores()
@@ -0,0 +1,80 @@
+"""
+sessoes.py
+----------
+Sessões de login persistidas via `storage_state` do Playwright.
+
+⚡ Funcionalidades:
+- Um arquivo por conta em `sessoes/<CONTA>.json` (cookies + localStorage).
+- Sessões mais velhas que SESSAO_MAX_IDADE_H são ignoradas (login completo).
+- Conta hits/misses e loga a idade da sessão usada.
+- Guarda em `sessoes/<CONTA>_api.json` as chamadas da vitrine que trouxeram
+  preços, para o modo HTTP (`coletor_http.py`) reaproveitar.
+
+Os arquivos contêm cookies de autenticação: nunca versionar `sessoes/`.
+"""
+
+import json
+import logging
+import os
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+SESSOES_DIR = Path(__file__).with_name("sessoes")
+SESSAO_MAX_IDADE_H = float(os.getenv("SESSAO_MAX_IDADE_H", "12"))
+
+log = logging.getLogger("sessoes")
+ESTATISTICAS: Counter = Counter()
+
+
+def caminho_sessao(conta: str) -> Path:
+    SESSOES_DIR.mkdir(exist_ok=True)
+    return SESSOES_DIR / f"{conta}.json"
+
+
+def idade_sessao(conta: str) -> Optional[float]:
+    """Idade em segundos do estado salvo, ou None se não existe."""
+    p = SESSOES_DIR / f"{conta}.json"
+    if not p.exists():
+        return None
+    return time.time() - p.stat().st_mtime
+
+
+def estado_salvo(conta: str) -> Optional[str]:
+    """Caminho do storage_state utilizável para `new_context(storage_state=...)`."""
+    idade = idade_sessao(conta)
+    if idade is None:
+        log.info("Sessão %s: nenhuma salva", conta)
+        return None
+    if idade > SESSAO_MAX_IDADE_H * 3600:
+        log.info("Sessão %s: expirada por idade (%.1fh)", conta, idade / 3600)
+        return None
+    return str(SESSOES_DIR / f"{conta}.json")
+
+
+def registrar(conta: str, hit: bool) -> None:
+    ESTATISTICAS["hit" if hit else "miss"] += 1
+    idade = idade_sessao(conta)
+    log.info(
+        "Sessão %s: %s (idade %s) | hits=%d misses=%d",
+        conta, "HIT" if hit else "MISS",
+        f"{idade / 3600:.1f}h" if idade is not None else "-",
+        ESTATISTICAS["hit"], ESTATISTICAS["miss"],
+    )
+
+
+def salvar_api(conta: str, chamadas: List[Dict[str, Any]]) -> None:
+    if not chamadas:
+        return
+    SESSOES_DIR.mkdir(parents=True, exist_ok=True)
+    with open(SESSOES_DIR / f"{conta}_api.json", "w", encoding="utf-8") as f:
+        json.dump(chamadas, f, ensure_ascii=False, indent=2)
+
+
+def carregar_api(conta: str) -> List[Dict[str, Any]]:
+    p = SESSOES_DIR / f"{conta}_api.json"
+    if not p.exists():
+        return []
+    with open(p, encoding="utf-8") as f:
+        return json.load(f)
@@ -0,0 +1,351 @@
+"""
+snapshots.py
+------------
+Arquivo de páginas capturadas (HTML, texto do DOM, PNG), endereçado por
+conteúdo: a mesma página em N execuções ocupa UMA cópia comprimida.
+
+⚡ Layout:
+    snapshots/
+      indice.sqlite3            snapshots (quando, portal, passo, tipo, hash) + blobs (hash, codec, tamanhos)
+      objetos/ab/abcd....gz     um blob por sha256 do conteúdo (gzip; .zst com zstandard instalado)
+
+- `guardar(conteudo, portal, passo, tipo)`: calcula o sha256; se o blob já
+  existe só grava a linha no índice (nada de recomprimir).
+- `ler(hash)` descomprime só aquele blob; `buscar(portal, passo, tipo, de, ate)`
+  consulta o índice (indexado por portal/passo/quando) sem tocar nos blobs.
+- `guardar_pagina(page, passo)` / `guardar_pagina_async`: o que os coletores
+  chamam depois da vitrine pronta.
+- PNG vai sem recompressão (.raw): já é comprimido.
+
+bench_parsers.py aceita `snap:<ref>` como fixture, em que ref é um prefixo
+de hash ou `portal/passo` (ex.: `snap:cn.vibraenergia.com.br/vitrine`).
+
+Linha de comando:
+    python snapshots.py importar vitrine_vibra.html html_vitrine_teste.html "evidencias/*"
+    python snapshots.py listar --passo vitrine
+    python snapshots.py exportar <hash> -o pagina.html
+    python snapshots.py resumo
+    python snapshots.py limpar --dias 90
+
+SNAPSHOTS=false desliga a gravação nos coletores; SNAPSHOTS_DIR muda a pasta;
+SNAPSHOTS_ZSTD=false força gzip mesmo com zstandard disponível.
+"""
+
+import argparse
+import glob
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import sys
+import time
+from contextlib import closing
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+from seletores import portal as portal_da_url
+
+BASE_DIR = Path(__file__).resolve().parent
+SNAPSHOTS_DIR = Path(os.getenv("SNAPSHOTS_DIR") or BASE_DIR / "snapshots")
+PORTAL_PADRAO = "cn.vibraenergia.com.br"
+TIPOS_TEXTO = ("html", "texto")
+EXTENSOES = {".html": "html", ".htm": "html", ".txt": "texto", ".png": "png"}
+
+log = logging.getLogger("snapshots")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    hash        TEXT    PRIMARY KEY,
+    codec       TEXT    NOT NULL,
+    tamanho     INTEGER NOT NULL,
+    comprimido  INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS snapshots (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    quando      REAL    NOT NULL,
+    portal      TEXT    NOT NULL,
+    passo       TEXT    NOT NULL,
+    tipo        TEXT    NOT NULL,
+    hash        TEXT    NOT NULL REFERENCES blobs (hash),
+    origem      TEXT
+);
+CREATE INDEX IF NOT EXISTS snapshots_busca ON snapshots (portal, passo, quando);
+CREATE INDEX IF NOT EXISTS snapshots_hash ON snapshots (hash);
+"""
+
+
+def snapshots_ativos() -> bool:
+    return os.getenv("SNAPSHOTS", "true").strip().lower() in ("1", "true", "yes", "y", "on")
+
+
+# ------------ Codecs ------------
+def _zstd():
+    """zstandard é opcional: sem ele (ou com SNAPSHOTS_ZSTD=false) fica gzip."""
+    if os.getenv("SNAPSHOTS_ZSTD", "true").strip().lower() not in ("1", "true", "yes", "y", "on"):
+        return None
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+
+def _comprimir(dados: bytes, tipo: str):
+    if tipo not in TIPOS_TEXTO:
+        return "raw", dados
+    zstd = _zstd()
+    if zstd is not None:
+        return "zst", zstd.ZstdCompressor(level=10).compress(dados)
+    return "gz", gzip.compress(dados, compresslevel=6, mtime=0)
+
+
+def _descomprimir(codec: str, dados: bytes) -> bytes:
+    if codec == "gz":
+        return gzip.decompress(dados)
+    if codec == "zst":
+        zstd = _zstd() or __import__("zstandard")  # blob .zst exige o pacote mesmo com SNAPSHOTS_ZSTD=false
+        return zstd.ZstdDecompressor().decompress(dados)
+    return dados
+
+
+def _epoch(quando: Any) -> float:
+    if quando is None:
+        return time.time()
+    if isinstance(quando, datetime):
+        return quando.timestamp()
+    if isinstance(quando, (int, float)):
+        return float(quando)
+    return datetime.fromisoformat(str(quando)).timestamp()
+
+
+class ArquivoSnapshots:
+    def __init__(self, diretorio: Path = SNAPSHOTS_DIR):
+        self.diretorio = Path(diretorio)
+        self.path = self.diretorio / "indice.sqlite3"
+        self._pronto = False
+
+    def _conectar(self) -> sqlite3.Connection:
+        if not self._pronto:
+            self.diretorio.mkdir(parents=True, exist_ok=True)
+        con = sqlite3.connect(str(self.path), timeout=30)
+        if not self._pronto:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.executescript(SCHEMA)
+            self._pronto = True
+        return con
+
+    def _blob(self, hash_: str, codec: str) -> Path:
+        return self.diretorio / "objetos" / hash_[:2] / f"{hash_}.{codec}"
+
+    # ------------ Escrita ------------
+    def guardar(self, conteudo: Union[str, bytes], portal: str, passo: str, tipo: str = "html",
+                quando: Any = None, origem: Optional[str] = None) -> str:
+        """Arquiva o conteúdo; devolve o sha256 (repetido = só uma linha nova no índice)."""
+        dados = conteudo.encode("utf-8") if isinstance(conteudo, str) else bytes(conteudo)
+        hash_ = hashlib.sha256(dados).hexdigest()
+        with closing(self._conectar()) as con, con:
+            existe = con.execute("SELECT 1 FROM blobs WHERE hash=?", (hash_,)).fetchone()
+            if not existe:
+                codec, comprimido = _comprimir(dados, tipo)
+                destino = self._blob(hash_, codec)
+                destino.parent.mkdir(parents=True, exist_ok=True)
+                tmp = destino.with_name(f"{destino.name}.{os.getpid()}.tmp")
+                with open(tmp, "wb") as f:
+                    f.write(comprimido)
+                os.replace(tmp, destino)
+                con.execute("INSERT OR IGNORE INTO blobs (hash, codec, tamanho, comprimido) VALUES (?, ?, ?, ?)",
+                            (hash_, codec, len(dados), len(comprimido)))
+            con.execute("INSERT INTO snapshots (quando, portal, passo, tipo, hash, origem) VALUES (?, ?, ?, ?, ?, ?)",
+                        (_epoch(quando), portal, passo, tipo, hash_, origem))
+        return hash_
+
+    # ------------ Leitura ------------
+    def ler(self, hash_: str) -> Union[str, bytes]:
+        """Conteúdo de um blob (str para html/texto, bytes para png)."""
+        with closing(self._conectar()) as con:
+            linha = con.execute("SELECT b.codec, (SELECT tipo FROM snapshots WHERE hash=b.hash LIMIT 1) "
+                                "FROM blobs b WHERE b.hash=?", (hash_,)).fetchone()
+        if linha is None:
+            raise KeyError(f"Snapshot inexistente: {hash_}")
+        codec, tipo = linha
+        with open(self._blob(hash_, codec), "rb") as f:
+            dados = _descomprimir(codec, f.read())
+        return dados.decode("utf-8") if tipo in TIPOS_TEXTO else dados
+
+    def buscar(self, portal: Optional[str] = None, passo: Optional[str] = None, tipo: Optional[str] = None,
+               de: Any = None, ate: Any = None, hash_prefixo: Optional[str] = None,
+               unicos: bool = False) -> List[Dict[str, Any]]:
+        """Linhas do índice (mais antiga primeiro); `unicos` deixa só a primeira de cada hash."""
+        sql = ("SELECT s.id, s.quando, s.portal, s.passo, s.tipo, s.hash, s.origem, b.tamanho, b.comprimido "
+               "FROM snapshots s JOIN blobs b ON b.hash = s.hash WHERE 1=1")
+        args: List[Any] = []
+        for coluna, valor in (("portal", portal), ("passo", passo), ("tipo", tipo)):
+            if valor:
+                sql += f" AND s.{coluna} = ?"
+                args.append(valor)
+        if de:
+            sql += " AND s.quando >= ?"
+            args.append(_epoch(de))
+        if ate:
+            sql += " AND s.quando <= ?"
+            args.append(_epoch(ate))
+        if hash_prefixo:
+            sql += " AND s.hash LIKE ?"
+            args.append(hash_prefixo.lower() + "%")
+        sql += " ORDER BY s.quando, s.id"
+        campos = ("id", "quando", "portal", "passo", "tipo", "hash", "origem", "tamanho", "comprimido")
+        with closing(self._conectar()) as con:
+            linhas = [dict(zip(campos, l)) for l in con.execute(sql, args)]
+        if unicos:
+            vistos = set()
+            linhas = [l for l in linhas if not (l["hash"] in vistos or vistos.add(l["hash"]))]
+        return linhas
+
+    def resolver(self, ref: str, tipo: str = "html") -> List[Dict[str, Any]]:
+        """`portal/passo` ou prefixo de hash -> snapshots distintos daquele tipo."""
+        if "/" in ref:
+            portal, passo = ref.split("/", 1)
+            return self.buscar(portal=portal, passo=passo, tipo=tipo, unicos=True)
+        return self.buscar(tipo=tipo, hash_prefixo=ref, unicos=True)
+
+    def resumo(self) -> Dict[str, Any]:
+        with closing(self._conectar()) as con:
+            n, = con.execute("SELECT COUNT(*) FROM snapshots").fetchone()
+            blobs, bruto, guardado = con.execute(
+                "SELECT COUNT(*), COALESCE(SUM(tamanho), 0), COALESCE(SUM(comprimido), 0) FROM blobs").fetchone()
+            logico, = con.execute("SELECT COALESCE(SUM(b.tamanho), 0) FROM snapshots s JOIN blobs b ON b.hash = s.hash").fetchone()
+            por_passo = con.execute("SELECT portal, passo, tipo, COUNT(*), COUNT(DISTINCT hash) FROM snapshots "
+                                    "GROUP BY portal, passo, tipo ORDER BY portal, passo, tipo").fetchall()
+        return {
+            "snapshots": n, "blobs": blobs,
+            "bytes_logicos": logico, "bytes_unicos": bruto, "bytes_em_disco": guardado,
+            "por_passo": [{"portal": p, "passo": s, "tipo": t, "snapshots": c, "distintos": d}
+                          for p, s, t, c, d in por_passo],
+        }
+
+    def limpar(self, dias: float) -> int:
+        """Apaga do índice os snapshots com mais de `dias` dias e os blobs que ficaram órfãos."""
+        with closing(self._conectar()) as con, con:
+            removidos = con.execute("DELETE FROM snapshots WHERE quando < ?", (time.time() - dias * 86400,)).rowcount
+            orfaos = con.execute("SELECT hash, codec FROM blobs WHERE hash NOT IN (SELECT hash FROM snapshots)").fetchall()
+            con.executemany("DELETE FROM blobs WHERE hash=?", [(h,) for h, _ in orfaos])
+        for hash_, codec in orfaos:
+            try:
+                self._blob(hash_, codec).unlink()
+            except FileNotFoundError:
+                pass
+        return removidos
+
+    # ------------ Importação ------------
+    def importar(self, caminhos: Iterable[str], portal: str = PORTAL_PADRAO) -> int:
+        """Arquiva capturas soltas (.html/.txt/.png); passo e data saem do nome do arquivo."""
+        n = 0
+        for padrao in caminhos:
+            for arq in sorted(glob.glob(padrao if os.path.isabs(padrao) else str(BASE_DIR / padrao))):
+                p = Path(arq)
+                tipo = EXTENSOES.get(p.suffix.lower())
+                if tipo is None or not p.is_file():
+                    continue
+                m = re.search(r"_\d{2}_([A-Za-z_]+)$", p.stem)
+                passo = m.group(1) if m else ("vitrine" if "vitrine" in p.stem else p.stem)
+                d = re.search(r"\d{4}-\d{2}-\d{2}", p.stem)
+                quando = datetime.fromisoformat(d.group(0)) if d else p.stat().st_mtime
+                self.guardar(p.read_bytes(), portal, passo, tipo, quando=quando, origem=p.name)
+                n += 1
+        return n
+
+
+ARQUIVO = ArquivoSnapshots()
+
+
+# ------------ Coletores ------------
+def guardar_pagina(page, passo: str, texto: Optional[str] = None) -> Optional[str]:
+    """HTML (e o texto do DOM, se o coletor já o leu) da página atual; nunca levanta."""
+    if not snapshots_ativos():
+        return None
+    try:
+        portal = portal_da_url(page.url)
+        hash_ = ARQUIVO.guardar(page.content(), portal, passo)
+        if texto is not None:
+            ARQUIVO.guardar(texto, portal, passo, "texto")
+        return hash_
+    except Exception as e:
+        log.warning("Snapshot de %s não gravado: %s", passo, e)
+        return None
+
+
+async def guardar_pagina_async(page, passo: str, texto: Optional[str] = None) -> Optional[str]:
+    if not snapshots_ativos():
+        return None
+    try:
+        portal = portal_da_url(page.url)
+        hash_ = ARQUIVO.guardar(await page.content(), portal, passo)
+        if texto is not None:
+            ARQUIVO.guardar(texto, portal, passo, "texto")
+        return hash_
+    except Exception as e:
+        log.warning("Snapshot de %s não gravado: %s", passo, e)
+        return None
+
+
+# ------------ CLI ------------
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Arquivo de páginas capturadas (endereçado por conteúdo).")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    ip = sub.add_parser("importar", help="arquiva .html/.txt/.png soltos (aceita glob)")
+    ip.add_argument("caminhos", nargs="+")
+    ip.add_argument("--portal", default=PORTAL_PADRAO)
+    lp = sub.add_parser("listar", help="linhas do índice")
+    lp.add_argument("--portal")
+    lp.add_argument("--passo")
+    lp.add_argument("--tipo")
+    lp.add_argument("--de")
+    lp.add_argument("--ate")
+    xp = sub.add_parser("exportar", help="grava um snapshot (prefixo de hash) em arquivo")
+    xp.add_argument("hash")
+    xp.add_argument("-o", "--output")
+    sub.add_parser("resumo", help="contagens e economia de espaço")
+    cp = sub.add_parser("limpar", help="apaga snapshots antigos e blobs órfãos")
+    cp.add_argument("--dias", type=float, default=90)
+    args = ap.parse_args(argv)
+
+    if args.cmd == "importar":
+        print(f"🗃️ {ARQUIVO.importar(args.caminhos, args.portal)} arquivo(s) importado(s)")
+        print(json.dumps({k: v for k, v in ARQUIVO.resumo().items() if k != "por_passo"}, ensure_ascii=False))
+        return 0
+    if args.cmd == "listar":
+        for l in ARQUIVO.buscar(args.portal, args.passo, args.tipo, args.de, args.ate):
+            quando = datetime.fromtimestamp(l["quando"]).isoformat(timespec="seconds")
+            print(f"{quando}  {l['portal']:<24} {l['passo']:<12} {l['tipo']:<6} {l['hash'][:12]}  "
+                  f"{l['tamanho']:>8} -> {l['comprimido']:>7}  {l['origem'] or ''}")
+        return 0
+    if args.cmd == "exportar":
+        achados = ARQUIVO.buscar(hash_prefixo=args.hash, unicos=True)
+        if len(achados) != 1:
+            print(f"❌ {len(achados)} snapshot(s) com o prefixo {args.hash}")
+            return 1
+        conteudo = ARQUIVO.ler(achados[0]["hash"])
+        if not args.output:
+            if isinstance(conteudo, bytes):
+                sys.stdout.buffer.write(conteudo)
+            else:
+                sys.stdout.write(conteudo)
+            return 0
+        with open(args.output, "wb") as f:
+            f.write(conteudo.encode("utf-8") if isinstance(conteudo, str) else conteudo)
+        print(f"📁 {args.output}")
+        return 0
+    if args.cmd == "limpar":
+        print(f"🧹 {ARQUIVO.limpar(args.dias)} snapshot(s) removido(s)")
+        return 0
+    print(json.dumps(ARQUIVO.resumo(), ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(message)s")
+    sys.exit(main())
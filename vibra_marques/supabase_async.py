@@ -0,0 +1,107 @@
+"""
+supabase_async.py
+-----------------
+Escrita no Supabase para os coletores assíncronos, sem travar o event loop.
+
+⚡ Funcionamento:
+- Reaproveita o `ClienteSupabase` (Session com keep-alive, lotes, backoff)
+  rodando as chamadas num ThreadPoolExecutor via `run_in_executor`.
+- `await escritor.upsert(...)` / `await escritor.ultimos(...)`: chamadas diretas.
+- `escritor.enviar(linhas)`: enfileira e volta na hora. Enquanto um UPSERT
+  está em voo, as linhas que chegam se acumulam e seguem juntas no próximo
+  (commit em grupo): o envio de uma conta corre em paralelo com a coleta da
+  seguinte e a varredura continua custando poucos round trips.
+- `await escritor.fechar()`: espera a fila esvaziar (dá para fechar o
+  navegador antes).
+- Com o outbox ligado (padrão), `enviar` grava as linhas em
+  outbox/outbox.sqlite3 antes; falhas ficam para `python outbox.py replay`.
+
+Uso:
+    async with EscritorSupabase(cliente) as escritor:
+        escritor.enviar(payload)
+        ...
+    print(escritor.resultados)
+"""
+
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Dict, List, Optional, Tuple
+
+import supabase_rest
+from metricas import METRICAS
+from outbox import OUTBOX, Outbox, outbox_ativo
+from supabase_rest import ClienteSupabase, Linhas
+
+log = logging.getLogger("supabase_async")
+
+
+class EscritorSupabase:
+    def __init__(self, cliente: Optional[ClienteSupabase] = None, return_representation: bool = False,
+                 executor: Optional[ThreadPoolExecutor] = None, outbox: Optional[Outbox] = None):
+        self.cliente = cliente or supabase_rest.cliente_do_ambiente()
+        self.outbox = outbox if outbox is not None else (OUTBOX if outbox_ativo() else None)
+        self.return_representation = return_representation
+        # um worker: os lotes saem na ordem em que foram enfileirados
+        self._executor = executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix="supabase")
+        self._proprio_executor = executor is None
+        self._pendentes: List[Any] = []  # linhas, ou ids do outbox
+        self._tarefa: Optional[asyncio.Future] = None
+        self.resultados: List[Tuple[int, str]] = []
+
+    async def _rodar(self, fn, *args, **kw):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(fn, *args, **kw))
+
+    # ------------ Chamadas diretas ------------
+    async def upsert(self, linhas: Linhas, return_representation: Optional[bool] = None,
+                     forcar: Optional[bool] = None) -> Tuple[int, str]:
+        rr = self.return_representation if return_representation is None else return_representation
+        return await self._rodar(self.cliente.upsert, linhas, return_representation=rr, forcar=forcar)
+
+    async def ultimos(self, empresa: str, limit: int = 5) -> Tuple[int, str]:
+        return await self._rodar(self.cliente.ultimos, empresa, limit=limit)
+
+    # ------------ Fila com commit em grupo ------------
+    def enviar(self, linhas: Linhas) -> None:
+        """
+        Enfileira uma ou várias linhas; o envio acontece em segundo plano.
+        Com outbox, as linhas já ficam gravadas em disco antes de voltar.
+        """
+        if self.outbox is not None:
+            self._pendentes.extend(self.outbox.gravar(linhas))
+        else:
+            self._pendentes.extend([linhas] if isinstance(linhas, dict) else linhas)
+        if self._tarefa is None or self._tarefa.done():
+            self._tarefa = asyncio.ensure_future(self._drenar())
+
+    async def _drenar(self) -> None:
+        while self._pendentes:
+            lote, self._pendentes = self._pendentes, []
+            METRICAS.contar("supabase.envios_em_grupo")
+            try:
+                with METRICAS.span("supabase.envio_grupo"):
+                    if self.outbox is not None:
+                        res = await self._rodar(self.outbox.enviar, self.cliente, ids=lote,
+                                                return_representation=self.return_representation)
+                    else:
+                        res = await self.upsert(lote)
+            except Exception as e:
+                log.warning("Falha no envio de %d linha(s): %s", len(lote), e)
+                res = (0, f"Erro: {e}")
+            self.resultados.append(res)
+
+    async def fechar(self) -> List[Tuple[int, str]]:
+        """Espera tudo que foi enfileirado ser enviado e libera o executor."""
+        while self._tarefa is not None and not self._tarefa.done():
+            await self._tarefa
+        if self._proprio_executor:
+            self._executor.shutdown(wait=False)
+        return self.resultados
+
+    async def __aenter__(self) -> "EscritorSupabase":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.fechar()
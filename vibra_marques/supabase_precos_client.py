@@ -5,93 +5,35 @@ Módulo de integração com Supabase para salvar preços de combustíveis.
 
 ⚡ Funcionalidades:
 - Faz UPSERT na tabela `precos_combustiveis`
-  (usa chave única data_coleta + empresa).
+  (usa chave única data_coleta + empresa), em lote via supabase_rest.
 - Aplica regra gasolina_grid -> gasolina_aditivada.
 - Permite incluir diesel_s10_aditivado.
 - Inclui GET de conferência.
+- Conexão única (keep-alive) e .env lido uma vez: supabase_rest.cliente_do_ambiente().
 """
 
-from dotenv import load_dotenv
-import os
-import requests
-import time
-from datetime import date
+import supabase_rest
 
 TABLE = "precos_combustiveis"
 TIMEOUT = 30
 
 
-# ------------------- Funções internas -------------------
-def _env(name: str) -> str:
-    val = os.getenv(name)
-    if not val:
-        raise RuntimeError(f"Variável de ambiente ausente: {name}")
-    return val
-
-def _normalize_payload(precos: dict) -> dict:
-    payload = dict(precos)
-
-    # normalizar data
-    if isinstance(payload.get("data_coleta"), date):
-        payload["data_coleta"] = payload["data_coleta"].isoformat()
-
-    # gasolina_grid -> gasolina_aditivada
-    if "gasolina_grid" in payload and payload["gasolina_grid"] is not None:
-        payload["gasolina_aditivada"] = payload["gasolina_grid"]
-        payload.pop("gasolina_grid", None)
-
-    return payload
-
-
 # ------------------- Core -------------------
-def upsert_precos(precos: dict, return_representation: bool = False) -> tuple[int, str]:
+def upsert_precos(precos, return_representation: bool = False, forcar: bool = False) -> tuple[int, str]:
     """
     UPSERT na tabela precos_combustiveis.
+    precos: um dict ou uma lista de dicts (várias empresas/dias num POST só).
     return_representation=True -> retorna o JSON gravado.
+    forcar=True -> envia mesmo que a linha seja igual à última gravada.
     """
-    load_dotenv()
-    SUPABASE_URL = _env("SUPABASE_URL").rstrip("/")
-    SUPABASE_KEY = _env("SUPABASE_KEY")
-    payload = _normalize_payload(precos)
-
-    url = f"{SUPABASE_URL}/rest/v1/{TABLE}?on_conflict=data_coleta,empresa"
-    headers = {
-        "apikey": SUPABASE_KEY,
-        "Authorization": f"Bearer {SUPABASE_KEY}",
-        "Content-Type": "application/json",
-        "Prefer": "resolution=merge-duplicates," +
-                  ("return=representation" if return_representation else "return=minimal"),
-    }
-
-    # retry simples
-    for i in range(3):
-        try:
-            resp = requests.post(url, headers=headers, json=payload, timeout=TIMEOUT)
-            if resp.status_code in (200, 201):
-                return resp.status_code, resp.text or ""
-            if resp.status_code >= 500:  # erro de servidor, tenta de novo
-                time.sleep(1.5 * (i + 1))
-                continue
-            return resp.status_code, resp.text
-        except requests.RequestException as e:
-            if i == 2:
-                return 0, f"Erro de rede: {e}"
-            time.sleep(1.5 * (i + 1))
-    return 0, "Erro desconhecido"
+    return supabase_rest.cliente_do_ambiente().upsert(
+        precos, return_representation=return_representation, table=TABLE, timeout=TIMEOUT, forcar=forcar or None)
 
 def get_precos(empresa: str, limit: int = 5) -> tuple[int, str]:
     """
     Consulta últimos registros dessa empresa.
     """
-    load_dotenv()
-    SUPABASE_URL = _env("SUPABASE_URL").rstrip("/")
-    SUPABASE_KEY = _env("SUPABASE_KEY")
-
-    params = f"empresa=eq.{requests.utils.quote(empresa)}&order=data_coleta.desc&limit={limit}"
-    url = f"{SUPABASE_URL}/rest/v1/{TABLE}?{params}"
-    headers = {"apikey": SUPABASE_KEY, "Authorization": f"Bearer {SUPABASE_KEY}"}
-    resp = requests.get(url, headers=headers, timeout=TIMEOUT)
-    return resp.status_code, resp.text
+    return supabase_rest.cliente_do_ambiente().ultimos(empresa, limit=limit, table=TABLE, timeout=TIMEOUT)
 
 
 # ------------------- Exemplo -------------------
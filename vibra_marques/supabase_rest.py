@@ -0,0 +1,284 @@
+"""
+supabase_rest.py
+----------------
+Escrita em lote na tabela `precos_combustiveis` via PostgREST.
+
+⚡ Funcionalidades:
+- `normalize_payload`: regras únicas de normalização (data ISO,
+  gasolina_grid -> gasolina_aditivada, preços com 4 casas).
+- `lotes`: normaliza N linhas, junta duplicadas de (data_coleta, empresa),
+  agrupa por conjunto de colunas e fatia por linhas/bytes.
+- `ClienteSupabase`: `requests.Session` com keep-alive e headers de auth
+  prontos, timeout por requisição e backoff exponencial com jitter em erro
+  de rede/429/5xx (respeita Retry-After). Um por (URL, chave): `cliente()`.
+- `upsert` / `ultimos`: UPSERT em array JSON (on_conflict=data_coleta,empresa)
+  — uma requisição por fatia, não por linha — e GET de conferência.
+- Linhas iguais à última gravada são puladas (cache_escritas.py);
+  `forcar=True` / SUPABASE_FORCAR=true envia assim mesmo.
+
+No .env: SUPABASE_LOTE_LINHAS (500), SUPABASE_LOTE_BYTES (262144),
+SUPABASE_TENTATIVAS (4).
+"""
+
+import json
+import logging
+import os
+import random
+import threading
+import time
+from datetime import date, datetime, timezone
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from cache_escritas import CACHE, CacheEscritas, cache_ativo, forcar_padrao
+from metricas import METRICAS
+
+TABLE = "precos_combustiveis"
+ON_CONFLICT = "data_coleta,empresa"
+HTTP_TIMEOUT = 20          # leitura (s)
+TIMEOUT_CONEXAO = 5        # conexão (s)
+TENTATIVAS = int(os.getenv("SUPABASE_TENTATIVAS", "4"))
+BACKOFF_BASE = 0.5         # s; espera sorteada em [0, base * 2^tentativa]
+BACKOFF_MAX = 30.0
+POOL_CONEXOES = 4
+LOTE_MAX_LINHAS = int(os.getenv("SUPABASE_LOTE_LINHAS", "500"))
+LOTE_MAX_BYTES = int(os.getenv("SUPABASE_LOTE_BYTES", "262144"))
+CAMPOS_PRECO = ("gasolina_comum", "gasolina_aditivada", "etanol_hidratado", "diesel_s10", "diesel_s10_aditivado")
+
+log = logging.getLogger("supabase_rest")
+
+Linhas = Union[Dict[str, Any], Iterable[Dict[str, Any]]]
+
+
+# ------------ Normalização ------------
+def normalize_payload(p: Dict[str, Any]) -> Dict[str, Any]:
+    out = dict(p)
+    if isinstance(out.get("data_coleta"), date):
+        out["data_coleta"] = out["data_coleta"].isoformat()
+    if "gasolina_grid" in out and out["gasolina_grid"] is not None:
+        out["gasolina_aditivada"] = out["gasolina_grid"]
+        out.pop("gasolina_grid", None)
+    for k in CAMPOS_PRECO:
+        if k in out and out[k] is not None:
+            out[k] = round(float(out[k]), 4)
+    return out
+
+
+# ------------ Fatiamento ------------
+def unificar(linhas: Linhas) -> List[Dict[str, Any]]:
+    """
+    Normaliza e junta repetições de (data_coleta, empresa) numa linha só (a
+    última vence campo a campo): o Postgres recusa um UPSERT que toca a mesma
+    linha duas vezes.
+    """
+    if isinstance(linhas, dict):
+        linhas = [linhas]
+    unicas: Dict[Tuple[Any, Any], Dict[str, Any]] = {}
+    for p in linhas:
+        n = normalize_payload(p)
+        chave = (n.get("data_coleta"), n.get("empresa"))
+        unicas[chave] = {**unicas[chave], **n} if chave in unicas else n
+    return list(unicas.values())
+
+def fatiar(linhas: List[Dict[str, Any]], max_linhas: int = LOTE_MAX_LINHAS,
+           max_bytes: int = LOTE_MAX_BYTES) -> List[List[Dict[str, Any]]]:
+    """
+    Fatias prontas para um POST cada. PostgREST usa as chaves do array
+    inteiro; linhas com colunas diferentes vão em fatias separadas para não
+    anular colunas ausentes.
+    """
+    grupos: Dict[frozenset, List[Dict[str, Any]]] = {}
+    for n in linhas:
+        grupos.setdefault(frozenset(n), []).append(n)
+
+    fatias: List[List[Dict[str, Any]]] = []
+    for grupo in grupos.values():
+        atual: List[Dict[str, Any]] = []
+        tamanho = 2  # "[]"
+        for n in grupo:
+            t = len(json.dumps(n, ensure_ascii=False).encode("utf-8")) + 1
+            if atual and (len(atual) >= max_linhas or tamanho + t > max_bytes):
+                fatias.append(atual)
+                atual, tamanho = [], 2
+            atual.append(n)
+            tamanho += t
+        if atual:
+            fatias.append(atual)
+    return fatias
+
+def lotes(linhas: Linhas, max_linhas: int = LOTE_MAX_LINHAS, max_bytes: int = LOTE_MAX_BYTES) -> List[List[Dict[str, Any]]]:
+    """Linhas normalizadas e sem repetição, em fatias prontas para um POST cada."""
+    return fatiar(unificar(linhas), max_linhas, max_bytes)
+
+
+# ------------ Cliente HTTP ------------
+def _retry_after(valor: Optional[str]) -> Optional[float]:
+    """Retry-After em segundos ou data HTTP -> segundos (None se ausente/inválido)."""
+    if not valor:
+        return None
+    try:
+        return max(0.0, float(valor))
+    except ValueError:
+        pass
+    try:
+        from email.utils import parsedate_to_datetime
+        quando = parsedate_to_datetime(valor)
+    except (TypeError, ValueError):
+        return None
+    if quando.tzinfo is None:
+        quando = quando.replace(tzinfo=timezone.utc)
+    return max(0.0, (quando - datetime.now(timezone.utc)).total_seconds())
+
+
+class ClienteSupabase:
+    """
+    Um `requests.Session` com keep-alive e pool por (URL, chave): upserts
+    seguidos e o GET de conferência reaproveitam a mesma conexão TLS.
+
+    Reenvia em erro de rede, 429 e 5xx com backoff exponencial + jitter,
+    respeitando Retry-After. Timeout = (conexão, leitura).
+    """
+
+    def __init__(self, base: str, key: str, timeout: float = HTTP_TIMEOUT, tentativas: int = TENTATIVAS,
+                 cache: Optional[CacheEscritas] = CACHE):
+        self.base = base.rstrip("/")
+        self.cache = cache
+        self.timeout = (TIMEOUT_CONEXAO, timeout)
+        self.tentativas = max(1, tentativas)
+        # requests só quando há cliente: normalizar/fatiar (outbox, CLI) não paga o import
+        import requests
+        from requests.adapters import HTTPAdapter
+        self._erro_rede = requests.RequestException
+        self.sessao = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_CONEXOES, max_retries=0)
+        self.sessao.mount("https://", adapter)
+        self.sessao.mount("http://", adapter)
+        self.sessao.headers.update({
+            "apikey": key,
+            "Authorization": f"Bearer {key}",
+            "Content-Type": "application/json",
+        })
+
+    def _espera(self, tentativa: int, resp=None) -> float:
+        if resp is not None:
+            ra = _retry_after(resp.headers.get("Retry-After"))
+            if ra is not None:
+                return min(ra, BACKOFF_MAX)
+        return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** tentativa))
+
+    def requisicao(self, metodo: str, caminho: str, **kw) -> Tuple[int, str]:
+        """(status, corpo); status 0 = erro de rede depois de todas as tentativas."""
+        url = f"{self.base}/rest/v1/{caminho}"
+        kw.setdefault("timeout", self.timeout)
+        with METRICAS.span("supabase.requisicao", metodo=metodo):
+            for i in range(self.tentativas):
+                ultima = i == self.tentativas - 1
+                try:
+                    r = self.sessao.request(metodo, url, **kw)
+                except self._erro_rede as e:
+                    if ultima:
+                        return 0, f"Erro de rede: {e}"
+                    espera = self._espera(i)
+                    METRICAS.contar("supabase.retentativas", motivo="rede")
+                    log.info("%s %s: erro de rede (%s); nova tentativa em %.1fs", metodo, caminho.split("?")[0], e, espera)
+                    time.sleep(espera)
+                    continue
+                METRICAS.contar("supabase.bytes_enviados", len(r.request.body or b""))
+                METRICAS.contar("supabase.bytes_recebidos", len(r.content))
+                if (r.status_code == 429 or r.status_code >= 500) and not ultima:
+                    espera = self._espera(i, r)
+                    METRICAS.contar("supabase.retentativas", motivo=r.status_code)
+                    log.info("%s %s: HTTP %s; nova tentativa em %.1fs", metodo, caminho.split("?")[0], r.status_code, espera)
+                    time.sleep(espera)
+                    continue
+                return r.status_code, r.text or ""
+            return 0, "Erro desconhecido"
+
+    def _timeout(self, leitura: Optional[float]):
+        return (TIMEOUT_CONEXAO, leitura) if leitura else self.timeout
+
+    def upsert(self, linhas: Linhas, return_representation: bool = False, table: str = TABLE,
+               timeout: Optional[float] = None, forcar: Optional[bool] = None) -> Tuple[int, str]:
+        """
+        UPSERT de uma ou várias linhas. Retorna (status, corpo) como os helpers
+        antigos: o status da primeira fatia com erro (ou o da última), e com
+        return_representation o array JSON de todas as fatias.
+
+        Linhas idênticas à última gravada (cache_escritas) não são enviadas;
+        `forcar=True` (ou SUPABASE_FORCAR) envia mesmo assim.
+        """
+        linhas = unificar(linhas)
+        escopo = f"{self.base}/{table}"
+        forcar = forcar_padrao() if forcar is None else forcar
+        usar_cache = self.cache is not None and cache_ativo()
+        if usar_cache and not forcar:
+            total = len(linhas)
+            linhas = self.cache.pendentes(linhas, escopo)
+            if len(linhas) < total:
+                METRICAS.contar("supabase.linhas_puladas", total - len(linhas))
+                log.info("UPSERT: %d de %d linha(s) sem mudança, puladas (cache %s)",
+                         total - len(linhas), total, self.cache.resumo())
+        fatias = fatiar(linhas)
+        if not fatias:
+            return 200, "[]" if return_representation else ""
+        caminho = f"{table}?on_conflict={ON_CONFLICT}"
+        headers = {"Prefer": "resolution=merge-duplicates," + ("return=representation" if return_representation else "return=minimal")}
+        gravadas: List[Any] = []
+        status, corpo = 0, ""
+        for fatia in fatias:
+            status, corpo = self.requisicao("POST", caminho, headers=headers, json=fatia, timeout=self._timeout(timeout))
+            if not 200 <= status < 300:
+                log.warning("UPSERT de %d linha(s) falhou: %s %s", len(fatia), status, corpo[:200])
+                return status, corpo
+            if usar_cache:
+                self.cache.registrar(fatia, escopo)
+            if return_representation and corpo:
+                try:
+                    gravadas.extend(json.loads(corpo))
+                except ValueError:
+                    pass
+        METRICAS.contar("supabase.linhas_enviadas", sum(map(len, fatias)))
+        log.info("UPSERT: %d linha(s) em %d requisição(ões)", sum(map(len, fatias)), len(fatias))
+        return status, json.dumps(gravadas, ensure_ascii=False) if return_representation else corpo
+
+    def ultimos(self, empresa: str, limit: int = 5, table: str = TABLE,
+                timeout: Optional[float] = None) -> Tuple[int, str]:
+        """GET de conferência: últimos registros da empresa."""
+        params = {"empresa": f"eq.{empresa}", "order": "data_coleta.desc", "limit": str(int(limit))}
+        return self.requisicao("GET", table, params=params, timeout=self._timeout(timeout))
+
+
+_CLIENTES: Dict[Tuple[str, str], ClienteSupabase] = {}
+_CLIENTES_LOCK = threading.Lock()
+
+def cliente(base: str, key: str) -> ClienteSupabase:
+    """Cliente compartilhado para (URL, chave) — criado uma vez por processo."""
+    chave = (base.rstrip("/"), key)
+    with _CLIENTES_LOCK:
+        if chave not in _CLIENTES:
+            _CLIENTES[chave] = ClienteSupabase(*chave)
+        return _CLIENTES[chave]
+
+@lru_cache(maxsize=None)
+def cliente_do_ambiente(dotenv_path: Optional[str] = None) -> ClienteSupabase:
+    """Lê SUPABASE_URL/SUPABASE_KEY do .env uma única vez e devolve o cliente compartilhado."""
+    from dotenv import load_dotenv
+    load_dotenv(dotenv_path=dotenv_path)
+    base, key = os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY")
+    for nome, val in (("SUPABASE_URL", base), ("SUPABASE_KEY", key)):
+        if not val:
+            raise RuntimeError(f"Variável de ambiente ausente: {nome}")
+    return cliente(base, key)
+
+
+# ------------ Atalhos ------------
+def upsert(base: str, key: str, linhas: Linhas, return_representation: bool = False,
+           timeout: float = HTTP_TIMEOUT, table: str = TABLE, forcar: Optional[bool] = None) -> Tuple[int, str]:
+    """UPSERT em lote pelo cliente compartilhado de (base, key)."""
+    return cliente(base, key).upsert(linhas, return_representation=return_representation, table=table,
+                                     timeout=timeout, forcar=forcar)
+
+def ultimos(base: str, key: str, empresa: str, limit: int = 5,
+            timeout: float = HTTP_TIMEOUT, table: str = TABLE) -> Tuple[int, str]:
+    """GET de conferência pelo cliente compartilhado de (base, key)."""
+    return cliente(base, key).ultimos(empresa, limit=limit, table=table, timeout=timeout)
@@ -1,8 +1,8 @@
 # supabase_insert.py
 from dotenv import load_dotenv
 import os
-import requests
-from datetime import date
+
+import supabase_rest
 
 # 1) Carregar variáveis do .env
 load_dotenv()
@@ -31,31 +31,10 @@ def enviar_precos_supabase(precos: dict) -> tuple[int, str]:
         "diesel_s10_aditivado": None     # opcional
     }
     """
-    # Normalizações
-    payload = dict(precos)
-
-    # data_coleta como string YYYY-MM-DD
-    if isinstance(payload.get("data_coleta"), date):
-        payload["data_coleta"] = payload["data_coleta"].isoformat()
-
-    # Regra: gasolina_grid -> gasolina_aditivada
-    if "gasolina_grid" in payload and payload["gasolina_grid"] is not None:
-        payload["gasolina_aditivada"] = payload["gasolina_grid"]
-        payload.pop("gasolina_grid", None)
-
-    # Monta requisição com UPSERT:
+    # Normalização (grid -> aditivada, 4 casas) e UPSERT em lote:
     # - on_conflict=data_coleta,empresa (chave única)
     # - Prefer: resolution=merge-duplicates (mescla/atualiza)
-    url = f"{SUPABASE_URL}/rest/v1/{TABLE}?on_conflict=data_coleta,empresa"
-    headers = {
-        "apikey": SUPABASE_KEY,
-        "Authorization": f"Bearer {SUPABASE_KEY}",
-        "Content-Type": "application/json",
-        "Prefer": "resolution=merge-duplicates,return=minimal",
-    }
-
-    r = requests.post(url, headers=headers, json=payload, timeout=30)
-    return r.status_code, r.text
+    return supabase_rest.upsert(SUPABASE_URL, SUPABASE_KEY, precos, return_representation=False, timeout=30, table=TABLE)
 
 if __name__ == "__main__":
     # Exemplo de uso:
@@ -0,0 +1,170 @@
+"""
+variacoes.py
+------------
+Etapa depois da extração: compara a coleta com os últimos preços conhecidos
+e emite só o que mudou.
+
+⚡ Funcionamento:
+- `IndicePrecos`: dict em memória {(empresa, produto): (preço, quando)},
+  carregado uma vez de `cache/ultimos_precos.json` (na primeira vez, semeado
+  pelo histórico local — historico.py).
+- `comparar(empresa, payload)`: O(produtos) — devolve eventos só para preço
+  novo ou alterado (preço ausente na coleta não apaga o conhecido). Compara
+  e grava sob flock; só relê o arquivo se mtime/tamanho mudaram desde a
+  última leitura/gravação (outro processo da fila.py gravou).
+- `emitir(eventos)`: JSON lines no stdout, num arquivo e/ou num webhook.
+
+Destinos em VARIACOES_DESTINO (vírgula): "stdout" (padrão),
+"arquivo:<caminho>.jsonl", "webhook:<url>". VARIACOES=false desliga.
+
+Evento:
+    {"evento": "preco_alterado", "empresa": "VIBRA_MARQUES", "produto": "gasolina_comum",
+     "anterior": 5.4058, "atual": 5.541, "delta": 0.1352, "delta_pct": 2.501,
+     "data_coleta": "2025-09-02", "ts": "2025-09-02T09:40:50"}
+"""
+
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from historico import HISTORICO, linhas_de_payload, nome_distribuidora, trava_entre_processos
+
+ESTADO_PATH = Path(os.getenv("VARIACOES_ESTADO") or Path(__file__).with_name("cache") / "ultimos_precos.json")
+WEBHOOK_TIMEOUT = 10
+
+log = logging.getLogger("variacoes")
+
+
+def variacoes_ativas() -> bool:
+    return os.getenv("VARIACOES", "true").strip().lower() in ("1", "true", "yes", "y", "on")
+
+
+class IndicePrecos:
+    def __init__(self, path: Path = ESTADO_PATH):
+        self.path = Path(path)
+        self._ultimos: Optional[Dict[Tuple[str, str], Tuple[float, float]]] = None
+        self._assinatura: Optional[Tuple[int, int]] = None  # (mtime_ns, tamanho) do que está em memória
+        self._lock = threading.Lock()
+
+    def _assinatura_do_arquivo(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = self.path.stat()
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _carregar(self) -> Dict[Tuple[str, str], Tuple[float, float]]:
+        if self._ultimos is not None:
+            return self._ultimos
+        self._ultimos = {}
+        self._assinatura = self._assinatura_do_arquivo()
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                for chave, (preco, ts) in json.load(f).items():
+                    empresa, produto = chave.split("|", 1)
+                    self._ultimos[(empresa, produto)] = (preco, ts)
+        except FileNotFoundError:
+            # primeira vez: o último valor de cada série do histórico
+            for quando, dist, prod, preco in HISTORICO.consultar():
+                ts = quando.timestamp()
+                atual = self._ultimos.get((dist, prod))
+                if atual is None or ts >= atual[1]:
+                    self._ultimos[(dist, prod)] = (preco, ts)
+            log.info("Índice de preços semeado pelo histórico: %d série(s)", len(self._ultimos))
+        except (OSError, ValueError) as e:
+            log.warning("Estado de preços ilegível (%s); começando vazio", e)
+        return self._ultimos
+
+    def _salvar(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({f"{e}|{p}": v for (e, p), v in self._ultimos.items()}, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+        self._assinatura = self._assinatura_do_arquivo()
+
+    def comparar(self, empresa: str, payload: Dict[str, Any], quando: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Atualiza o índice com a coleta e devolve os eventos (só o que mudou)."""
+        ts = quando if quando is not None else time.time()
+        empresa = nome_distribuidora(empresa)
+        data_coleta = payload.get("data_coleta")
+        eventos = []
+        with self._lock, trava_entre_processos(self.path.with_suffix(".lock")):
+            assinatura = self._assinatura_do_arquivo()
+            if assinatura is not None and assinatura != self._assinatura:
+                self._ultimos = None  # outro worker da fila gravou: relê
+            ultimos = self._carregar()
+            for _, _, produto, preco in linhas_de_payload(ts, empresa, payload):
+                preco = round(preco, 4)
+                anterior = ultimos.get((empresa, produto))
+                if anterior is not None and anterior[0] == preco:
+                    continue
+                ev = {
+                    "evento": "preco_novo" if anterior is None else "preco_alterado",
+                    "empresa": empresa,
+                    "produto": produto,
+                    "anterior": None if anterior is None else anterior[0],
+                    "atual": preco,
+                    "delta": None if anterior is None else round(preco - anterior[0], 4),
+                    "delta_pct": None if not anterior or not anterior[0] else round((preco / anterior[0] - 1) * 100, 3),
+                    "data_coleta": str(data_coleta) if data_coleta is not None else None,
+                    "ts": datetime.fromtimestamp(ts).isoformat(timespec="seconds"),
+                }
+                eventos.append(ev)
+                ultimos[(empresa, produto)] = (preco, ts)
+            if eventos:
+                self._salvar()
+        return eventos
+
+
+# ------------ Destinos ------------
+def _destinos() -> List[str]:
+    return [d.strip() for d in os.getenv("VARIACOES_DESTINO", "stdout").split(",") if d.strip()]
+
+def emitir(eventos: List[Dict[str, Any]], destinos: Optional[List[str]] = None) -> None:
+    if not eventos:
+        return
+    linhas = "".join(json.dumps(ev, ensure_ascii=False) + "\n" for ev in eventos)
+    for destino in destinos if destinos is not None else _destinos():
+        try:
+            if destino == "stdout":
+                sys.stdout.write(linhas)
+                sys.stdout.flush()
+            elif destino.startswith("arquivo:"):
+                p = Path(destino[len("arquivo:"):])
+                p.parent.mkdir(parents=True, exist_ok=True)
+                with open(p, "a", encoding="utf-8") as f:
+                    f.write(linhas)
+            elif destino.startswith("webhook:"):
+                import requests
+                r = requests.post(destino[len("webhook:"):], json={"eventos": eventos}, timeout=WEBHOOK_TIMEOUT)
+                if r.status_code >= 300:
+                    log.warning("Webhook de variações respondeu %s: %s", r.status_code, r.text[:200])
+            else:
+                log.warning("Destino de variações desconhecido: %s", destino)
+        except Exception as e:
+            log.warning("Falha ao emitir variações para %s: %s", destino, e)
+
+
+INDICE = IndicePrecos()
+
+def processar_coleta(empresa: str, payload: Dict[str, Any], quando: Any = None) -> List[Dict[str, Any]]:
+    """Compara, emite e devolve os eventos; nunca derruba a coleta."""
+    if not variacoes_ativas():
+        return []
+    try:
+        ts = datetime.fromisoformat(quando).timestamp() if isinstance(quando, str) else quando
+        eventos = INDICE.comparar(empresa, payload, ts)
+        if eventos:
+            log.info("%s: %d preço(s) mudaram", empresa, len(eventos))
+        emitir(eventos)
+        return eventos
+    except Exception as e:
+        log.warning("Falha ao comparar preços de %s: %s", empresa, e)
+        return []